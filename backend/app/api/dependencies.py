@@ -0,0 +1,168 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.ml.model import MLModel, load_ml_model
+from app.utils.metrics import ADMISSION_IN_FLIGHT, ADMISSION_SHED
+
+class TokenBucketLimiter:
+    """Token bucket per key, refilled at ``rate`` tokens per second up to ``burst``
+
+    Buckets of the least recently used keys are evicted beyond ``max_keys``;
+    an evicted key starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: int, cost: float = 1.0) -> float:
+        """
+        Take ``cost`` tokens from a key's bucket
+
+        A request costing more than the burst size is admitted once the
+        bucket is full, but is charged in full: the bucket goes into debt
+        and later requests wait until the rate has paid it back.
+
+        Returns:
+            0 if admitted, else the seconds until the tokens are available
+        """
+        needed = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= needed:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (needed - tokens) / self.rate
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+class ConcurrencyLimiter:
+    """At most ``limit`` concurrent holders, with a bounded FIFO of waiters
+
+    Requests beyond the queue, or waiting longer than ``timeout`` seconds,
+    are rejected instead of piling up.
+    """
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        # Created on first use so it binds to the serving event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> Optional[str]:
+        """Wait for a slot; returns None once held, else the reason it was refused"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+            self.active += 1
+            return None
+        if self.waiting >= self.queue_size:
+            return "queue_full"
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+ingest_limiter = TokenBucketLimiter(settings.INGEST_RATE_PER_MACHINE, settings.INGEST_BURST_PER_MACHINE)
+analytics_limiter = ConcurrencyLimiter(
+    settings.ANALYTICS_CONCURRENCY,
+    settings.ANALYTICS_QUEUE_SIZE,
+    settings.ANALYTICS_QUEUE_TIMEOUT_SECONDS,
+)
+
+# Ingest requests currently being handled in this worker
+_ingest_in_flight = 0
+
+ADMISSION_IN_FLIGHT.labels("ingest").set_function(lambda: _ingest_in_flight)
+ADMISSION_IN_FLIGHT.labels("analytics").set_function(lambda: analytics_limiter.active)
+
+def _shed(kind: str, reason: str, status_code: int, retry_after: float) -> HTTPException:
+    ADMISSION_SHED.labels(kind, reason).inc()
+    return HTTPException(
+        status_code=status_code,
+        detail=f"Too many {kind} requests ({reason.replace('_', ' ')}), retry later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def get_ml_model() -> MLModel:
+    """Dependency to provide the ML model to endpoints"""
+    return load_ml_model()
+
+def admit_ingest(machine_id: int, readings: int = 1) -> None:
+    """
+    Charge a machine's ingest token bucket for a number of readings
+
+    Raises:
+        HTTPException: 429 with Retry-After if the machine is over its rate
+    """
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return
+    wait = ingest_limiter.acquire(machine_id, readings)
+    if wait:
+        raise _shed("ingest", "rate_limited", 429, wait)
+
+async def ingest_request():
+    """Dependency marking an ingest request in flight, so analytics yields to it"""
+    global _ingest_in_flight
+    _ingest_in_flight += 1
+    try:
+        yield
+    finally:
+        _ingest_in_flight -= 1
+
+async def analytics_slot():
+    """
+    Dependency holding one of the limited analytics slots for the request
+
+    New analytics requests are refused while ingest is under pressure, so
+    ingest keeps priority; requests already queued keep their place.
+
+    Raises:
+        HTTPException: 503 with Retry-After if the request is shed
+    """
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        yield
+        return
+
+    retry_after = settings.ADMISSION_RETRY_AFTER_SECONDS
+    if _ingest_in_flight >= settings.ANALYTICS_SHED_INGEST_IN_FLIGHT:
+        raise _shed("analytics", "ingest_priority", 503, retry_after)
+
+    reason = await analytics_limiter.acquire()
+    if reason:
+        raise _shed("analytics", reason, 503, retry_after)
+    try:
+        yield
+    finally:
+        analytics_limiter.release()
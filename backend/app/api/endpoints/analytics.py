@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+from app.api.dependencies import analytics_slot
+from app.db.database import get_db
+from app.db.crud import machines as machines_crud
+from app.ml.features import SENSOR_COLUMNS
+from app.services import correlation
+from app.utils.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+# Most machines compared in one request
+MAX_CORRELATION_MACHINES = 500
+
+# Most grid cells per machine, e.g. 90 days at 5 minutes
+MAX_GRID_CELLS = 30000
+
+@router.get("/correlation", response_model=dict, dependencies=[Depends(analytics_slot)])
+async def get_fleet_correlation(
+    machine_ids: Optional[List[int]] = Query(None, description="Machines to compare; defaults to the location/type filters"),
+    location: Optional[str] = None,
+    type: Optional[str] = None,
+    sensor: str = Query("temperature"),
+    days: int = Query(7, ge=1, le=365, description="Period ending now, unless start_date/end_date are given"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    grid_seconds: int = Query(300, ge=10, le=86400, description="Width of the common time grid cells"),
+    min_overlap: float = Query(0.5, ge=0, le=1, description="Fraction of cells a pair must share"),
+    z_threshold: float = Query(3.5, gt=0, description="Robust z-score above which a cell is anomalous"),
+    min_machines: int = Query(2, ge=2, description="Machines anomalous at once that make a co-anomaly window"),
+    top: int = Query(20, ge=1, le=1000),
+    max_windows: int = Query(20, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Correlate one sensor across machines and find co-occurring anomalies
+
+    Readings are averaged onto a common time grid, then every pair of
+    machines is correlated over the cells both have readings in. Cells
+    whose robust z-score (median and MAD per machine) exceeds z_threshold
+    are anomalous; runs of cells where at least min_machines machines are
+    anomalous at once are reported as co-anomaly windows.
+    """
+    if sensor not in SENSOR_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown sensor, expected one of {', '.join(SENSOR_COLUMNS)}")
+
+    end_date = end_date or datetime.utcnow()
+    start_date = start_date or end_date - timedelta(days=days)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    if (end_date - start_date).total_seconds() / grid_seconds > MAX_GRID_CELLS:
+        raise HTTPException(status_code=400, detail=f"Period too long for the grid, at most {MAX_GRID_CELLS} cells")
+
+    if machine_ids is None:
+        machines = machines_crud.get_machines(
+            db, limit=MAX_CORRELATION_MACHINES + 1, type=type, location=location
+        )
+        machine_ids = [machine.id for machine in machines]
+    machine_ids = list(dict.fromkeys(machine_ids))
+
+    if len(machine_ids) < 2:
+        raise HTTPException(status_code=400, detail="At least two machines are needed")
+    if len(machine_ids) > MAX_CORRELATION_MACHINES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CORRELATION_MACHINES} machines can be compared")
+
+    return await run_in_threadpool(
+        correlation.fleet_correlation,
+        db, machine_ids, sensor, start_date, end_date, grid_seconds,
+        min_overlap, z_threshold, min_machines, top, max_windows
+    )
@@ -1,23 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
-from app.schemas.machine import MachineCreate, MachineUpdate, MachineResponse
+from app.schemas.machine import MachineCreate, MachineUpdate, MachineResponse, MachineListResponse
 from app.db.crud import machines as machines_crud
+from app.db.shards import shard_router
+from app.services import alerts
+from app.services.status_engine import status_engine
+from app.utils.shared_state import fleet_state
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/", response_model=List[MachineResponse])
 async def get_machines(
     skip: int = 0, 
     limit: int = 100, 
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    after_id: Optional[int] = Query(None, description="Return machines after this ID instead of skipping rows"),
     db: Session = Depends(get_db)
 ):
-    """Get all machines with pagination"""
-    machines = machines_crud.get_machines(db, skip=skip, limit=limit)
+    """Get machines with optional filters and pagination"""
+    machines = machines_crud.get_machines(
+        db, skip=skip, limit=limit, status=status, type=type, location=location, after_id=after_id
+    )
     return machines
 
+@router.get("/search", response_model=MachineListResponse)
+async def search_machines(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    after_id: Optional[int] = Query(None, description="next_after_id of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get one page of machines matching the filters, with per-status counts"""
+    machines = machines_crud.get_machines(
+        db, limit=limit + 1, status=status, type=type, location=location, after_id=after_id or 0
+    )
+    has_more = len(machines) > limit
+    machines = machines[:limit]
+    
+    return {
+        "items": machines,
+        "next_after_id": machines[-1].id if has_more else None,
+        "status_counts": machines_crud.count_machines_by_status(db, type=type, location=location)
+    }
+
 @router.post("/", response_model=MachineResponse, status_code=status.HTTP_201_CREATED)
 async def create_machine(
     machine: MachineCreate, 
@@ -26,6 +59,15 @@ async def create_machine(
     """Create a new machine"""
     return machines_crud.create_machine(db=db, machine=machine)
 
+@router.get("/fleet/status", response_model=dict)
+async def get_fleet_status():
+    """Get machine counts per status, from the fleet state shared by all workers"""
+    counts = fleet_state.status_counts()
+    return {
+        "total": sum(counts.values()),
+        "status_counts": counts
+    }
+
 @router.get("/{machine_id}", response_model=MachineResponse)
 async def get_machine(
     machine_id: int, 
@@ -44,9 +86,13 @@ async def update_machine(
     db: Session = Depends(get_db)
 ):
     """Update a machine's details"""
-    db_machine = machines_crud.get_machine(db, machine_id=machine_id)
-    if db_machine is None:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    
+    # A machine's sensor data stays on its shard, so it cannot move to another
+    if machine.location is not None:
+        if shard_router.shard_of(machine_id, machine.location) != shard_router.locate(db, machine_id):
+            raise HTTPException(status_code=409, detail="The new location belongs to another shard")
     return machines_crud.update_machine(db=db, machine_id=machine_id, machine=machine)
 
 @router.delete("/{machine_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -55,10 +101,12 @@ async def delete_machine(
     db: Session = Depends(get_db)
 ):
     """Delete a machine"""
-    db_machine = machines_crud.get_machine(db, machine_id=machine_id)
-    if db_machine is None:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    # Its sensor data is deleted along with it, on its shard
+    shard_router.bind_machine(db, machine_id)
     machines_crud.delete_machine(db=db, machine_id=machine_id)
+    status_engine.forget(machine_id)
     return None
 
 @router.get("/{machine_id}/status", response_model=dict)
@@ -74,7 +122,8 @@ async def get_machine_status(
     return {
         "machine_id": db_machine.id,
         "status": db_machine.status,
-        "last_updated": db_machine.last_maintenance.isoformat() if db_machine.last_maintenance else None
+        "last_updated": db_machine.last_maintenance.isoformat() if db_machine.last_maintenance else None,
+        "latest_reading": fleet_state.latest_reading(machine_id)
     }
 
 @router.put("/{machine_id}/status", response_model=dict)
@@ -91,11 +140,12 @@ async def update_machine_status(
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    db_machine = machines_crud.get_machine(db, machine_id=machine_id)
-    if db_machine is None:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
     
+    previous_status = fleet_state.get_status(machine_id)
     updated_machine = machines_crud.update_machine_status(db=db, machine_id=machine_id, status=status)
+    alerts.status_changed(machine_id, previous_status, status)
     
     return {
         "machine_id": updated_machine.id,
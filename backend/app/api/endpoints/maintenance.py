@@ -3,12 +3,15 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 
+from app.api.dependencies import analytics_slot
 from app.db.database import get_db
-from app.schemas.maintenance import MaintenanceCreate, MaintenanceUpdate, MaintenanceResponse
+from app.core.config import settings
+from app.schemas.maintenance import MaintenanceCreate, MaintenanceUpdate, MaintenanceResponse, FleetMaintenanceSchedule
 from app.db.crud import maintenance as maintenance_crud
 from app.db.crud import machines as machines_crud
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/", response_model=List[MaintenanceResponse])
 async def get_all_maintenance_records(
@@ -20,6 +23,36 @@ async def get_all_maintenance_records(
     records = maintenance_crud.get_maintenance_records(db, skip=skip, limit=limit)
     return records
 
+@router.get("/fleet/schedule", response_model=FleetMaintenanceSchedule, dependencies=[Depends(analytics_slot)])
+async def get_fleet_maintenance_schedule(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    history_limit: int = Query(5, ge=0, le=20),
+    db: Session = Depends(get_db)
+):
+    """Get the maintenance schedule for all machines, sorted by urgency
+    
+    Machines never maintained come first, then the most overdue. Intervals
+    are configured per machine type with MAINTENANCE_INTERVALS_BY_TYPE.
+    """
+    today = datetime.utcnow().date()
+    machines = maintenance_crud.get_fleet_schedule(
+        db,
+        intervals_by_type=settings.MAINTENANCE_INTERVALS_BY_TYPE,
+        default_interval=settings.MAINTENANCE_INTERVAL_DAYS,
+        today=today,
+        skip=skip,
+        limit=limit,
+        history_limit=history_limit
+    )
+    
+    return {
+        "as_of": today,
+        "skip": skip,
+        "limit": limit,
+        "machines": machines
+    }
+
 @router.get("/{machine_id}", response_model=List[MaintenanceResponse])
 async def get_machine_maintenance_records(
     machine_id: int,
@@ -27,8 +60,7 @@ async def get_machine_maintenance_records(
 ):
     """Get maintenance records for a specific machine"""
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
     
     records = maintenance_crud.get_machine_maintenance_records(db, machine_id=machine_id)
@@ -41,17 +73,11 @@ async def create_maintenance_record(
 ):
     """Create a new maintenance record"""
     # Verify machine exists
-    machine = machines_crud.get_machine(db, maintenance.machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, maintenance.machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
     
-    # Create maintenance record
-    record = maintenance_crud.create_maintenance_record(db=db, maintenance=maintenance)
-    
-    # Update machine's last maintenance date
-    machines_crud.update_machine_maintenance(db=db, machine_id=maintenance.machine_id)
-    
-    return record
+    # Create maintenance record and update machine's last maintenance date
+    return maintenance_crud.create_maintenance_record(db=db, maintenance=maintenance)
 
 @router.get("/{machine_id}/latest", response_model=MaintenanceResponse)
 async def get_latest_maintenance(
@@ -60,8 +86,7 @@ async def get_latest_maintenance(
 ):
     """Get the most recent maintenance record for a machine"""
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
     
     record = maintenance_crud.get_latest_maintenance(db, machine_id=machine_id)
@@ -102,14 +127,14 @@ async def delete_maintenance_record(
     maintenance_crud.delete_maintenance_record(db=db, record_id=record_id)
     return None
 
-@router.get("/{machine_id}/schedule", response_model=dict)
+@router.get("/{machine_id}/schedule", response_model=dict, dependencies=[Depends(analytics_slot)])
 async def get_maintenance_schedule(
     machine_id: int,
     db: Session = Depends(get_db)
 ):
     """Get maintenance schedule and recommendations for a machine"""
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
+    machine = machines_crud.get_machine_info(db, machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Machine not found")
     
@@ -118,9 +143,10 @@ async def get_maintenance_schedule(
     latest_date = latest.date if latest else None
     
     # Calculate next scheduled maintenance
+    interval = settings.MAINTENANCE_INTERVALS_BY_TYPE.get(machine.type, settings.MAINTENANCE_INTERVAL_DAYS)
     next_date = None
     if latest_date:
-        next_date = latest_date + timedelta(days=90)  # Default 90 days maintenance interval
+        next_date = latest_date + timedelta(days=interval)
     
     # Get maintenance history
     history = maintenance_crud.get_machine_maintenance_records(db, machine_id=machine_id, limit=5)
@@ -135,6 +161,6 @@ async def get_maintenance_schedule(
         "next_scheduled": next_date.isoformat() if next_date else None,
         "days_until_next": (next_date - datetime.utcnow().date()).days if next_date else None,
         "maintenance_history": history_summary,
-        "maintenance_interval": 90,  # Days
+        "maintenance_interval": interval,  # Days
         "recommendation": "Regular maintenance recommended" if next_date else "Initial maintenance recommended"
     }
\ No newline at end of file
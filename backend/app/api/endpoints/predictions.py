@@ -1,38 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
 import pandas as pd
 
-from app.db.database import get_db
+from app.api.dependencies import analytics_slot, get_ml_model
+from app.core.config import settings
+from app.db.database import SessionLocal, get_db
 from app.ml.model import MLModel
-from app.main import get_ml_model
+from app.db.crud import machines as machines_crud
+from app.db.crud import predictions as predictions_crud
 from app.db.crud import sensors as sensors_crud
-from app.schemas.prediction import PredictionResponse, AnomalyResponse, HealthScoreResponse
+from app.db.shards import shard_router
+from app.schemas.prediction import PredictionResponse, PredictionHistoryResponse, AnomalyResponse, HealthScoreResponse
+from app.utils.coalesce import SingleFlight
+from app.utils.timing import TimedRoute, span
 
-router = APIRouter()
+# Every prediction runs model inference, so all of them count as analytics
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(analytics_slot)])
+
+# Concurrent identical requests share one computation
+_predictions = SingleFlight("predictions")
+
+def _recent_readings(machine_id: int) -> List[Dict[str, Any]]:
+    """Get recent sensor readings of a machine as dictionaries for the ML model
+    
+    Runs for every request coalesced onto it, so it opens its own session
+    instead of borrowing one request's, which closes if that request is
+    cancelled.
+    """
+    with SessionLocal() as db:
+        # Get recent sensor data for the machine
+        shard_router.bind_machine(db, machine_id)
+        sensor_data = sensors_crud.get_recent_sensor_data(db, machine_id, limit=100)
+        
+        if not sensor_data:
+            raise HTTPException(status_code=404, detail="No sensor data found for this machine")
+        
+        # Convert to list of dictionaries for ML model
+        sensor_data_dicts = [data.__dict__ for data in sensor_data]
+        for data in sensor_data_dicts:
+            # Remove SQLAlchemy state attributes
+            if '_sa_instance_state' in data:
+                del data['_sa_instance_state']
+        return sensor_data_dicts
+
+def _predict_failure(machine_id: int, ml_model: MLModel) -> Dict[str, Any]:
+    sensor_data_dicts = _recent_readings(machine_id)
+    with span("ml"):
+        return ml_model.predict_failure(sensor_data_dicts)
+
+def _detect_anomalies(machine_id: int, ml_model: MLModel) -> Dict[str, Any]:
+    sensor_data_dicts = _recent_readings(machine_id)
+    with span("ml"):
+        return ml_model.detect_anomalies(sensor_data_dicts)
+
+def _health_score(machine_id: int, ml_model: MLModel) -> Dict[str, Any]:
+    sensor_data_dicts = _recent_readings(machine_id)
+    with span("ml"):
+        return ml_model.get_health_score(sensor_data_dicts)
 
 @router.get("/{machine_id}", response_model=PredictionResponse)
 async def get_failure_prediction(
     machine_id: int,
+    source: str = Query("auto", regex="^(auto|stored|live)$", description="auto serves a stored prediction if it is recent enough"),
     db: Session = Depends(get_db),
     ml_model: MLModel = Depends(get_ml_model)
 ):
-    """Get failure prediction for a specific machine"""
-    # Get recent sensor data for the machine
-    sensor_data = sensors_crud.get_recent_sensor_data(db, machine_id, limit=100)
-    
-    if not sensor_data:
-        raise HTTPException(status_code=404, detail="No sensor data found for this machine")
+    """Get failure prediction for a specific machine
     
-    # Convert to list of dictionaries for ML model
-    sensor_data_dicts = [data.__dict__ for data in sensor_data]
-    for data in sensor_data_dicts:
-        # Remove SQLAlchemy state attributes
-        if '_sa_instance_state' in data:
-            del data['_sa_instance_state']
+    The background scorer stores predictions of machines with new readings.
+    source=stored returns the latest stored one, source=live always runs
+    the model, and auto (the default) returns the stored one unless it is
+    older than PREDICTION_MAX_AGE_SECONDS.
+    """
+    if source != "live":
+        stored = predictions_crud.get_latest_prediction(db, machine_id)
+        max_age = timedelta(seconds=settings.PREDICTION_MAX_AGE_SECONDS)
+        if stored is not None and (source == "stored" or datetime.utcnow() - stored.timestamp <= max_age):
+            return {
+                "machine_id": machine_id,
+                "prediction_timestamp": stored.timestamp.isoformat(),
+                "failure_probability": stored.failure_probability,
+                "is_failure_predicted": stored.is_failure_predicted,
+                "prediction_confidence": stored.confidence,
+                "timeframe": "7 days",
+                "source": "stored",
+                "model_version": stored.model_version
+            }
+        if source == "stored":
+            raise HTTPException(status_code=404, detail="No stored prediction found for this machine")
     
-    # Get prediction
-    prediction = ml_model.predict_failure(sensor_data_dicts)
+    prediction = await _predictions.do_blocking(("failure", machine_id), _predict_failure, machine_id, ml_model)
     
     return {
         "machine_id": machine_id,
@@ -40,31 +99,38 @@ async def get_failure_prediction(
         "failure_probability": prediction["failure_probability"],
         "is_failure_predicted": prediction["is_failure_predicted"],
         "prediction_confidence": prediction["prediction_confidence"],
-        "timeframe": prediction["timeframe"]
+        "timeframe": prediction["timeframe"],
+        "source": "live",
+        "model_version": ml_model.version
     }
 
+@router.get("/{machine_id}/history", response_model=PredictionHistoryResponse)
+async def get_prediction_history(
+    machine_id: int,
+    days: int = Query(30, ge=1, le=365, description="Period ending now, unless start_date/end_date are given"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000, description="The newest predictions in the period are returned"),
+    db: Session = Depends(get_db)
+):
+    """Get the stored failure predictions of a machine over time"""
+    # Verify machine exists
+    if not machines_crud.machine_exists(db, machine_id):
+        raise HTTPException(status_code=404, detail="Machine not found")
+    
+    end_date = end_date or datetime.utcnow()
+    start_date = start_date or end_date - timedelta(days=days)
+    
+    points = predictions_crud.get_prediction_history(db, machine_id, start_date, end_date, limit)
+    return {"machine_id": machine_id, "points": points}
+
 @router.get("/{machine_id}/anomalies", response_model=AnomalyResponse)
 async def get_anomalies(
     machine_id: int,
-    db: Session = Depends(get_db),
     ml_model: MLModel = Depends(get_ml_model)
 ):
     """Detect anomalies for a specific machine"""
-    # Get recent sensor data for the machine
-    sensor_data = sensors_crud.get_recent_sensor_data(db, machine_id, limit=100)
-    
-    if not sensor_data:
-        raise HTTPException(status_code=404, detail="No sensor data found for this machine")
-    
-    # Convert to list of dictionaries for ML model
-    sensor_data_dicts = [data.__dict__ for data in sensor_data]
-    for data in sensor_data_dicts:
-        # Remove SQLAlchemy state attributes
-        if '_sa_instance_state' in data:
-            del data['_sa_instance_state']
-    
-    # Detect anomalies
-    anomalies = ml_model.detect_anomalies(sensor_data_dicts)
+    anomalies = await _predictions.do_blocking(("anomalies", machine_id), _detect_anomalies, machine_id, ml_model)
     
     return {
         "machine_id": machine_id,
@@ -76,25 +142,10 @@ async def get_anomalies(
 @router.get("/{machine_id}/health", response_model=HealthScoreResponse)
 async def get_health_score(
     machine_id: int,
-    db: Session = Depends(get_db),
     ml_model: MLModel = Depends(get_ml_model)
 ):
     """Get health score for a specific machine"""
-    # Get recent sensor data for the machine
-    sensor_data = sensors_crud.get_recent_sensor_data(db, machine_id, limit=100)
-    
-    if not sensor_data:
-        raise HTTPException(status_code=404, detail="No sensor data found for this machine")
-    
-    # Convert to list of dictionaries for ML model
-    sensor_data_dicts = [data.__dict__ for data in sensor_data]
-    for data in sensor_data_dicts:
-        # Remove SQLAlchemy state attributes
-        if '_sa_instance_state' in data:
-            del data['_sa_instance_state']
-    
-    # Calculate health score
-    health = ml_model.get_health_score(sensor_data_dicts)
+    health = await _predictions.do_blocking(("health", machine_id), _health_score, machine_id, ml_model)
     
     return {
         "machine_id": machine_id,
@@ -1,28 +1,171 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+import numpy as np
 
-from app.db.database import get_db
-from app.schemas.sensor import SensorDataCreate, SensorDataResponse, SensorDataBatch
+from app.api.dependencies import admit_ingest, analytics_slot, ingest_request
+from app.core.config import settings
+from app.db.database import SessionLocal, get_db
+from app.schemas.sensor import (
+    SensorDataCreate, SensorDataResponse, SensorDataBatch, SensorDataColumnarBatch,
+    SensorDataColumnarBatchResult, SensorImportJobResponse
+)
 from app.db.crud import sensors as sensors_crud
 from app.db.crud import machines as machines_crud
+from app.db.crud import import_jobs as import_jobs_crud
+from app.db.shards import shard_router
+from app.ml.features import SENSOR_COLUMNS, feature_engine
+from app.services import sensor_formats, sensor_export, sensor_import, sensor_ingest, sketches
+from app.utils.coalesce import SingleFlight
+from app.utils.metrics import SENSOR_INGEST_ROWS
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Concurrent identical stats requests share one computation
+_stats = SingleFlight("sensor_stats")
+
+def _sensor_stats(machine_id: int, start_date: datetime, end_date: datetime) -> Optional[dict]:
+    """Summarize readings from the hourly sketches, or from raw readings if they do not cover the range
+    
+    Shared by coalesced requests, so it uses a session of its own rather
+    than one that closes when the request that started it is cancelled.
+    """
+    with SessionLocal() as db:
+        shard_router.bind_machine(db, machine_id)
+        if settings.SKETCHES_ENABLED:
+            stats = sketches.range_statistics(db, machine_id, start_date, end_date)
+            if stats:
+                return stats
+        return sensors_crud.get_sensor_stats(db, machine_id, start_date, end_date)
+
+@router.get("/export", dependencies=[Depends(analytics_slot)])
+async def export_sensor_data(
+    machine_ids: Optional[List[int]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = Query("csv", regex="^(csv|parquet)$"),
+    chunk_rows: int = Query(sensor_export.EXPORT_CHUNK_ROWS, ge=1000, le=500000),
+    db: Session = Depends(get_db)
+):
+    """Stream sensor data for any time range and set of machines as CSV or Parquet
+    
+    Rows are read through a server-side cursor and written out one chunk at a
+    time, so memory use does not depend on the size of the export.
+    """
+    total_rows = sensor_export.count_export_rows(
+        db,
+        machine_ids=machine_ids,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    if format == "parquet":
+        content = sensor_export.iter_export_parquet(machine_ids, start_date, end_date, chunk_rows)
+        media_type = "application/vnd.apache.parquet"
+    else:
+        content = sensor_export.iter_export_csv(machine_ids, start_date, end_date, chunk_rows)
+        media_type = "text/csv"
+    
+    headers = {
+        "Content-Disposition": f'attachment; filename="sensor_data.{format}"',
+        "X-Export-Total-Rows": str(total_rows),
+        "X-Export-Chunk-Rows": str(chunk_rows),
+    }
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+@router.post("/import", response_model=SensorImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_sensor_data(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, regex="^(csv|parquet)$"),
+    chunk_rows: int = Query(sensor_import.IMPORT_CHUNK_ROWS, ge=1000, le=200000),
+    db: Session = Depends(get_db)
+):
+    """Start a bulk import of historical sensor data from a CSV or Parquet file
+    
+    The upload is spooled to disk and imported in the background in chunks.
+    Poll the returned job for progress.
+    """
+    if format is None:
+        extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+        if extension not in ("csv", "parquet"):
+            raise HTTPException(status_code=400, detail="Cannot infer file format, pass format=csv or format=parquet")
+        format = extension
+    
+    job = import_jobs_crud.create_import_job(db, filename=file.filename, format=format, chunk_rows=chunk_rows)
+    
+    try:
+        job.total_rows = await run_in_threadpool(sensor_import.spool_upload, file.file, job.id, format)
+    except Exception as e:
+        import_jobs_crud.update_import_job_status(db, job.id, "failed", error=f"Unreadable upload: {e}")
+        raise HTTPException(status_code=400, detail=f"Unreadable {format} file")
+    db.commit()
+    db.refresh(job)
+    
+    background_tasks.add_task(sensor_import.run_import_job, job.id)
+    return job
+
+@router.get("/import/{job_id}", response_model=SensorImportJobResponse)
+async def get_import_job(
+    job_id: str,
+    db: Session = Depends(get_db)
+):
+    """Get the progress of a bulk sensor data import job"""
+    job = import_jobs_crud.get_import_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.post("/import/{job_id}/resume", response_model=SensorImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def resume_import_job(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Resume a failed or interrupted import job after its last committed chunk"""
+    job = import_jobs_crud.get_import_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=409, detail="Import job already completed")
+    if sensor_import.is_job_running(job_id):
+        raise HTTPException(status_code=409, detail="Import job is already running")
+    if not sensor_import.spool_path(job.id, job.format).exists():
+        raise HTTPException(status_code=410, detail="Uploaded file for this job is no longer available")
+    
+    background_tasks.add_task(sensor_import.run_import_job, job.id)
+    return job
 
 @router.get("/{machine_id}", response_model=List[SensorDataResponse])
 async def get_sensor_data(
     machine_id: int,
+    request: Request,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = Query(100, ge=1, le=1000),
+    format: Optional[str] = Query(None, regex="^(json|columnar|arrow)$"),
     db: Session = Depends(get_db)
 ):
-    """Get sensor data for a specific machine with optional date filtering"""
+    """Get sensor data for a specific machine with optional date filtering
+    
+    Row JSON is returned by default. Columnar JSON or an Arrow IPC stream can be
+    requested through the Accept header or the ``format`` query parameter.
+    """
+    media_type = sensor_formats.negotiate_media_type(request.headers.get("accept"), format)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported formats: {', '.join(sensor_formats.FORMAT_MEDIA_TYPES.values())}"
+        )
+    
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, machine_id)
     
     # Set default dates if not provided
     if not end_date:
@@ -30,6 +173,20 @@ async def get_sensor_data(
     if not start_date:
         start_date = end_date - timedelta(days=7)
     
+    if media_type != sensor_formats.JSON_MEDIA_TYPE:
+        columns = sensors_crud.get_sensor_data_columns(
+            db,
+            machine_id=machine_id,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit
+        )
+        if media_type == sensor_formats.ARROW_STREAM_MEDIA_TYPE:
+            content = sensor_formats.to_arrow_ipc(columns)
+        else:
+            content = sensor_formats.to_columnar_json(columns)
+        return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+    
     sensor_data = sensors_crud.get_sensor_data(
         db, 
         machine_id=machine_id, 
@@ -47,9 +204,9 @@ async def get_latest_sensor_data(
 ):
     """Get the most recent sensor reading for a machine"""
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, machine_id)
     
     sensor_data = sensors_crud.get_latest_sensor_data(db, machine_id)
     if not sensor_data:
@@ -57,59 +214,177 @@ async def get_latest_sensor_data(
     
     return sensor_data
 
-@router.post("/", response_model=SensorDataResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=SensorDataResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(ingest_request)])
 async def create_sensor_data(
     sensor_data: SensorDataCreate,
     db: Session = Depends(get_db)
 ):
     """Record a new sensor reading"""
+    admit_ingest(sensor_data.machine_id)
+    
     # Verify machine exists
-    machine = machines_crud.get_machine(db, sensor_data.machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, sensor_data.machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, sensor_data.machine_id)
     
-    return sensors_crud.create_sensor_data(db=db, sensor_data=sensor_data)
+    db_sensor_data = sensors_crud.create_sensor_data(db=db, sensor_data=sensor_data)
+    SENSOR_INGEST_ROWS.labels("single").inc()
+    sensor_ingest.after_store(sensor_data.machine_id, [db_sensor_data])
+    return db_sensor_data
 
-@router.post("/batch", response_model=List[SensorDataResponse], status_code=status.HTTP_201_CREATED)
+@router.post("/batch", response_model=List[SensorDataResponse], status_code=status.HTTP_201_CREATED, dependencies=[Depends(ingest_request)])
 async def create_sensor_data_batch(
     sensor_data_batch: SensorDataBatch,
     db: Session = Depends(get_db)
 ):
     """Record multiple sensor readings at once"""
+    admit_ingest(sensor_data_batch.machine_id, len(sensor_data_batch.readings))
+    
     # Verify machine exists
-    machine = machines_crud.get_machine(db, sensor_data_batch.machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, sensor_data_batch.machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, sensor_data_batch.machine_id)
     
-    return sensors_crud.create_sensor_data_batch(
+    db_readings = sensors_crud.create_sensor_data_batch(
         db=db, 
         machine_id=sensor_data_batch.machine_id, 
         readings=sensor_data_batch.readings
     )
+    SENSOR_INGEST_ROWS.labels("batch").inc(len(db_readings))
+    sensor_ingest.after_store(sensor_data_batch.machine_id, db_readings)
+    return db_readings
+
+@router.post("/batch/columnar", response_model=SensorDataColumnarBatchResult, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(ingest_request)])
+async def create_sensor_data_columnar(
+    batch: SensorDataColumnarBatch,
+    db: Session = Depends(get_db)
+):
+    """Record many readings of one machine sent as one array per field
+    
+    Arrays are validated as a whole rather than reading by reading (see
+    SensorDataColumnarBatch) and inserted with one executemany, so large
+    batches cost far less CPU than the per-reading /batch payload. Returns
+    a summary instead of the stored rows.
+    """
+    columns = {column: getattr(batch, column) for column in ["timestamp"] + SENSOR_COLUMNS}
+    columns["machine_id"] = np.full(len(batch.temperature), batch.machine_id)
+    admit_ingest(batch.machine_id, len(batch.temperature))
+    
+    # Verify machine exists
+    if not machines_crud.machine_exists(db, batch.machine_id):
+        raise HTTPException(status_code=404, detail="Machine not found")
+    
+    inserted = await run_in_threadpool(sensor_ingest.store_columns, db, columns, "columnar")
+    
+    return {
+        "machine_id": batch.machine_id,
+        "inserted": inserted,
+        "first_timestamp": batch.timestamp.min().astype("datetime64[us]").astype(datetime),
+        "last_timestamp": batch.timestamp.max().astype("datetime64[us]").astype(datetime)
+    }
 
-@router.get("/{machine_id}/stats", response_model=dict)
+@router.get("/{machine_id}/stats", response_model=dict, dependencies=[Depends(analytics_slot)])
 async def get_sensor_stats(
     machine_id: int,
     days: Optional[int] = Query(7, ge=1, le=365),
     db: Session = Depends(get_db)
 ):
-    """Get statistical summary of sensor data for a machine"""
+    """Get statistical summary of sensor data for a machine
+    
+    Served from hourly quantile sketches when the machine has any: the
+    period is widened to whole hours, the median is within
+    SKETCH_RELATIVE_ACCURACY of the exact value, and the newest readings
+    appear once sketches are flushed. Otherwise computed from raw readings.
+    """
     # Verify machine exists
-    machine = machines_crud.get_machine(db, machine_id)
-    if not machine:
+    if not machines_crud.machine_exists(db, machine_id):
         raise HTTPException(status_code=404, detail="Machine not found")
     
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    stats = sensors_crud.get_sensor_stats(
-        db,
-        machine_id=machine_id,
-        start_date=start_date,
-        end_date=end_date
-    )
+    stats = await _stats.do_blocking((machine_id, days), _sensor_stats, machine_id, start_date, end_date)
     
     if not stats:
         raise HTTPException(status_code=404, detail="No sensor data found for this machine in the specified period")
     
-    return stats
\ No newline at end of file
+    return stats
+
+@router.get("/{machine_id}/percentiles", response_model=dict, dependencies=[Depends(analytics_slot)])
+async def get_sensor_percentiles(
+    machine_id: int,
+    days: int = Query(30, ge=1, le=3650, description="Period ending now, unless start_date/end_date are given"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    q: List[float] = Query([0.5, 0.95, 0.99], description="Quantiles between 0 and 1"),
+    db: Session = Depends(get_db)
+):
+    """Get sensor percentiles over any period from hourly quantile sketches
+    
+    Each percentile is within relative_accuracy of the exact value (e.g.
+    1%). The period is widened to whole hours, and the newest readings
+    appear once sketches are flushed.
+    """
+    if not all(0 <= quantile <= 1 for quantile in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    
+    # Verify machine exists
+    if not machines_crud.machine_exists(db, machine_id):
+        raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, machine_id)
+    
+    end_date = end_date or datetime.utcnow()
+    start_date = start_date or end_date - timedelta(days=days)
+    
+    merged = await run_in_threadpool(sketches.range_sketches, db, machine_id, start_date, end_date)
+    if not merged:
+        raise HTTPException(status_code=404, detail="No sensor sketches found for this machine in the specified period")
+    
+    percentiles = {}
+    for sensor in SENSOR_COLUMNS:
+        sketch = merged.get(sensor)
+        if sketch is not None:
+            estimates = sketch.quantiles(q)
+            percentiles[sensor] = {"count": sketch.count, **{f"p{quantile * 100:g}": value for quantile, value in zip(q, estimates)}}
+    
+    return {
+        "machine_id": machine_id,
+        "start_date": sketches.hour_floor(start_date).isoformat(),
+        "end_date": end_date.isoformat(),
+        "relative_accuracy": settings.SKETCH_RELATIVE_ACCURACY,
+        "percentiles": percentiles
+    }
+
+@router.get("/{machine_id}/features", response_model=dict)
+async def get_sensor_features(
+    machine_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get rolling-window features as of the machine's newest reading
+    
+    Features are kept up to date as readings are ingested. Until the
+    readings this process has seen fill the windows (e.g. after a restart),
+    and always when several workers split the readings between them, they
+    are computed from the machine's recent stored history instead.
+    """
+    # Verify machine exists
+    if not machines_crud.machine_exists(db, machine_id):
+        raise HTTPException(status_code=404, detail="Machine not found")
+    shard_router.bind_machine(db, machine_id)
+    
+    features = feature_engine.latest(machine_id) if settings.WORKERS == 1 else None
+    if features is None:
+        recent = sensors_crud.get_recent_sensor_data(db, machine_id, limit=max(feature_engine.windows))
+        readings = [{column: getattr(row, column) for column in SENSOR_COLUMNS} for row in reversed(recent)]
+        feature_engine.prime(machine_id, readings)
+        features = feature_engine.latest(machine_id)
+    
+    if features is None:
+        raise HTTPException(status_code=404, detail="Not enough sensor data to fill the feature windows")
+    
+    return {
+        "machine_id": machine_id,
+        "windows": list(feature_engine.windows),
+        "features": features
+    }
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import machines, sensors, predictions, dashboard, maintenance
+from app.api.endpoints import machines, sensors, predictions, maintenance, analytics
 
 # Create main API router
 api_router = APIRouter()
@@ -8,5 +8,5 @@ api_router = APIRouter()
 api_router.include_router(machines.router, prefix="/machines", tags=["machines"])
 api_router.include_router(sensors.router, prefix="/sensor-data", tags=["sensor-data"])
 api_router.include_router(predictions.router, prefix="/predictions", tags=["predictions"])
-api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
-api_router.include_router(maintenance.router, prefix="/maintenance", tags=["maintenance"])
\ No newline at end of file
+api_router.include_router(maintenance.router, prefix="/maintenance", tags=["maintenance"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
\ No newline at end of file
@@ -1,4 +1,9 @@
- """Application settings loaded from environment variables"""
+from pydantic import BaseSettings, Field, validator
+from typing import Dict, List, Optional
+import os
+
+class Settings(BaseSettings):
+    """Application settings loaded from environment variables"""
     
     # API settings
     APP_NAME: str = "Predictive Maintenance API"
@@ -11,7 +16,14 @@
     DEBUG: bool = True
     
     # Database settings
-    DATABASE_URL: Optional[PostgresDsn] = None
+    DATABASE_URL: Optional[str] = None  # SQLite or PostgreSQL URL
+    STORAGE_PROFILE: str = "default"  # default, production
+    
+    # Shard settings (sensor data of each machine lives on one shard; machines stay in DATABASE_URL)
+    SHARD_URLS: List[str] = []  # JSON list of database URLs; empty keeps everything in DATABASE_URL
+    SHARD_KEY: str = "machine"  # machine (machine ID modulo the shard count) or location
+    SHARD_LOCATIONS: Dict[str, int] = {}  # Location to shard index, e.g. {"Plant A": 0}; other locations are hashed
+    SHARD_FANOUT_THREADS: int = 16  # Threads querying shards in parallel, per worker
     
     # CORS settings
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -25,6 +37,87 @@
     
     # Model settings
     MODEL_PATH: str = os.path.join("data", "ml_models", "failure_prediction_model.joblib")
+    FEATURE_WINDOWS: List[int] = [10, 60]  # Rolling window lengths in readings, for new models and ingest
+    
+    # Maintenance schedule settings
+    MAINTENANCE_INTERVAL_DAYS: int = 90  # Default interval between maintenance
+    MAINTENANCE_INTERVALS_BY_TYPE: Dict[str, int] = {}  # Per machine type, e.g. {"CNC": 60}
+    
+    # Serving settings
+    FLEET_STATE_CAPACITY: int = 100000  # Highest machine ID + 1 tracked in the shared fleet state
+    BACKGROUND_JOBS_ENABLED: bool = True  # The preforked server enables this in one worker only
+    WORKERS: int = 1  # Worker processes serving the app; set by the preforked server
+    
+    # Admission control settings (per worker)
+    ADMISSION_CONTROL_ENABLED: bool = True
+    INGEST_RATE_PER_MACHINE: float = 50.0  # Sustained readings per second accepted from one machine
+    INGEST_BURST_PER_MACHINE: float = 5000.0  # Readings a machine may send at once after being idle; larger batches go into debt
+    ANALYTICS_CONCURRENCY: int = 4  # Analytics requests served at once
+    ANALYTICS_QUEUE_SIZE: int = 16  # Analytics requests waiting for a slot; more get 503
+    ANALYTICS_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    ANALYTICS_SHED_INGEST_IN_FLIGHT: int = 32  # New analytics requests get 503 while this many ingest requests are in flight
+    ADMISSION_RETRY_AFTER_SECONDS: float = 2.0  # Retry-After sent with 503 responses
+    
+    # Alert settings (per worker: each worker dispatches the alerts its requests raise)
+    ALERTS_ENABLED: bool = True
+    ALERT_SINKS: List[str] = ["log"]  # Any of log, webhook, email, memory
+    ALERT_WEBHOOK_URL: Optional[str] = None
+    ALERT_EMAIL_HOST: str = "localhost"
+    ALERT_EMAIL_PORT: int = 25
+    ALERT_EMAIL_FROM: str = "alerts@localhost"
+    ALERT_EMAIL_TO: List[str] = []
+    ALERT_THRESHOLDS: Dict[str, float] = {"temperature": 90.0, "vibration": 5.0, "noise_level": 100.0}  # Readings above these raise warnings
+    ALERT_QUEUE_SIZE: int = 10000  # Alerts waiting for the dispatcher; more are dropped
+    ALERT_MAX_PENDING: int = 1000  # Distinct (machine, condition) alerts held back by the rate limit
+    ALERT_DEDUP_SECONDS: int = 300  # Repeats of a sent alert are suppressed for this long, by the worker that sent it
+    ALERT_RATE_PER_MINUTE: int = 60  # Per worker, so up to WORKERS times this fleet-wide
+    ALERT_BATCH_SIZE: int = 50
+    ALERT_BATCH_INTERVAL_SECONDS: float = 5.0
+    
+    # Status engine settings (health is scored against ALERT_THRESHOLDS)
+    STATUS_ENGINE_ENABLED: bool = True
+    STATUS_EWMA_ALPHA: float = 0.3  # Weight of each new reading in the smoothed sensor values
+    STATUS_CRITICAL_RATIO: float = 1.25  # Smoothed value / threshold at which a machine becomes critical
+    STATUS_HYSTERESIS: float = 0.1  # A status is left only once the score is this fraction below its entry level
+    STATUS_FLUSH_INTERVAL_SECONDS: float = 5.0  # Derived status changes are written in one batch per interval
+    
+    # Quantile sketch settings
+    SKETCHES_ENABLED: bool = True
+    SKETCH_RELATIVE_ACCURACY: float = 0.01  # Percentiles are within this relative error; changing it needs a backfill
+    SKETCH_FLUSH_INTERVAL_SECONDS: float = 30.0  # Readings are sketched and written once per interval
+    SKETCH_COMPACTION_INTERVAL_SECONDS: int = 900  # Partial sketches of finished hours are merged this often
+    
+    # Prediction scorer settings
+    PREDICTION_SCORER_ENABLED: bool = True
+    PREDICTION_SCORE_INTERVAL_SECONDS: int = 300  # Machines with new readings are scored this often
+    PREDICTION_SCORE_LOOKBACK_HOURS: int = 24  # Machines without readings this recent are not scored
+    PREDICTION_SCORE_BATCH_MACHINES: int = 500  # Machines scored per model call
+    PREDICTION_MAX_AGE_SECONDS: int = 900  # Older stored predictions are recomputed on request
+    
+    # Line protocol ingest settings (each worker listens, sharing the ports)
+    LINE_INGEST_ENABLED: bool = False
+    LINE_INGEST_HOST: str = "0.0.0.0"
+    LINE_INGEST_TCP_PORT: Optional[int] = 8094  # None disables TCP
+    LINE_INGEST_UDP_PORT: Optional[int] = 8094  # None disables UDP
+    LINE_INGEST_MACHINE_TAG: str = "machine_id"  # Tag holding the machine ID
+    LINE_INGEST_MEASUREMENT: Optional[str] = None  # Only points of this measurement are kept; None keeps all
+    LINE_INGEST_PRECISION: str = "ns"  # Timestamp unit: ns, us, ms or s
+    LINE_INGEST_BATCH_SIZE: int = 50000  # Points written per batch
+    LINE_INGEST_FLUSH_INTERVAL_SECONDS: float = 1.0  # Buffered points are written at least this often
+    LINE_INGEST_MAX_BUFFERED: int = 500000  # Beyond this TCP reads pause and UDP datagrams are dropped
+    LINE_INGEST_MAX_LINE_BYTES: int = 65536
+    
+    # Instrumentation settings
+    SERVER_TIMING_ENABLED: bool = True  # Send a Server-Timing breakdown with every response
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0  # Statements slower than this are logged with parameters
+    
+    # Sensor data retention settings
+    SENSOR_DATA_DIR: str = os.path.join("data", "sensor_data")  # CSV files of the file-based sensor data service
+    SENSOR_RETENTION_ENABLED: bool = True
+    SENSOR_RETENTION_DAYS: int = 90  # Raw readings older than this are folded into hourly rollups
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 5000  # Rows folded and deleted per transaction
+    RETENTION_VACUUM_PAGES: int = 2000  # Pages released per run with SQLite incremental vacuum
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Background tasks started at application startup, keyed by name
+_background_tasks: Dict[str, asyncio.Task] = {}
+
+def start_background_task(name: str, coroutine) -> asyncio.Task:
+    """Run a coroutine on the event loop until application shutdown"""
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks[name] = task
+    return task
+
+def start_periodic_task(name: str, interval_seconds: float, func: Callable, *args) -> asyncio.Task:
+    """
+    Run a blocking job in the threadpool every ``interval_seconds``
+    
+    Errors are logged and the job is retried on the next interval.
+    """
+    async def run_periodically():
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await run_in_threadpool(func, *args)
+            except Exception as e:
+                logger.error(f"Background task {name} failed: {e}")
+    
+    return start_background_task(name, run_periodically())
+
+async def stop_background_tasks() -> None:
+    """Cancel all background tasks and wait for them to finish"""
+    tasks = list(_background_tasks.values())
+    _background_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,46 @@
+from sqlalchemy.orm import Session
+from typing import Optional
+import uuid
+
+from app.models.import_job import SensorImportJob
+
+def get_import_job(db: Session, job_id: str) -> Optional[SensorImportJob]:
+    """Get a sensor import job by ID"""
+    return db.query(SensorImportJob).filter(SensorImportJob.id == job_id).first()
+
+def create_import_job(
+    db: Session, 
+    filename: str, 
+    format: str, 
+    chunk_rows: int
+) -> SensorImportJob:
+    """Create a new pending sensor import job"""
+    db_job = SensorImportJob(
+        id=str(uuid.uuid4()),
+        filename=filename,
+        format=format,
+        status="pending",
+        chunk_rows=chunk_rows,
+        rows_processed=0,
+        rows_inserted=0,
+        rows_rejected=0,
+        chunks_completed=0
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def update_import_job_status(
+    db: Session, 
+    job_id: str, 
+    status: str, 
+    error: Optional[str] = None
+) -> SensorImportJob:
+    """Update a sensor import job's status"""
+    db_job = get_import_job(db, job_id)
+    db_job.status = status
+    db_job.error = error
+    db.commit()
+    db.refresh(db_job)
+    return db_job
@@ -1,17 +1,41 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from app.models.machine import Machine
 from app.schemas.machine import MachineCreate, MachineUpdate
+from app.db.machine_registry import machine_registry, MachineInfo
 
 def get_machine(db: Session, machine_id: int) -> Optional[Machine]:
     """Get a machine by ID"""
     return db.query(Machine).filter(Machine.id == machine_id).first()
 
-def get_machines(db: Session, skip: int = 0, limit: int = 100) -> List[Machine]:
-    """Get all machines with pagination"""
-    return db.query(Machine).offset(skip).limit(limit).all()
+def get_machine_info(db: Session, machine_id: int) -> Optional[MachineInfo]:
+    """Get a machine's cached status, type and location"""
+    return machine_registry.get(db, machine_id)
+
+def machine_exists(db: Session, machine_id: int) -> bool:
+    """Check that a machine exists, served from the machine registry"""
+    return machine_registry.get(db, machine_id) is not None
+
+def get_machines(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None,
+                 type: Optional[str] = None, location: Optional[str] = None,
+                 after_id: Optional[int] = None) -> List[Machine]:
+    """Get machines matching the filters, paged by offset or by the last ID seen"""
+    query = db.query(Machine)
+    if status is not None:
+        query = query.filter(Machine.status == status)
+    if type is not None:
+        query = query.filter(Machine.type == type)
+    if location is not None:
+        query = query.filter(Machine.location == location)
+    if after_id is not None:
+        return query.filter(Machine.id > after_id).order_by(Machine.id).limit(limit).all()
+    return query.order_by(Machine.id).offset(skip).limit(limit).all()
+
+def count_machines_by_status(db: Session, type: Optional[str] = None, location: Optional[str] = None) -> Dict[str, int]:
+    """Count machines per status, served from the machine registry"""
+    return machine_registry.status_counts(db, type=type, location=location)
 
 def create_machine(db: Session, machine: MachineCreate) -> Machine:
     """Create a new machine"""
@@ -25,6 +49,7 @@ def create_machine(db: Session, machine: MachineCreate) -> Machine:
     db.add(db_machine)
     db.commit()
     db.refresh(db_machine)
+    machine_registry.put(db_machine)
     return db_machine
 
 def update_machine(db: Session, machine_id: int, machine: MachineUpdate) -> Machine:
@@ -38,6 +63,7 @@ def update_machine(db: Session, machine_id: int, machine: MachineUpdate) -> Mach
     
     db.commit()
     db.refresh(db_machine)
+    machine_registry.put(db_machine)
     return db_machine
 
 def delete_machine(db: Session, machine_id: int) -> None:
@@ -45,6 +71,7 @@ def delete_machine(db: Session, machine_id: int) -> None:
     db_machine = get_machine(db, machine_id)
     db.delete(db_machine)
     db.commit()
+    machine_registry.invalidate(machine_id)
 
 def update_machine_status(db: Session, machine_id: int, status: str) -> Machine:
     """Update a machine's status"""
@@ -52,6 +79,7 @@ def update_machine_status(db: Session, machine_id: int, status: str) -> Machine:
     db_machine.status = status
     db.commit()
     db.refresh(db_machine)
+    machine_registry.put(db_machine)
     return db_machine
 
 def update_machine_maintenance(db: Session, machine_id: int) -> Machine:
@@ -63,4 +91,5 @@ def update_machine_maintenance(db: Session, machine_id: int) -> Machine:
         db_machine.status = "operational"
     db.commit()
     db.refresh(db_machine)
+    machine_registry.put(db_machine)
     return db_machine
\ No newline at end of file
@@ -1,9 +1,12 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from sqlalchemy import Integer, and_, case, cast, func, literal, select, update
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timedelta
 
+from app.models.machine import Machine
 from app.models.maintenance import Maintenance
 from app.schemas.maintenance import MaintenanceCreate, MaintenanceUpdate
+from app.db.machine_registry import machine_registry
 
 def get_maintenance_record(db: Session, record_id: int) -> Optional[Maintenance]:
     """Get a maintenance record by ID"""
@@ -30,7 +33,11 @@ def get_latest_maintenance(db: Session, machine_id: int) -> Optional[Maintenance
     ).order_by(Maintenance.date.desc()).first()
 
 def create_maintenance_record(db: Session, maintenance: MaintenanceCreate) -> Maintenance:
-    """Create a new maintenance record"""
+    """Create a new maintenance record and update the machine's last maintenance date
+    
+    Both writes happen in one transaction. A machine in maintenance status is
+    set back to operational.
+    """
     db_maintenance = Maintenance(
         machine_id=maintenance.machine_id,
         date=maintenance.date or datetime.utcnow().date(),
@@ -42,8 +49,20 @@ def create_maintenance_record(db: Session, maintenance: MaintenanceCreate) -> Ma
         duration_hours=maintenance.duration_hours
     )
     db.add(db_maintenance)
+    db.execute(
+        update(Machine)
+        .where(Machine.id == maintenance.machine_id)
+        .values(
+            last_maintenance=datetime.utcnow(),
+            status=case((Machine.status == "maintenance", "operational"), else_=Machine.status)
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
     db.refresh(db_maintenance)
+    machine_registry.invalidate(maintenance.machine_id)
+    # Reload so the new status reaches the shared fleet state
+    machine_registry.get(db, maintenance.machine_id)
     return db_maintenance
 
 def update_maintenance_record(
@@ -68,4 +87,99 @@ def delete_maintenance_record(db: Session, record_id: int) -> None:
     """Delete a maintenance record"""
     db_maintenance = get_maintenance_record(db, record_id)
     db.delete(db_maintenance)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+def _days_since(db: Session, column, today: date):
+    """SQL expression for whole days between a date column and today"""
+    if db.bind.dialect.name == "sqlite":
+        return cast(func.julianday(today.isoformat()) - func.julianday(column), Integer)
+    return cast(literal(today) - column, Integer)
+
+def get_fleet_schedule(
+    db: Session,
+    intervals_by_type: Dict[str, int],
+    default_interval: int,
+    today: date,
+    skip: int = 0,
+    limit: int = 100,
+    history_limit: int = 5
+) -> List[Dict[str, Any]]:
+    """Get the maintenance schedule of a page of machines, most urgent first
+    
+    Last maintenance, days overdue, urgency order and recent history are all
+    computed in a single query with window functions. Machines that were
+    never maintained come first, then the most overdue.
+    """
+    ranked = select(
+        Maintenance.machine_id,
+        Maintenance.date,
+        Maintenance.type,
+        Maintenance.description,
+        func.row_number().over(
+            partition_by=Maintenance.machine_id,
+            order_by=(Maintenance.date.desc(), Maintenance.id.desc())
+        ).label("rn")
+    ).cte("ranked")
+    
+    if intervals_by_type:
+        interval_days = case(intervals_by_type, value=Machine.type, else_=default_interval)
+    else:
+        interval_days = literal(default_interval)
+    days_overdue = _days_since(db, ranked.c.date, today) - interval_days
+    never_maintained = case((ranked.c.date.is_(None), 0), else_=1)
+    
+    page = select(
+        Machine.id.label("machine_id"),
+        Machine.name,
+        Machine.type,
+        Machine.location,
+        Machine.status,
+        ranked.c.date.label("last_maintenance"),
+        interval_days.label("interval_days"),
+        days_overdue.label("days_overdue"),
+        func.row_number().over(
+            order_by=(never_maintained, days_overdue.desc(), Machine.id)
+        ).label("urgency")
+    ).select_from(
+        Machine.__table__.outerjoin(ranked, and_(ranked.c.machine_id == Machine.id, ranked.c.rn == 1))
+    ).order_by("urgency").offset(skip).limit(limit).cte("page")
+    
+    history = select(
+        page,
+        ranked.c.date.label("history_date"),
+        ranked.c.type.label("history_type"),
+        ranked.c.description.label("history_description")
+    ).select_from(
+        page.outerjoin(ranked, and_(ranked.c.machine_id == page.c.machine_id, ranked.c.rn <= history_limit))
+    ).order_by(page.c.urgency, ranked.c.rn)
+    
+    schedule = []
+    entries = {}
+    for row in db.execute(history):
+        entry = entries.get(row.machine_id)
+        if entry is None:
+            last_maintenance = row.last_maintenance
+            if isinstance(last_maintenance, str):
+                last_maintenance = date.fromisoformat(last_maintenance)
+            entry = {
+                "machine_id": row.machine_id,
+                "name": row.name,
+                "type": row.type,
+                "location": row.location,
+                "status": row.status,
+                "last_maintenance": last_maintenance,
+                "next_due": last_maintenance + timedelta(days=row.interval_days) if last_maintenance else None,
+                "days_overdue": row.days_overdue,
+                "maintenance_interval": row.interval_days,
+                "maintenance_history": []
+            }
+            entries[row.machine_id] = entry
+            schedule.append(entry)
+        if row.history_date is not None:
+            entry["maintenance_history"].append({
+                "date": row.history_date,
+                "type": row.history_type,
+                "description": row.history_description
+            })
+    
+    return schedule
\ No newline at end of file
@@ -0,0 +1,62 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, literal, select, union_all
+from typing import Dict, List, Optional, Sequence
+from datetime import datetime
+
+from app.models.prediction import Prediction
+
+# Per-machine lookups combined into one statement (SQLite allows 500 compound terms)
+LOOKUPS_PER_STATEMENT = 200
+
+def get_latest_prediction(db: Session, machine_id: int) -> Optional[Prediction]:
+    """Get the most recent stored prediction for a machine"""
+    return db.query(Prediction).filter(
+        Prediction.machine_id == machine_id
+    ).order_by(Prediction.timestamp.desc()).first()
+
+def get_prediction_history(
+    db: Session,
+    machine_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 1000
+) -> List[Prediction]:
+    """Get stored predictions for a machine, oldest first"""
+    query = db.query(Prediction).filter(Prediction.machine_id == machine_id)
+    
+    if start_date:
+        query = query.filter(Prediction.timestamp >= start_date)
+    if end_date:
+        query = query.filter(Prediction.timestamp <= end_date)
+    
+    # The newest predictions when the range holds more than the limit
+    newest = query.order_by(Prediction.timestamp.desc()).limit(limit).all()
+    return newest[::-1]
+
+def get_scored_as_of(db: Session, machine_ids: Sequence[int]) -> Dict[int, datetime]:
+    """Get the newest reading timestamp already scored for each machine
+
+    Each machine's maximum is one seek on the (machine_id, as_of) index, so
+    the cost does not grow with the prediction history.
+    """
+    scored = {}
+    machine_ids = list(machine_ids)
+    for start in range(0, len(machine_ids), LOOKUPS_PER_STATEMENT):
+        lookups = [
+            select(
+                literal(machine_id),
+                select(func.max(Prediction.as_of))
+                .where(Prediction.machine_id == machine_id)
+                .scalar_subquery()
+            )
+            for machine_id in machine_ids[start:start + LOOKUPS_PER_STATEMENT]
+        ]
+        rows = db.execute(union_all(*lookups)).all()
+        scored.update((machine_id, as_of) for machine_id, as_of in rows if as_of is not None)
+    return scored
+
+def create_predictions(db: Session, predictions: List[dict]) -> None:
+    """Store a batch of predictions with one executemany"""
+    if predictions:
+        db.execute(insert(Prediction), predictions)
+        db.commit()
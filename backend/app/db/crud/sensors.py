@@ -1,11 +1,19 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 from app.models.sensor import SensorData
 from app.schemas.sensor import SensorDataCreate, SensorDataCreateBase
+from app.utils.timing import span
+
+# Columns exposed by the sensor data read endpoints, in response order
+SENSOR_DATA_COLUMNS = (
+    'id', 'machine_id', 'timestamp', 'temperature', 'vibration',
+    'pressure', 'rpm', 'voltage', 'current', 'noise_level'
+)
 
 def get_sensor_data(
     db: Session, 
@@ -24,6 +32,31 @@ def get_sensor_data(
     
     return query.order_by(SensorData.timestamp.desc()).limit(limit).all()
 
+def get_sensor_data_columns(
+    db: Session, 
+    machine_id: int, 
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 100
+) -> Dict[str, List[Any]]:
+    """Get sensor data for a machine as one list per column
+    
+    Selects plain column tuples instead of ORM objects and transposes them,
+    so no per-row objects or dicts are built for large ranges.
+    """
+    query = select(*[getattr(SensorData, column) for column in SENSOR_DATA_COLUMNS]).where(
+        SensorData.machine_id == machine_id
+    )
+    
+    if start_date:
+        query = query.where(SensorData.timestamp >= start_date)
+    if end_date:
+        query = query.where(SensorData.timestamp <= end_date)
+    
+    rows = db.execute(query.order_by(SensorData.timestamp.desc()).limit(limit)).all()
+    values = list(zip(*rows)) if rows else [() for _ in SENSOR_DATA_COLUMNS]
+    return {column: list(column_values) for column, column_values in zip(SENSOR_DATA_COLUMNS, values)}
+
 def get_recent_sensor_data(db: Session, machine_id: int, limit: int = 100) -> List[SensorData]:
     """Get the most recent sensor data for a machine"""
     return db.query(SensorData).filter(
@@ -85,6 +118,21 @@ def create_sensor_data_batch(
     
     return db_readings
 
+def create_sensor_data_columns(
+    db: Session,
+    columns: Dict[str, np.ndarray]
+) -> int:
+    """Record a batch of readings given as one validated array per column, with one executemany"""
+    names = SENSOR_DATA_COLUMNS[1:]
+    lists = [columns['machine_id'].tolist(), pd.DatetimeIndex(columns['timestamp']).to_pydatetime().tolist()]
+    # NaN marks a missing optional reading, stored as NULL
+    lists += [np.where(np.isnan(columns[sensor]), None, columns[sensor]).tolist() for sensor in names[2:]]
+    
+    # A Core insert on the table skips the ORM's per-row bookkeeping
+    db.execute(insert(SensorData.__table__), [dict(zip(names, row)) for row in zip(*lists)])
+    db.commit()
+    return len(lists[0])
+
 def get_sensor_stats(
     db: Session, 
     machine_id: int, 
@@ -98,6 +146,16 @@ def get_sensor_stats(
     if not data:
         return None
     
+    with span("pandas"):
+        return _calculate_sensor_stats(data, machine_id, start_date, end_date)
+
+def _calculate_sensor_stats(
+    data: List[SensorData],
+    machine_id: int,
+    start_date: datetime,
+    end_date: datetime
+) -> Dict[str, Any]:
+    """Calculate statistical metrics for a list of sensor readings"""
     # Convert to DataFrame for easier statistical analysis
     df = pd.DataFrame([{
         'timestamp': item.timestamp,
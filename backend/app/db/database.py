@@ -1,13 +1,38 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.profiles import get_storage_profile
 
-# Create SQLAlchemy engine using the database URL from settings
-engine = create_engine(
-    settings.DATABASE_URL or "sqlite:///./predictive_maintenance.db",
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL is None else {},
-)
+DATABASE_URL = settings.DATABASE_URL or "sqlite:///./predictive_maintenance.db"
+
+def create_db_engine(url: str, profile_name: str):
+    """Create an engine tuned with the given storage profile"""
+    profile = get_storage_profile(profile_name)
+    
+    if url.startswith("sqlite"):
+        # In-memory databases use a single shared connection and take no pool options
+        in_memory = url in ("sqlite://", "sqlite:///:memory:")
+        db_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            **({} if in_memory else profile["sqlite_engine"])
+        )
+        pragmas = profile["sqlite_pragmas"]
+        if pragmas:
+            @event.listens_for(db_engine, "connect")
+            def apply_sqlite_pragmas(dbapi_connection, connection_record):
+                """Apply the profile's pragmas to each new SQLite connection"""
+                cursor = dbapi_connection.cursor()
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+                cursor.close()
+        return db_engine
+    
+    return create_engine(url, **profile["postgres_engine"])
+
+# Create SQLAlchemy engine using the database URL and storage profile from settings
+engine = create_db_engine(DATABASE_URL, settings.STORAGE_PROFILE)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -21,4 +46,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def create_missing_indexes(bind=None, tables=None) -> None:
+    """Create indexes added to models after their tables were created"""
+    for table in tables if tables is not None else Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind or engine, checkfirst=True)
\ No newline at end of file
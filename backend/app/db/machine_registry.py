@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.machine import Machine
+from app.utils.shared_state import DERIVED_STATUSES, STATUS_CODES, fleet_state
+
+# Cached subset of a machine row
+MachineInfo = namedtuple("MachineInfo", ["id", "status", "type", "location"])
+
+# Distinct (type, location) filters whose status counts are cached
+MAX_CACHED_COUNTS = 256
+
+# Unknown machine IDs remembered; the least recently looked up are dropped beyond this
+MAX_CACHED_MISSES = 10000
+
+class MachineRegistry:
+    """In-process cache of machine ID to status, type and location
+
+    Every machine write bumps a version number. Cached misses are only
+    trusted for the version they were recorded at, and a row loaded while a
+    write was in flight is not cached, so the cache never resurrects a
+    deleted machine or hides a newly created one. At most MAX_CACHED_MISSES
+    unknown IDs are remembered, so requests for arbitrary IDs cannot grow
+    the cache without bound.
+
+    Writes are also counted in the fleet state shared by all workers. A
+    worker that sees another worker's write drops its whole cache, and
+    statuses it learns are published to the shared fleet state.
+
+    Per-status machine counts are cached per (type, location) filter and
+    dropped on every write.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, MachineInfo] = {}
+        self._missing: "OrderedDict[int, None]" = OrderedDict()
+        self._counts: Dict[Tuple[Optional[str], Optional[str]], Dict[str, int]] = {}
+        self._version = 0
+        self._shared_version = fleet_state.registry_version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.count_hits = 0
+        self.count_misses = 0
+
+    @property
+    def version(self) -> int:
+        """Current registry version"""
+        return self._version
+
+    def get(self, db: Session, machine_id: int) -> Optional[MachineInfo]:
+        """Get cached machine info, loading it from the database on a miss"""
+        self._sync()
+        entry = self._entries.get(machine_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        if machine_id in self._missing:
+            with self._lock:
+                if machine_id in self._missing:
+                    self._missing.move_to_end(machine_id)
+            self.hits += 1
+            return None
+
+        self.misses += 1
+        version = self._version
+        row = db.execute(
+            select(Machine.id, Machine.status, Machine.type, Machine.location).where(Machine.id == machine_id)
+        ).first()
+        entry = MachineInfo(*row) if row else None
+
+        with self._lock:
+            if version == self._version:
+                if entry is None:
+                    self._missing[machine_id] = None
+                    if len(self._missing) > MAX_CACHED_MISSES:
+                        self._missing.popitem(last=False)
+                else:
+                    self._entries[machine_id] = entry
+        if entry is not None:
+            fleet_state.set_status(entry.id, entry.status)
+        return entry
+
+    def status_counts(self, db: Session, type: Optional[str] = None, location: Optional[str] = None) -> Dict[str, int]:
+        """Get the number of machines per status, optionally for one type and location"""
+        self._sync()
+        key = (type, location)
+        counts = self._counts.get(key)
+        if counts is not None:
+            self.count_hits += 1
+            return counts
+
+        self.count_misses += 1
+        version = self._version
+        query = select(Machine.status, func.count()).group_by(Machine.status)
+        if type is not None:
+            query = query.where(Machine.type == type)
+        if location is not None:
+            query = query.where(Machine.location == location)
+        counts = dict.fromkeys(STATUS_CODES, 0)
+        for status, count in db.execute(query):
+            counts[status or "operational"] = counts.get(status or "operational", 0) + count
+
+        with self._lock:
+            if version == self._version:
+                if len(self._counts) >= MAX_CACHED_COUNTS:
+                    self._counts.clear()
+                self._counts[key] = counts
+        return counts
+
+    def put(self, machine: Machine) -> None:
+        """Record the committed state of a machine after a write"""
+        with self._lock:
+            self._publish()
+            self._version += 1
+            self._missing.clear()
+            self._counts.clear()
+            self._entries[machine.id] = MachineInfo(machine.id, machine.status, machine.type, machine.location)
+        fleet_state.set_status(machine.id, machine.status)
+
+    def invalidate(self, machine_id: Optional[int] = None) -> None:
+        """Drop one machine, or every machine, after a write"""
+        with self._lock:
+            self._publish()
+            self._version += 1
+            self._missing.clear()
+            self._counts.clear()
+            if machine_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(machine_id, None)
+        if machine_id is not None:
+            fleet_state.set_status(machine_id, None)
+
+    def update_statuses(self, statuses: Dict[int, str]) -> None:
+        """Record committed status changes of many machines"""
+        with self._lock:
+            self._publish()
+            self._version += 1
+            self._counts.clear()
+            for machine_id, status in statuses.items():
+                entry = self._entries.get(machine_id)
+                if entry is not None and entry.status != status and (entry.status or "operational") in DERIVED_STATUSES:
+                    self._entries[machine_id] = entry._replace(status=status)
+
+    def _sync(self) -> None:
+        """Drop the cache if another worker wrote since we last looked"""
+        if fleet_state.registry_version != self._shared_version:
+            with self._lock:
+                self._clear()
+                self._shared_version = fleet_state.registry_version
+
+    def _clear(self) -> None:
+        """Drop every cached entry; call with the lock held"""
+        self._version += 1
+        self._missing.clear()
+        self._entries.clear()
+        self._counts.clear()
+
+    def _publish(self) -> None:
+        """Count a write fleet-wide; call with the lock held"""
+        shared_version = fleet_state.bump_registry_version()
+        # Another worker wrote since we last looked, so our cache is stale too
+        if shared_version != self._shared_version + 1:
+            self._clear()
+        self._shared_version = shared_version
+
+# Registry shared by all requests in this process
+machine_registry = MachineRegistry()
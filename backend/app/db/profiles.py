@@ -0,0 +1,46 @@
+from typing import Any, Dict
+
+# Storage profiles selectable with the STORAGE_PROFILE setting.
+#
+# "sqlite_pragmas" are applied to every new SQLite connection and
+# "sqlite_engine" / "postgres_engine" are passed to create_engine.
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLAlchemy and driver defaults
+    "default": {
+        "sqlite_pragmas": {},
+        "sqlite_engine": {},
+        "postgres_engine": {},
+    },
+    # Concurrent readers and writers under sustained ingest
+    "production": {
+        "sqlite_pragmas": {
+            "auto_vacuum": "INCREMENTAL",  # Takes effect on newly created databases
+            "journal_mode": "WAL",  # Readers no longer block on the writer
+            "synchronous": "NORMAL",  # Durable at checkpoints, safe with WAL
+            "mmap_size": 268435456,  # 256 MiB memory-mapped reads
+            "cache_size": -65536,  # 64 MiB page cache (negative means KiB)
+            "busy_timeout": 5000,  # Wait for the write lock instead of failing
+            "temp_store": "MEMORY",
+        },
+        "sqlite_engine": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_pre_ping": False,
+        },
+        "postgres_engine": {
+            "pool_size": 20,
+            "max_overflow": 10,
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            "query_cache_size": 1200,  # Compiled statement cache entries
+        },
+    },
+}
+
+def get_storage_profile(name: str) -> Dict[str, Any]:
+    """Get a storage profile by name"""
+    try:
+        return STORAGE_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage profile '{name}'. Must be one of: {', '.join(STORAGE_PROFILES)}")
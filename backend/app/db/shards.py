@@ -0,0 +1,209 @@
+"""
+Sharded storage of per-machine sensor data
+
+Machines, maintenance records, predictions and import jobs stay in the
+main database (DATABASE_URL). Sensor readings and the tables derived from
+them (hourly sketches and rollups) live on the shard of their machine, so
+ingest for machines on different shards never contends for the same write
+lock and write throughput grows with SHARD_URLS.
+
+A machine's shard is its ID modulo the shard count, or with
+SHARD_KEY=location, its location's entry in SHARD_LOCATIONS (a hash of the
+location if it has none), so each plant can write to a database of its own.
+
+Sessions are routed with ``Session.bind_table``: a session bound to a shard
+reads and writes the sharded tables there and everything else in the main
+database, so the CRUD functions work unchanged. Fleet-wide reads fan out
+to every shard in parallel and merge the results.
+
+Without SHARD_URLS there is a single shard, the main database, and every
+helper here degrades to working on the session it is given.
+"""
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, create_db_engine, engine
+from app.db.machine_registry import machine_registry
+from app.models.sensor import SensorData
+from app.models.sensor_rollup import SensorDataRollup
+from app.models.sensor_sketch import SensorSketch
+
+logger = logging.getLogger(__name__)
+
+SHARD_KEYS = ("machine", "location")
+
+# Tables stored on the shard of their machine
+SHARDED_TABLES = [SensorData.__table__, SensorSketch.__table__, SensorDataRollup.__table__]
+
+class ShardRouter:
+    """Routes machines to shards and runs work on one or all of them"""
+
+    def __init__(self, main_engine, urls: Sequence[str], key: str = "machine",
+                 locations: Optional[Dict[str, int]] = None, fanout_threads: int = 16):
+        if key not in SHARD_KEYS:
+            raise ValueError(f"Shard key must be one of {', '.join(SHARD_KEYS)}")
+        locations = locations or {}
+        invalid = [location for location, shard in locations.items() if not 0 <= shard < max(len(urls), 1)]
+        if invalid:
+            raise ValueError(f"Shard index out of range for locations: {', '.join(invalid)}")
+
+        self.sharded = bool(urls)
+        self.engines = [create_db_engine(url, settings.STORAGE_PROFILE) for url in urls] or [main_engine]
+        self.key = key
+        self.locations = dict(locations)
+        self.fanout_threads = fanout_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Number of shards"""
+        return len(self.engines)
+
+    def shard_of(self, machine_id: int, location: Optional[str] = None) -> int:
+        """Shard of a machine, given its location when sharding by location"""
+        if not self.sharded:
+            return 0
+        if self.key == "location" and location is not None:
+            shard = self.locations.get(location)
+            if shard is None:
+                shard = zlib.crc32(location.encode()) % self.count
+            return shard
+        return machine_id % self.count
+
+    def locate(self, db: Session, machine_id: int) -> int:
+        """Shard of a machine, looking up its location in the machine registry if needed"""
+        if not self.sharded or self.key == "machine":
+            return self.shard_of(machine_id)
+        machine = machine_registry.get(db, machine_id)
+        return self.shard_of(machine_id, machine.location if machine else None)
+
+    def assign(self, db: Session, machine_ids: np.ndarray) -> np.ndarray:
+        """Shard of each entry of an array of machine IDs"""
+        if not self.sharded:
+            return np.zeros(len(machine_ids), dtype=np.int64)
+        unique_ids, inverse = np.unique(machine_ids, return_inverse=True)
+        shards = np.array([self.locate(db, machine_id) for machine_id in unique_ids.tolist()], dtype=np.int64)
+        return shards[inverse]
+
+    def group(self, db: Session, machine_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Machine IDs per shard, in their original order"""
+        groups: Dict[int, List[int]] = {}
+        for machine_id in machine_ids:
+            groups.setdefault(self.locate(db, machine_id), []).append(machine_id)
+        return groups
+
+    def bind(self, db: Session, shard: int) -> Session:
+        """Route a session's sharded tables to a shard"""
+        if self.sharded:
+            for table in SHARDED_TABLES:
+                db.bind_table(table, self.engines[shard])
+        return db
+
+    def bind_machine(self, db: Session, machine_id: int) -> Session:
+        """Route a session's sharded tables to a machine's shard"""
+        return self.bind(db, self.locate(db, machine_id))
+
+    def session(self, shard: int) -> Session:
+        """New session routed to a shard"""
+        return self.bind(SessionLocal(), shard)
+
+    def map(self, func: Callable[[Session, Any], Any], work: Dict[int, Any], db: Optional[Session] = None,
+            return_exceptions: bool = False) -> Dict[int, Any]:
+        """
+        Call ``func(session, item)`` for each shard's item, in parallel
+
+        Each shard gets a session of its own. Without shards, the only item
+        runs on ``db`` if given, so single-database deployments keep their
+        transactions.
+
+        Args:
+            func: Work to run per shard
+            work: Item per shard index
+            db: Session to use when there are no shards
+            return_exceptions: Return a failing shard's exception as its
+                result instead of raising it after all shards finished
+
+        Returns:
+            Result per shard index
+        """
+        def call(shard: int, item):
+            if not self.sharded and db is not None:
+                return func(db, item)
+            with self.session(shard) as shard_db:
+                return func(shard_db, item)
+
+        if len(work) <= 1:
+            futures = None
+        else:
+            executor = self._get_executor()
+            futures = {shard: executor.submit(call, shard, item) for shard, item in work.items()}
+
+        results = {}
+        for shard, item in work.items():
+            try:
+                results[shard] = futures[shard].result() if futures else call(shard, item)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[shard] = e
+        return results
+
+    def scatter(self, func: Callable[..., Any], *args) -> List[Any]:
+        """Call ``func(session, *args)`` on every shard in parallel and return the results in shard order"""
+        results = self.map(lambda db, _: func(db, *args), dict.fromkeys(range(self.count)))
+        return [results[shard] for shard in range(self.count)]
+
+    def main_tables(self) -> list:
+        """Tables kept in the main database"""
+        if not self.sharded:
+            return list(Base.metadata.sorted_tables)
+        return [table for table in Base.metadata.sorted_tables if table not in SHARDED_TABLES]
+
+    def create_schema(self) -> None:
+        """Create the sharded tables and their indexes on every shard
+
+        Shards have no machines table, so the tables are created without
+        their foreign keys.
+        """
+        if not self.sharded:
+            return
+        for shard_engine in self.engines:
+            with shard_engine.begin() as connection:
+                existing = set(inspect(connection).get_table_names())
+                for table in SHARDED_TABLES:
+                    if table.name not in existing:
+                        connection.execute(CreateTable(table, include_foreign_key_constraints=[]))
+                    for index in table.indexes:
+                        index.create(connection, checkfirst=True)
+
+    def dispose(self) -> None:
+        """Close every shard's pooled connections, e.g. before forking"""
+        if self.sharded:
+            for shard_engine in self.engines:
+                shard_engine.dispose()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created on first use so no threads exist before the server forks
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.fanout_threads, thread_name_prefix="shard")
+            return self._executor
+
+# Router shared by all requests in this process
+shard_router = ShardRouter(
+    engine,
+    settings.SHARD_URLS,
+    key=settings.SHARD_KEY,
+    locations=settings.SHARD_LOCATIONS,
+    fanout_threads=settings.SHARD_FANOUT_THREADS,
+)
@@ -1,13 +1,21 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 import os
 
 from app.api.router import api_router
 from app.core.config import settings
-from app.db.database import engine, Base, get_db
-from app.ml.model import MLModel
+from app.core.events import start_background_task, start_periodic_task, stop_background_tasks
+from app.db.database import engine, Base, create_missing_indexes, get_db
+from app.db.machine_registry import machine_registry
+from app.db.shards import shard_router
+from app.ml.model import load_ml_model
+from app.services import line_protocol, prediction_scorer, retention, sketches
+from app.services.status_engine import status_engine
+from app.utils import metrics, notification, timing
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -24,28 +32,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route latency for the /metrics endpoint
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if shard_router.sharded:
+    for shard_engine in shard_router.engines:
+        metrics.instrument_engine(shard_engine)
+metrics.register_cache("machine_registry", lambda: machine_registry.hits, lambda: machine_registry.misses)
+metrics.register_cache("machine_status_counts", lambda: machine_registry.count_hits, lambda: machine_registry.count_misses)
+
+# Per-request DB/ML/serialization breakdown; queries are timed by the metrics listener
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(timing.ServerTimingMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api")
 
-# Initialize ML model at startup
-ml_model = None
+def create_schema():
+    """Create DB tables and indexes if they don't exist; sensor data tables go to the shards, if any"""
+    main_tables = shard_router.main_tables()
+    Base.metadata.create_all(bind=engine, tables=main_tables)
+    create_missing_indexes(engine, tables=main_tables)
+    shard_router.create_schema()
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on application startup"""
-    global ml_model
-    # Create DB tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # Already created by the parent process when preforked
+    create_schema()
+    
+    # Initialize ML model (already loaded when preforked)
+    ml_model = load_ml_model()
+    
+    # Track event loop responsiveness for /metrics
+    start_background_task("event-loop-lag", metrics.monitor_event_loop_lag())
+    
+    # Send alerts raised by requests in this worker, deduplicated and rate limited per worker
+    if settings.ALERTS_ENABLED:
+        start_background_task("alert-dispatcher", notification.alert_dispatcher.run(notification.create_sinks()))
+    
+    # Write status changes derived from readings received by this worker
+    if settings.STATUS_ENGINE_ENABLED:
+        start_periodic_task("status-flush", settings.STATUS_FLUSH_INTERVAL_SECONDS, status_engine.flush)
+    
+    # Write hourly quantile sketches of readings received by this worker
+    if settings.SKETCHES_ENABLED:
+        start_periodic_task("sketch-flush", settings.SKETCH_FLUSH_INTERVAL_SECONDS, sketches.sketch_accumulator.flush)
+        if settings.BACKGROUND_JOBS_ENABLED:
+            start_periodic_task("sketch-compaction", settings.SKETCH_COMPACTION_INTERVAL_SECONDS, sketches.run_compaction)
+    
+    # Accept line protocol readings from edge gateways
+    if settings.LINE_INGEST_ENABLED:
+        start_background_task("line-protocol-listener", line_protocol.create_listener().serve())
+    
+    # Score machines with new readings and store the predictions
+    if settings.BACKGROUND_JOBS_ENABLED and settings.PREDICTION_SCORER_ENABLED:
+        start_periodic_task("prediction-scorer", settings.PREDICTION_SCORE_INTERVAL_SECONDS, prediction_scorer.run_scorer, ml_model)
     
-    # Initialize ML model
-    model_path = os.path.join("data", "ml_models", "failure_prediction_model.joblib")
-    ml_model = MLModel(model_path)
-    print("ML model loaded successfully")
+    # Fold and prune expired sensor data in the background
+    if settings.BACKGROUND_JOBS_ENABLED and settings.SENSOR_RETENTION_ENABLED:
+        start_periodic_task("sensor-retention", settings.RETENTION_INTERVAL_SECONDS, retention.run_retention)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on application shutdown"""
     # Close any open connections or resources
+    await stop_background_tasks()
+    if settings.STATUS_ENGINE_ENABLED:
+        await run_in_threadpool(status_engine.flush)
+    if settings.SKETCHES_ENABLED:
+        await run_in_threadpool(sketches.sketch_accumulator.flush)
     print("Application shutting down")
 
 @app.get("/")
@@ -53,7 +109,7 @@ async def root():
     """Root endpoint for health check"""
     return {"status": "online", "message": "Predictive Maintenance API is running"}
 
-# Make ML model available to endpoints
-def get_ml_model():
-    """Dependency to provide ML model to endpoints"""
-    return ml_model
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,29 @@
+from typing import Dict
+
+import numpy as np
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+
+def evaluate_classifier(y_true: np.ndarray, probabilities: np.ndarray, threshold: float = 0.5) -> Dict[str, float]:
+    """
+    Score failure predictions against labels
+
+    Args:
+        y_true: Binary labels
+        probabilities: Predicted failure probabilities
+        threshold: Probability above which a failure is predicted
+
+    Returns:
+        Dictionary of evaluation metrics
+    """
+    predicted = probabilities >= threshold
+    metrics = {
+        "samples": int(len(y_true)),
+        "positive_rate": float(np.mean(y_true)) if len(y_true) else 0.0,
+        "precision": float(precision_score(y_true, predicted, zero_division=0)),
+        "recall": float(recall_score(y_true, predicted, zero_division=0)),
+        "f1": float(f1_score(y_true, predicted, zero_division=0)),
+    }
+    # AUC is undefined when only one class is present
+    if len(np.unique(y_true)) == 2:
+        metrics["roc_auc"] = float(roc_auc_score(y_true, probabilities))
+    return metrics
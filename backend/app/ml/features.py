@@ -0,0 +1,220 @@
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.core.config import settings
+
+SENSOR_COLUMNS = ['temperature', 'vibration', 'pressure', 'rpm', 'voltage', 'current', 'noise_level']
+
+# Statistics computed per sensor and window, in feature column order
+STATISTICS = ['mean', 'std', 'slope', 'ptp', 'roc']
+
+DEFAULT_WINDOWS = (10, 60)
+
+# Windows evaluated per block in batch mode, bounding temporary memory
+BLOCK_ROWS = 8192
+
+def feature_names(windows: Sequence[int] = DEFAULT_WINDOWS) -> List[str]:
+    """Names of the feature columns for a set of windows"""
+    return [
+        f"{sensor}_{statistic}_{window}"
+        for window in windows
+        for sensor in SENSOR_COLUMNS
+        for statistic in STATISTICS
+    ]
+
+def _window_statistics(view: np.ndarray) -> np.ndarray:
+    """
+    Statistics over the last axis of a (rows, sensors, window) array
+
+    Returns:
+        Array of shape (rows, sensors * len(STATISTICS))
+    """
+    # Reductions over a contiguous last axis are much faster than over the strided view
+    view = np.ascontiguousarray(view)
+    window = view.shape[-1]
+    mean = view.mean(axis=-1)
+    centered = view - mean[..., None]
+    std = np.sqrt((centered ** 2).mean(axis=-1))
+
+    # Least-squares slope per reading against a centered time axis
+    steps = np.arange(window) - (window - 1) / 2.0
+    denominator = (steps ** 2).sum()
+    slope = (centered * steps).sum(axis=-1) / denominator if denominator else np.zeros_like(mean)
+
+    ptp = view.max(axis=-1) - view.min(axis=-1)
+
+    # Relative change from the first to the last reading of the window
+    first, last = view[..., 0], view[..., -1]
+    roc = np.divide(last - first, np.abs(first), out=np.zeros_like(first), where=first != 0)
+
+    return np.stack([mean, std, slope, ptp, roc], axis=-1).reshape(len(view), -1)
+
+def compute_features(values: np.ndarray, windows: Sequence[int] = DEFAULT_WINDOWS, stride: int = 1) -> np.ndarray:
+    """
+    Rolling-window features for every reading with a full longest window
+
+    Windows are strided views over the readings, so windows are only copied
+    block by block while their statistics are computed.
+
+    Args:
+        values: Readings of shape (readings, sensors) in SENSOR_COLUMNS order, oldest first
+        windows: Window lengths in readings
+        stride: Emit features for every stride-th reading
+
+    Returns:
+        Array of shape (rows, len(feature_names(windows))), one row per
+        reading from index max(windows) - 1 onward, every stride-th
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    longest = max(windows)
+    width = len(SENSOR_COLUMNS) * len(STATISTICS) * len(windows)
+    if len(values) < longest:
+        return np.empty((0, width))
+
+    # Each window's views are aligned so row i ends at the same reading
+    views = [sliding_window_view(values, window, axis=0)[longest - window::stride] for window in windows]
+    rows = len(views[0])
+    output = np.empty((rows, width))
+    block_width = width // len(windows)
+    for start in range(0, rows, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, rows)
+        for index, view in enumerate(views):
+            output[start:stop, index * block_width:(index + 1) * block_width] = _window_statistics(view[start:stop])
+    return output
+
+def latest_features(values: np.ndarray, windows: Sequence[int] = DEFAULT_WINDOWS) -> np.ndarray:
+    """
+    Features as of the newest reading of many series at once
+
+    Args:
+        values: Array of shape (series, readings, sensors), oldest first,
+            with at least max(windows) readings and no missing values
+        windows: Window lengths in readings
+
+    Returns:
+        Array of shape (series, len(feature_names(windows))), the same as
+        the last row of compute_features for each series
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.hstack([
+        _window_statistics(values[:, -window:, :].transpose(0, 2, 1))
+        for window in windows
+    ])
+
+def _forward_fill(values: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Replace NaN with the last earlier value in each column, starting from previous"""
+    values = np.vstack([previous, values])
+    positions = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(positions, axis=0, out=positions)
+    return values[positions, np.arange(values.shape[1])][1:]
+
+def _reading_values(readings: Sequence[dict]) -> np.ndarray:
+    """Array of shape (readings, sensors) from reading dictionaries keyed by sensor name"""
+    return np.array(
+        [[reading.get(sensor) for sensor in SENSOR_COLUMNS] for reading in readings], dtype=np.float64
+    ).reshape(len(readings), len(SENSOR_COLUMNS))
+
+class FeatureState:
+    """Most recent readings of one machine, for incremental feature updates"""
+
+    def __init__(self, windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.windows = tuple(windows)
+        self.longest = max(self.windows)
+        self.count = 0
+        self._buffer = np.zeros((self.longest, len(SENSOR_COLUMNS)))
+        self._last = np.full(len(SENSOR_COLUMNS), np.nan)
+        self._features: Optional[np.ndarray] = None
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        Add readings, oldest first
+
+        Missing values (NaN) carry the machine's previous value forward, or
+        zero before any value was seen, as in batch preprocessing. Features
+        are recomputed on the next read, so ingest only pays for the append.
+
+        Args:
+            values: Array of shape (readings, sensors) or (sensors,)
+        """
+        values = _forward_fill(np.atleast_2d(np.asarray(values, dtype=np.float64)), self._last)
+        self._last = values[-1]
+        values = np.nan_to_num(values, nan=0.0)
+
+        if len(values) >= self.longest:
+            self._buffer = np.ascontiguousarray(values[-self.longest:])
+        else:
+            self._buffer = np.concatenate([self._buffer[len(values):], values])
+        self.count += len(values)
+        self._features = None
+
+    def features(self) -> Optional[np.ndarray]:
+        """Features as of the newest reading, or None until the longest window is full"""
+        if self.count < self.longest:
+            return None
+        if self._features is None:
+            self._features = compute_features(self._buffer, self.windows)[-1]
+        return self._features
+
+class IncrementalFeatureEngine:
+    """Per-machine feature states updated as readings are ingested"""
+
+    def __init__(self, windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.windows = tuple(windows)
+        self.names = feature_names(self.windows)
+        self._states: Dict[int, FeatureState] = {}
+        self._lock = threading.Lock()
+
+    def update(self, machine_id: int, readings: Sequence[dict]) -> None:
+        """
+        Add a machine's new readings, oldest first
+
+        Args:
+            machine_id: Machine the readings belong to
+            readings: Reading dictionaries keyed by sensor name
+        """
+        self.update_values(machine_id, _reading_values(readings))
+
+    def update_values(self, machine_id: int, values: np.ndarray) -> None:
+        """
+        Add a machine's new readings given as an array, oldest first
+
+        Args:
+            machine_id: Machine the readings belong to
+            values: Array of shape (readings, sensors) in SENSOR_COLUMNS order, NaN where missing
+        """
+        with self._lock:
+            state = self._states.get(machine_id)
+            if state is None:
+                state = self._states[machine_id] = FeatureState(self.windows)
+            state.update(values)
+
+    def latest(self, machine_id: int) -> Optional[Dict[str, float]]:
+        """Current features of a machine, or None if its window is not yet full"""
+        with self._lock:
+            state = self._states.get(machine_id)
+            features = state.features() if state is not None else None
+        return self._as_dict(features)
+
+    def prime(self, machine_id: int, readings: Sequence[dict]) -> None:
+        """
+        Replace a machine's state with its most recent stored readings, oldest first
+
+        Used when the readings this process has seen do not fill the windows,
+        e.g. after a restart; the stored history already includes them.
+        """
+        state = FeatureState(self.windows)
+        if readings:
+            state.update(_reading_values(readings))
+        with self._lock:
+            self._states[machine_id] = state
+
+    def _as_dict(self, features: Optional[np.ndarray]) -> Optional[Dict[str, float]]:
+        if features is None:
+            return None
+        return dict(zip(self.names, features.tolist()))
+
+# Features updated by the ingest endpoints in this process
+feature_engine = IncrementalFeatureEngine(settings.FEATURE_WINDOWS)
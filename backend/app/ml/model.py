@@ -4,6 +4,10 @@ import pandas as pd
 from typing import Dict, List, Tuple, Optional, Union
 import os
 
+from app.core.config import settings
+from app.ml import preprocessing
+from app.utils.metrics import ML_INFERENCE_DURATION, timed
+
 class MLModel:
     """Machine Learning model for predictive maintenance"""
     
@@ -14,14 +18,27 @@ class MLModel:
             model_path: Path to the saved model file
         """
         self.model_path = model_path
-        self.model = self._load_model()
         self.feature_names = ['temperature', 'vibration', 'pressure', 'rpm', 'voltage', 'current', 'noise_level']
+        # Set when the model was trained on window features (see app.ml.training)
+        self.feature_windows = None
+        self.version = None
+        self.model = self._load_model()
     
     def _load_model(self):
         """Load the trained model from disk"""
         if os.path.exists(self.model_path):
             try:
-                return joblib.load(self.model_path)
+                artifact = joblib.load(self.model_path)
+                if isinstance(artifact, dict):
+                    if "feature_windows" not in artifact:
+                        print("Model artifact predates the feature engine, using dummy model")
+                        return DummyModel()
+                    self.feature_names = artifact["feature_names"]
+                    self.feature_windows = artifact["feature_windows"]
+                    self.version = artifact.get("version")
+                    print(f"Loaded model version {self.version}")
+                    return artifact["model"]
+                return artifact
             except Exception as e:
                 print(f"Error loading model: {e}")
                 # Return dummy model in case loading fails
@@ -30,6 +47,7 @@ class MLModel:
             print(f"Model file not found at {self.model_path}, using dummy model")
             return DummyModel()
     
+    @timed(ML_INFERENCE_DURATION, "predict_failure")
     def predict_failure(self, sensor_data: List[Dict]) -> Dict:
         """Predict likelihood of failure based on sensor readings
         
@@ -42,13 +60,17 @@ class MLModel:
         # Convert sensor data to DataFrame
         df = pd.DataFrame(sensor_data)
         
-        # Ensure all required features are present
-        for feature in self.feature_names:
-            if feature not in df.columns:
-                df[feature] = 0.0
-        
-        # Extract features for prediction
-        X = df[self.feature_names].values
+        if self.feature_windows:
+            # Window-feature model: score the features as of the newest reading
+            X = preprocessing.latest_window_features(df, self.feature_windows)
+        else:
+            # Ensure all required features are present
+            for feature in self.feature_names:
+                if feature not in df.columns:
+                    df[feature] = 0.0
+            
+            # Extract features for prediction
+            X = df[self.feature_names].values
         
         # Make prediction
         failure_prob = self.model.predict_proba(X)[:, 1]
@@ -61,6 +83,41 @@ class MLModel:
             "timeframe": "7 days",  # Prediction timeframe
         }
     
+    @timed(ML_INFERENCE_DURATION, "predict_failure_batch")
+    def predict_failure_batch(self, sensor_data: pd.DataFrame) -> pd.DataFrame:
+        """Predict likelihood of failure for many machines with one model call
+        
+        Args:
+            sensor_data: Recent sensor readings of many machines, with
+                machine_id and timestamp columns
+        
+        Returns:
+            DataFrame with one row per machine, with the same values
+            predict_failure gives for that machine's readings
+        """
+        if self.feature_windows:
+            # One feature row per machine, as of its newest reading
+            machine_ids, X = preprocessing.latest_window_features_batch(sensor_data, self.feature_windows)
+            failure_prob = self.model.predict_proba(X)[:, 1]
+        else:
+            # Score every reading and average them per machine
+            df = sensor_data.sort_values('machine_id', kind='stable')
+            for feature in self.feature_names:
+                if feature not in df.columns:
+                    df[feature] = 0.0
+            machine_ids, starts, counts = np.unique(df['machine_id'].to_numpy(), return_index=True, return_counts=True)
+            reading_prob = self.model.predict_proba(df[self.feature_names].values)[:, 1]
+            failure_prob = np.add.reduceat(reading_prob, starts) / counts
+        failure_threshold = 0.5
+        
+        return pd.DataFrame({
+            "machine_id": machine_ids,
+            "failure_probability": failure_prob,
+            "is_failure_predicted": failure_prob > failure_threshold,
+            "prediction_confidence": np.abs(0.5 - failure_prob) * 2,
+        })
+    
+    @timed(ML_INFERENCE_DURATION, "detect_anomalies")
     def detect_anomalies(self, sensor_data: List[Dict]) -> Dict:
         """Detect anomalies in sensor data
         
@@ -106,6 +163,7 @@ class MLModel:
             "analysis_timestamp": pd.Timestamp.now().isoformat()
         }
     
+    @timed(ML_INFERENCE_DURATION, "get_health_score")
     def get_health_score(self, sensor_data: List[Dict]) -> Dict:
         """Calculate machine health score based on sensor data
         
@@ -166,4 +224,23 @@ class DummyModel:
     def predict_proba(self, X):
         """Return random probabilities"""
         n_samples = X.shape[0]
-        return np.random.random((n_samples, 2))
\ No newline at end of file
+        return np.random.random((n_samples, 2))
+
+# Model shared by all requests in this process
+_ml_model: Optional[MLModel] = None
+
+def load_ml_model() -> MLModel:
+    """Load the ML model once per process
+    
+    The preforked server (app.server) calls this before forking so workers
+    share the loaded model's memory.
+    """
+    global _ml_model
+    if _ml_model is None:
+        _ml_model = MLModel(settings.MODEL_PATH)
+        print("ML model loaded successfully")
+    return _ml_model
+
+def detect_anomalies(reading: Dict) -> Dict:
+    """Detect anomalies in a single sensor reading with the shared model"""
+    return load_ml_model().detect_anomalies([reading])
@@ -0,0 +1,108 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.ml import features
+from app.ml.features import SENSOR_COLUMNS
+
+def feature_names(windows: Sequence[int] = features.DEFAULT_WINDOWS) -> List[str]:
+    """Names of the window features, in column order"""
+    return features.feature_names(windows)
+
+def prepare_readings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Order readings by time and fill gaps in the sensor columns
+
+    Args:
+        df: Sensor readings with a timestamp column
+
+    Returns:
+        Readings sorted by timestamp with every sensor column present
+    """
+    df = df.sort_values('timestamp').reset_index(drop=True)
+    for column in SENSOR_COLUMNS:
+        if column not in df.columns:
+            df[column] = np.nan
+    # Optional sensors are often missing; carry the last value, else zero
+    df[SENSOR_COLUMNS] = df[SENSOR_COLUMNS].astype('float64').ffill().fillna(0.0)
+    return df
+
+def window_features(df: pd.DataFrame, windows: Sequence[int], stride: int = 1) -> pd.DataFrame:
+    """
+    Compute rolling-window features for readings with a full longest window
+
+    Args:
+        df: Readings as returned by prepare_readings
+        windows: Window lengths in readings
+        stride: Emit a feature row for every stride-th reading
+
+    Returns:
+        Feature rows indexed like the readings that end each window
+    """
+    values = features.compute_features(df[SENSOR_COLUMNS].to_numpy(), windows, stride)
+    index = df.index[max(windows) - 1::stride]
+    return pd.DataFrame(values, index=index, columns=feature_names(windows))
+
+def latest_window_features(df: pd.DataFrame, windows: Sequence[int]) -> np.ndarray:
+    """
+    Compute the features as of the most recent reading, for inference
+
+    With less history than the longest window, the oldest reading is
+    repeated to fill it.
+
+    Args:
+        df: Sensor readings with a timestamp column
+        windows: Window lengths in readings
+
+    Returns:
+        Array of shape (1, number of features)
+    """
+    longest = max(windows)
+    values = prepare_readings(df)[SENSOR_COLUMNS].to_numpy()[-longest:]
+    if len(values) < longest:
+        values = np.pad(values, ((longest - len(values), 0), (0, 0)), mode='edge')
+    return features.compute_features(values, windows)[-1:]
+
+def latest_window_features_batch(df: pd.DataFrame, windows: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the features as of each machine's most recent reading, for batch inference
+
+    Gives the same rows as latest_window_features on each machine's
+    readings, but fills gaps and computes features for all machines with
+    array operations over one (machines, readings, sensors) block.
+
+    Args:
+        df: Sensor readings of many machines with machine_id and timestamp columns
+        windows: Window lengths in readings
+
+    Returns:
+        Tuple of the machine IDs in ascending order and an array of shape
+        (machines, number of features)
+    """
+    df = df.sort_values(['machine_id', 'timestamp'], kind='stable')
+    machine_ids, group, counts = np.unique(df['machine_id'].to_numpy(), return_inverse=True, return_counts=True)
+    values = np.column_stack([
+        df[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in df.columns
+        else np.full(len(df), np.nan)
+        for column in SENSOR_COLUMNS
+    ])
+
+    # Right-align each machine's readings in a block as long as the longest history
+    length = max(int(counts.max()), max(windows))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    slots = np.arange(len(df)) - starts[group] + (length - counts[group])
+    block = np.full((len(machine_ids), length, len(SENSOR_COLUMNS)), np.nan)
+    block[group, slots] = values
+
+    # Repeat each machine's oldest reading in front of it, as the edge padding does
+    first = (length - counts)[:, None]
+    positions = np.maximum(np.arange(length)[None, :], first)
+    block = np.take_along_axis(block, positions[:, :, None], axis=1)
+
+    # Carry the last value forward per machine and sensor, else zero
+    positions = np.where(np.isnan(block), 0, np.arange(length)[None, :, None])
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    block = np.nan_to_num(np.take_along_axis(block, positions, axis=1), nan=0.0)
+
+    return machine_ids, features.latest_features(block, windows)
@@ -0,0 +1,356 @@
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.db.database import DATABASE_URL
+from app.db.shards import shard_router
+from app.ml import preprocessing
+from app.ml.evaluation import evaluate_classifier
+from app.models.machine import Machine
+from app.models.maintenance import Maintenance
+from app.models.sensor import SensorData
+
+logger = logging.getLogger(__name__)
+
+# Version of the artifact dictionary layout understood by MLModel
+ARTIFACT_FORMAT = 2
+
+# Readings between the ends of consecutive training windows
+WINDOW_STRIDE = 10
+
+# A window is labeled positive if a failure is repaired this soon after it ends
+FAILURE_HORIZON_DAYS = 7
+FAILURE_MAINTENANCE_TYPES = ("corrective",)
+
+TRAINING_EPOCHS = 5
+HOLDOUT_FRACTION = 0.2
+
+# Readings read per chunk when extracting a machine's windows
+EXTRACT_CHUNK_ROWS = 100000
+
+def label_windows(window_ends: np.ndarray, failure_dates: np.ndarray, horizon_days: int) -> np.ndarray:
+    """
+    Label windows that are followed by a failure within the horizon
+
+    Args:
+        window_ends: Timestamps of the last reading of each window
+        failure_dates: Dates of corrective maintenance for the machine
+        horizon_days: Days after the window end that count as "before failure"
+
+    Returns:
+        Array of 0/1 labels, one per window
+    """
+    ends = window_ends.astype('datetime64[us]')
+    failures = np.sort(failure_dates.astype('datetime64[us]'))
+    if not len(failures):
+        return np.zeros(len(ends), dtype=np.int8)
+
+    # First failure strictly after each window end
+    index = np.searchsorted(failures, ends, side='right')
+    has_next = index < len(failures)
+    next_failure = failures[np.minimum(index, len(failures) - 1)]
+    within = next_failure - ends <= np.timedelta64(horizon_days, 'D')
+    return (has_next & within).astype(np.int8)
+
+def extract_machine_windows(database_url: str, sensor_url: str, machine_id: int, windows: Sequence[int], stride: int,
+                            horizon_days: int, spool_dir: str, chunk_rows: int = EXTRACT_CHUNK_ROWS) -> List[str]:
+    """
+    Stream one machine's history into labeled feature windows spooled to disk
+
+    Runs in a worker process, so it opens its own connections. Readings are
+    read ``chunk_rows`` at a time, and each chunk is prefixed with the last
+    ``max(windows) - 1`` readings before it, so windows spanning a chunk
+    boundary come out as if the whole history had been loaded. Each
+    chunk's windows are written to a file of their own.
+
+    Args:
+        database_url: Database to read maintenance records from
+        sensor_url: Database holding the machine's readings (its shard)
+        machine_id: Machine to extract
+        windows: Feature window lengths in readings
+        stride: Readings between window ends
+        horizon_days: Failure horizon used for labeling
+        spool_dir: Directory to write the ``.npz`` files to
+        chunk_rows: Readings read per chunk
+
+    Returns:
+        Paths of the spooled files, each holding features and labels
+    """
+    engine = create_engine(database_url, poolclass=NullPool)
+    sensor_engine = engine if sensor_url == database_url else create_engine(sensor_url, poolclass=NullPool)
+    sensor_columns = [getattr(SensorData, column) for column in preprocessing.SENSOR_COLUMNS]
+    longest = max(windows)
+    paths = []
+    try:
+        with engine.connect() as connection:
+            failure_dates = connection.execute(
+                select(Maintenance.date).where(
+                    Maintenance.machine_id == machine_id,
+                    Maintenance.type.in_(FAILURE_MAINTENANCE_TYPES)
+                )
+            ).scalars().all()
+        failure_dates = np.array(failure_dates, dtype='datetime64[D]')
+
+        # Prepared readings carried into the next chunk, and the position of the first in the history
+        carried = None
+        carried_start = 0
+        # Position of the reading ending the next window
+        next_end = longest - 1
+        with sensor_engine.connect() as connection:
+            result = connection.execute(
+                select(SensorData.timestamp, *sensor_columns)
+                .where(SensorData.machine_id == machine_id)
+                .order_by(SensorData.timestamp)
+                .execution_options(yield_per=chunk_rows)
+            )
+            for partition in result.partitions():
+                chunk = pd.DataFrame(partition, columns=['timestamp'] + preprocessing.SENSOR_COLUMNS)
+                if carried is not None:
+                    chunk = pd.concat([carried, chunk], ignore_index=True)
+                readings = preprocessing.prepare_readings(chunk)
+
+                window_readings = readings.iloc[next_end - (longest - 1) - carried_start:].reset_index(drop=True)
+                if len(window_readings) >= longest:
+                    features = preprocessing.window_features(window_readings, windows, stride)
+                    window_ends = pd.to_datetime(window_readings['timestamp']).to_numpy()[features.index]
+                    labels = label_windows(window_ends, failure_dates, horizon_days)
+                    path = Path(spool_dir) / f"{machine_id}-{len(paths)}.npz"
+                    np.savez(path, features=features.to_numpy(dtype=np.float32), labels=labels)
+                    paths.append(str(path))
+                    next_end += len(features) * stride
+
+                # Keep what the next window needs, and at least the last reading to fill gaps from
+                keep_from = min(next_end - (longest - 1) - carried_start, len(readings) - 1)
+                carried = readings.iloc[keep_from:]
+                carried_start += keep_from
+    finally:
+        sensor_engine.dispose()
+        engine.dispose()
+    return paths
+
+def iter_machine_windows(database_url: str, machines: List[Tuple[int, str]], workers: Optional[int],
+                         windows: Sequence[int], stride: int, horizon_days: int,
+                         spool_dir: str) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Extract feature windows for many machines across a process pool
+
+    At most two machines per worker are in flight, and each holds one chunk
+    of readings at a time, so memory stays bounded no matter how large the
+    fleet or a machine's history is.
+
+    Args:
+        database_url: Database to read maintenance records from
+        machines: Machine IDs with the URL of the database holding their readings
+        spool_dir: Directory the workers write feature files to
+
+    Yields:
+        Tuples of machine ID and the paths of its feature files, in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    machine_iter = iter(machines)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit_next() -> bool:
+            machine_id, sensor_url = next(machine_iter, (None, None))
+            if machine_id is None:
+                return False
+            future = pool.submit(
+                extract_machine_windows, database_url, sensor_url, machine_id, windows, stride, horizon_days, spool_dir
+            )
+            pending[future] = machine_id
+            return True
+
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                machine_id = pending.pop(future)
+                paths = future.result()
+                submit_next()
+                yield machine_id, paths
+
+def save_artifact(artifact: Dict[str, Any], output_path: Path) -> Path:
+    """
+    Write a versioned model artifact and point the live model path at it
+
+    The versioned file is kept; the live path is replaced atomically so a
+    process loading the model never sees a partial file.
+
+    Returns:
+        Path of the versioned artifact
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    versioned_path = output_path.with_name(f"{output_path.stem}-{artifact['version']}{output_path.suffix}")
+    joblib.dump(artifact, versioned_path)
+
+    staging_path = output_path.with_name(f".{output_path.name}.tmp")
+    shutil.copyfile(versioned_path, staging_path)
+    os.replace(staging_path, output_path)
+    return versioned_path
+
+def train_model(database_url: Optional[str] = None, output_path: Optional[str] = None,
+                workers: Optional[int] = None, windows: Optional[Sequence[int]] = None, stride: int = WINDOW_STRIDE,
+                horizon_days: int = FAILURE_HORIZON_DAYS, epochs: int = TRAINING_EPOCHS,
+                holdout_fraction: float = HOLDOUT_FRACTION, seed: int = 42) -> Dict[str, Any]:
+    """
+    Train the failure prediction model from sensor and maintenance history
+
+    Features are extracted per machine in parallel, a chunk of readings at
+    a time, and spooled to disk, so only one chunk's windows are in memory
+    at a time. The scaler and the
+    SGD classifier are both fitted incrementally over the spooled batches.
+    A fraction of machines is held out for evaluation. With SHARD_URLS set,
+    each machine's readings are read from its shard.
+
+    Args:
+        database_url: Database to train from (defaults to the app database)
+        output_path: Live model path (defaults to settings.MODEL_PATH)
+        workers: Feature extraction processes (defaults to the CPU count)
+        windows: Feature window lengths (defaults to settings.FEATURE_WINDOWS)
+        stride: Readings between window ends
+        horizon_days: Failure horizon used for labeling
+        epochs: Passes over the training windows
+        holdout_fraction: Fraction of machines held out for evaluation
+        seed: Random seed for the machine split and shuffling
+
+    Returns:
+        Artifact metadata, including the holdout metrics
+    """
+    database_url = database_url or DATABASE_URL
+    output_path = Path(output_path or settings.MODEL_PATH)
+    windows = list(windows or settings.FEATURE_WINDOWS)
+    rng = random.Random(seed)
+
+    engine = create_engine(database_url, poolclass=NullPool)
+    with Session(engine) as db:
+        machine_ids = db.execute(select(Machine.id).order_by(Machine.id)).scalars().all()
+        shards = shard_router.group(db, machine_ids)
+    engine.dispose()
+
+    # Readings live on the machine's shard, maintenance records in the main database
+    sensor_urls = {
+        machine_id: settings.SHARD_URLS[shard] if shard_router.sharded else database_url
+        for shard, shard_machine_ids in shards.items()
+        for machine_id in shard_machine_ids
+    }
+    machines = [(machine_id, sensor_urls[machine_id]) for machine_id in machine_ids]
+
+    shuffled = list(machine_ids)
+    rng.shuffle(shuffled)
+    holdout_count = int(len(shuffled) * holdout_fraction) if len(shuffled) > 1 else 0
+    holdout_ids = set(shuffled[:holdout_count])
+
+    scaler = StandardScaler()
+    class_counts = np.zeros(2, dtype=np.int64)
+    train_files, holdout_files = [], []
+
+    with tempfile.TemporaryDirectory(prefix="training-") as spool_dir:
+        # Pass 1: extract windows in parallel, spooled by the workers, and fit the scaler
+        for machine_id, paths in iter_machine_windows(
+            database_url, machines, workers, windows, stride, horizon_days, spool_dir
+        ):
+            if machine_id in holdout_ids:
+                holdout_files.extend(paths)
+                continue
+            extracted = 0
+            for path in paths:
+                with np.load(path) as batch:
+                    features, labels = batch["features"], batch["labels"]
+                scaler.partial_fit(features)
+                class_counts += np.bincount(labels, minlength=2)
+                extracted += len(labels)
+            train_files.extend(paths)
+            logger.info(f"Extracted {extracted} windows for machine {machine_id}")
+
+        if not train_files or class_counts.min() == 0:
+            raise ValueError(f"Training needs windows of both classes, got counts {class_counts.tolist()}")
+
+        # Balance the rare failure class with sample weights
+        class_weights = class_counts.sum() / (2.0 * class_counts)
+
+        # Pass 2: incremental fit over the spooled batches
+        classifier = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=seed)
+        for epoch in range(epochs):
+            rng.shuffle(train_files)
+            for path in train_files:
+                with np.load(path) as batch:
+                    features, labels = batch["features"], batch["labels"]
+                classifier.partial_fit(
+                    scaler.transform(features), labels, classes=[0, 1], sample_weight=class_weights[labels]
+                )
+            logger.info(f"Finished epoch {epoch + 1}/{epochs}")
+
+        model = Pipeline([("scaler", scaler), ("classifier", classifier)])
+
+        metrics = {}
+        if holdout_files:
+            labels, probabilities = [], []
+            for path in holdout_files:
+                with np.load(path) as batch:
+                    labels.append(batch["labels"])
+                    probabilities.append(model.predict_proba(batch["features"])[:, 1])
+            metrics = evaluate_classifier(np.concatenate(labels), np.concatenate(probabilities))
+
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "version": datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+        "model": model,
+        "feature_names": preprocessing.feature_names(windows),
+        "feature_windows": windows,
+        "horizon_days": horizon_days,
+        "trained_at": datetime.utcnow().isoformat(),
+        "training_windows": int(class_counts.sum()),
+        "training_positive_rate": float(class_counts[1] / class_counts.sum()),
+        "machines": len(machine_ids),
+        "holdout_machines": len(holdout_ids),
+        "metrics": metrics,
+    }
+    versioned_path = save_artifact(artifact, output_path)
+    logger.info(f"Saved model version {artifact['version']} to {versioned_path}")
+
+    return {key: value for key, value in artifact.items() if key != "model"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the failure prediction model")
+    parser.add_argument("--database-url", help="Database to train from (defaults to the app database)")
+    parser.add_argument("--output", help="Live model path (defaults to MODEL_PATH)")
+    parser.add_argument("--workers", type=int, help="Feature extraction processes")
+    parser.add_argument("--windows", type=int, nargs="+", help="Feature window lengths in readings")
+    parser.add_argument("--stride", type=int, default=WINDOW_STRIDE)
+    parser.add_argument("--horizon-days", type=int, default=FAILURE_HORIZON_DAYS)
+    parser.add_argument("--epochs", type=int, default=TRAINING_EPOCHS)
+    parser.add_argument("--holdout-fraction", type=float, default=HOLDOUT_FRACTION)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    metadata = train_model(
+        args.database_url, args.output, args.workers, args.windows, args.stride,
+        args.horizon_days, args.epochs, args.holdout_fraction
+    )
+    print(json.dumps(metadata, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from app.db.database import Base
+
+class SensorImportJob(Base):
+    """Database model for bulk sensor data import jobs"""
+    __tablename__ = "sensor_import_jobs"
+    
+    id = Column(String(36), primary_key=True, index=True)
+    filename = Column(String)
+    format = Column(String)  # csv, parquet
+    status = Column(String, default="pending")  # pending, running, completed, failed
+    chunk_rows = Column(Integer)
+    
+    # Progress, committed together with each chunk so a job can resume
+    total_rows = Column(Integer, nullable=True)
+    rows_processed = Column(Integer, default=0)
+    rows_inserted = Column(Integer, default=0)
+    rows_rejected = Column(Integer, default=0)
+    chunks_completed = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
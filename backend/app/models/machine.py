@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -6,6 +6,12 @@ from app.db.database import Base
 class Machine(Base):
     """Database model for machines"""
     __tablename__ = "machines"
+    __table_args__ = (
+        # Fleet listings filter by these and page by ID
+        Index("ix_machines_status_id", "status", "id"),
+        Index("ix_machines_type_id", "type", "id"),
+        Index("ix_machines_location_status_id", "location", "status", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
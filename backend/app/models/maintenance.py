@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from app.db.database import Base
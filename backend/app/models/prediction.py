@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.db.database import Base
+
+class Prediction(Base):
+    """Database model for stored failure predictions"""
+    __tablename__ = "predictions"
+    __table_args__ = (
+        # Latest and history reads are per machine, newest first
+        Index("ix_predictions_machine_timestamp", "machine_id", "timestamp"),
+        # The scorer looks up the newest scored reading per machine
+        Index("ix_predictions_machine_as_of", "machine_id", "as_of"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"))
+    timestamp = Column(DateTime, default=datetime.utcnow)  # When the prediction was made
+    as_of = Column(DateTime)  # Newest reading scored
+    
+    failure_probability = Column(Float)
+    is_failure_predicted = Column(Boolean)
+    confidence = Column(Float)
+    model_version = Column(String, nullable=True)  # None for models saved without a version
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -7,6 +7,10 @@ from app.db.database import Base
 class SensorData(Base):
     """Database model for sensor readings"""
     __tablename__ = "sensor_data"
+    __table_args__ = (
+        # Range reads and exports filter by machine and time
+        Index("ix_sensor_data_machine_timestamp", "machine_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     machine_id = Column(Integer, ForeignKey("machines.id"))
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, UniqueConstraint
+from app.db.database import Base
+
+class SensorDataRollup(Base):
+    """Database model for hourly aggregates of expired sensor readings"""
+    __tablename__ = "sensor_data_rollups"
+    __table_args__ = (
+        UniqueConstraint("machine_id", "bucket_start", "sensor", name="uq_sensor_data_rollups_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"), index=True)
+    bucket_start = Column(DateTime, index=True)  # Start of the hour
+    sensor = Column(String)  # temperature, vibration, pressure, rpm, voltage, current, noise_level
+    
+    # Mergeable aggregates: mean = total / count, variance from total_sq
+    count = Column(Integer)
+    total = Column(Float)
+    total_sq = Column(Float)
+    minimum = Column(Float)
+    maximum = Column(Float)
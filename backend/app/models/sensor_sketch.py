@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, LargeBinary
+from app.db.database import Base
+
+class SensorSketch(Base):
+    """Database model for hourly quantile sketches of sensor readings"""
+    __tablename__ = "sensor_sketches"
+    __table_args__ = (
+        # Range queries merge one machine's sketches per sensor over a span of hours.
+        # Not unique: workers append partial sketches that compaction merges later.
+        Index("ix_sensor_sketches_machine_sensor_bucket", "machine_id", "sensor", "bucket_start"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"))
+    sensor = Column(String)  # temperature, vibration, pressure, rpm, voltage, current, noise_level
+    bucket_start = Column(DateTime)  # Start of the hour
+    
+    # Exact aggregates, as in sensor_data_rollups
+    count = Column(Integer)
+    total = Column(Float)
+    total_sq = Column(Float)
+    minimum = Column(Float)
+    maximum = Column(Float)
+    
+    # QuantileSketch bins
+    sketch = Column(LargeBinary)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from datetime import date
+from datetime import date, datetime
 
 class MachineBase(BaseModel):
     """Base machine schema with common attributes"""
@@ -40,6 +40,41 @@ class Machine(MachineBase):
             }
         }
 
+class MachineResponse(MachineBase):
+    """Machine as stored, returned by the machines endpoints"""
+    id: int
+    installation_date: Optional[datetime] = None
+    status: Optional[str] = None
+    last_maintenance: Optional[datetime] = None
+    
+    class Config:
+        orm_mode = True
+
+class MachineListResponse(BaseModel):
+    """One page of a filtered machine listing"""
+    items: List[MachineResponse]
+    next_after_id: Optional[int] = Field(None, description="Pass as after_id to get the next page; null on the last page")
+    status_counts: Dict[str, int] = Field(..., description="Machines per status matching the type and location filters")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "items": [
+                    {
+                        "id": 17,
+                        "name": "CNC Machine Alpha",
+                        "type": "CNC",
+                        "location": "Factory Floor A",
+                        "installation_date": "2023-01-15T00:00:00",
+                        "status": "critical",
+                        "last_maintenance": "2025-03-01T09:00:00"
+                    }
+                ],
+                "next_after_id": 17,
+                "status_counts": {"operational": 412, "warning": 9, "critical": 3, "maintenance": 2}
+            }
+        }
+
 class MachineStatus(BaseModel):
     """Schema for machine status updates"""
     status: str = Field(..., description="Current operational status of the machine")
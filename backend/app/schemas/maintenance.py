@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 
 class MaintenanceBase(BaseModel):
@@ -35,4 +35,30 @@ class MaintenanceResponse(MaintenanceBase):
     updated_at: datetime
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class MaintenanceHistoryItem(BaseModel):
+    """Schema for a maintenance record in a schedule's recent history"""
+    date: date
+    type: str
+    description: str
+
+class MaintenanceScheduleEntry(BaseModel):
+    """Schema for one machine in the fleet maintenance schedule"""
+    machine_id: int
+    name: Optional[str] = None
+    type: Optional[str] = None
+    location: Optional[str] = None
+    status: Optional[str] = None
+    last_maintenance: Optional[date] = None
+    next_due: Optional[date] = None
+    days_overdue: Optional[int] = None  # Negative when maintenance is not yet due
+    maintenance_interval: int  # Days
+    maintenance_history: List[MaintenanceHistoryItem]
+
+class FleetMaintenanceSchedule(BaseModel):
+    """Schema for a page of the fleet maintenance schedule, most urgent first"""
+    as_of: date
+    skip: int
+    limit: int
+    machines: List[MaintenanceScheduleEntry]
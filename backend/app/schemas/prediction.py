@@ -96,4 +96,64 @@ class MaintenanceRecommendation(BaseModel):
                 "parts_needed": ["Bearing assembly", "Lubricant"],
                 "recommended_date": "2025-04-20"
             }
-        }
\ No newline at end of file
+        }
+
+class PredictionResponse(BaseModel):
+    """Failure prediction returned by the predictions endpoints"""
+    machine_id: int
+    prediction_timestamp: str
+    failure_probability: float
+    is_failure_predicted: bool
+    prediction_confidence: float
+    timeframe: str
+    source: str = Field("live", description="live (computed for this request) or stored (by the background scorer)")
+    model_version: Optional[str] = None
+
+class AnomalyResponse(BaseModel):
+    """Anomaly detection returned by the predictions endpoints"""
+    machine_id: int
+    analysis_timestamp: str
+    anomalies_detected: bool
+    anomaly_details: Dict[str, Any]
+
+class HealthScoreResponse(BaseModel):
+    """Health score returned by the predictions endpoints"""
+    machine_id: int
+    health_score: float
+    health_factors: Dict[str, float]
+    assessment: str
+    last_updated: str
+
+class PredictionHistoryPoint(BaseModel):
+    """One stored prediction"""
+    timestamp: datetime
+    as_of: Optional[datetime] = Field(None, description="Newest reading scored")
+    failure_probability: float
+    is_failure_predicted: bool
+    confidence: float
+    model_version: Optional[str] = None
+    
+    class Config:
+        orm_mode = True
+
+class PredictionHistoryResponse(BaseModel):
+    """Stored predictions of a machine over time, oldest first"""
+    machine_id: int
+    points: List[PredictionHistoryPoint]
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "machine_id": 17,
+                "points": [
+                    {
+                        "timestamp": "2025-04-14T08:00:00",
+                        "as_of": "2025-04-14T07:59:30",
+                        "failure_probability": 0.12,
+                        "is_failure_predicted": False,
+                        "confidence": 0.76,
+                        "model_version": "20250401"
+                    }
+                ]
+            }
+        }
@@ -1,6 +1,51 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Field, root_validator
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Plausible range of each sensor; readings outside it are rejected at ingest
+SENSOR_RANGES: Dict[str, Tuple[float, float]] = {
+    "temperature": (-100.0, 1000.0),  # Celsius
+    "vibration": (0.0, 1000.0),
+    "pressure": (-1.0, 1000.0),  # bar, gauge
+    "rpm": (0.0, 100000.0),
+    "voltage": (0.0, 100000.0),
+    "current": (0.0, 10000.0),  # A
+    "noise_level": (0.0, 200.0),  # dB
+}
+
+REQUIRED_SENSORS = ["temperature", "vibration", "pressure", "rpm"]
+OPTIONAL_SENSORS = ["voltage", "current", "noise_level"]
+
+# Most readings accepted in one columnar batch
+COLUMNAR_BATCH_MAX_READINGS = 100000
+
+def sensor_violations(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Find invalid readings in whole sensor arrays at once
+
+    Args:
+        columns: One float array per sensor, NaN where missing
+
+    Returns:
+        Per sensor, a mask of readings that are missing though required,
+        infinite, or outside SENSOR_RANGES
+    """
+    violations = {}
+    for sensor in REQUIRED_SENSORS + OPTIONAL_SENSORS:
+        column = columns[sensor]
+        low, high = SENSOR_RANGES[sensor]
+        # NaN compares False, so a missing value counts as in range here
+        invalid = (column < low) | (column > high)
+        if sensor in REQUIRED_SENSORS:
+            invalid |= np.isnan(column)
+        violations[sensor] = invalid
+    return violations
+
+def _sensor_field(sensor: str, required: bool, description: str):
+    low, high = SENSOR_RANGES[sensor]
+    return Field(... if required else None, ge=low, le=high, description=description)
 
 class SensorData(BaseModel):
     """
@@ -58,11 +103,185 @@ class ProcessedSensorData(SensorData):
             }
         }
 
+class SensorDataCreateBase(BaseModel):
+    """
+    Schema for one sensor reading of a known machine
+    """
+    timestamp: Optional[datetime] = Field(None, description="Defaults to the time of receipt")
+    temperature: float = _sensor_field("temperature", True, "Temperature in Celsius")
+    vibration: float = _sensor_field("vibration", True, "Vibration amplitude")
+    pressure: float = _sensor_field("pressure", True, "Pressure in bar")
+    rpm: float = _sensor_field("rpm", True, "Rotations per minute")
+    voltage: Optional[float] = _sensor_field("voltage", False, "Supply voltage")
+    current: Optional[float] = _sensor_field("current", False, "Current draw in amperes")
+    noise_level: Optional[float] = _sensor_field("noise_level", False, "Noise level in dB")
+
+class SensorDataCreate(SensorDataCreateBase):
+    """
+    Schema for recording a sensor reading
+    """
+    machine_id: int
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "machine_id": 17,
+                "timestamp": "2025-04-14T12:30:45",
+                "temperature": 75.4,
+                "vibration": 2.1,
+                "pressure": 1.05,
+                "rpm": 2500,
+                "voltage": 231.0,
+                "current": 12.4,
+                "noise_level": 74.0
+            }
+        }
+
+class SensorDataResponse(SensorDataCreate):
+    """
+    Schema for a stored sensor reading
+    """
+    id: int
+    timestamp: datetime
+    
+    class Config:
+        orm_mode = True
+
 class SensorDataBatch(BaseModel):
     """
-    Schema for batch sensor data submission
+    Schema for batch sensor data submission, one object per reading
     """
-    data: List[SensorData]
+    machine_id: int
+    readings: List[SensorDataCreateBase]
+
+class FloatColumn:
+    """A JSON array of numbers or nulls, converted to a float64 array in one step (nulls become NaN)"""
+    
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+    
+    @classmethod
+    def validate(cls, value) -> np.ndarray:
+        if not isinstance(value, list):
+            raise TypeError("must be an array")
+        try:
+            array = np.array(value)
+        except ValueError:
+            # Ragged nested arrays
+            raise ValueError("must be an array of numbers or nulls")
+        if array.ndim != 1:
+            raise ValueError("must be an array of numbers or nulls")
+        if array.dtype.kind in "iuf":
+            return array.astype(np.float64)
+        # Nulls (or huge integers) leave an object array, checked element by element
+        if array.dtype.kind != "O" or not all(
+            item is None or (isinstance(item, (int, float)) and not isinstance(item, bool)) for item in value
+        ):
+            raise ValueError("must be an array of numbers or nulls")
+        return array.astype(np.float64)
+    
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(type="array", items={"type": "number", "nullable": True})
+
+class TimestampColumn:
+    """A JSON array of ISO 8601 timestamps or nulls, parsed to naive UTC datetime64 in one step (nulls become NaT)"""
+    
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+    
+    @classmethod
+    def validate(cls, value) -> np.ndarray:
+        if not isinstance(value, list):
+            raise TypeError("must be an array")
+        try:
+            parsed = pd.to_datetime(value, format="ISO8601", utc=True)
+        except (TypeError, ValueError):
+            raise ValueError("must be an array of ISO 8601 timestamps or nulls")
+        return parsed.tz_localize(None).to_numpy()
+    
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(type="array", items={"type": "string", "format": "date-time", "nullable": True})
+
+class SensorDataColumnarBatch(BaseModel):
+    """
+    Schema for batch sensor data submission, one array per field
+    
+    Each array is converted and checked as a whole: every array has one
+    entry per reading, required sensors are finite and optional ones
+    finite or null, and all values are within SENSOR_RANGES. Missing
+    timestamps default to the time of receipt.
+    """
+    machine_id: int
+    timestamp: Optional[TimestampColumn] = None
+    temperature: FloatColumn
+    vibration: FloatColumn
+    pressure: FloatColumn
+    rpm: FloatColumn
+    voltage: Optional[FloatColumn] = None
+    current: Optional[FloatColumn] = None
+    noise_level: Optional[FloatColumn] = None
+    
+    @root_validator(skip_on_failure=True)
+    def check_columns(cls, values):
+        count = len(values["temperature"])
+        if not 0 < count <= COLUMNAR_BATCH_MAX_READINGS:
+            raise ValueError(f"A batch holds 1 to {COLUMNAR_BATCH_MAX_READINGS} readings")
+        
+        received = np.datetime64(datetime.utcnow(), "ns")
+        timestamps = values.get("timestamp")
+        if timestamps is None:
+            timestamps = np.full(count, received)
+        elif len(timestamps) != count:
+            raise ValueError(f"timestamp has {len(timestamps)} entries, expected {count}")
+        else:
+            timestamps = np.where(np.isnat(timestamps), received, timestamps)
+        values["timestamp"] = timestamps
+        
+        for sensor in REQUIRED_SENSORS + OPTIONAL_SENSORS:
+            column = values.get(sensor)
+            if column is None:
+                values[sensor] = np.full(count, np.nan)
+            elif len(column) != count:
+                raise ValueError(f"{sensor} has {len(column)} entries, expected {count}")
+        
+        for sensor, invalid in sensor_violations(values).items():
+            if invalid.any():
+                low, high = SENSOR_RANGES[sensor]
+                indices = np.flatnonzero(invalid)
+                raise ValueError(
+                    f"{sensor} must be {'present and ' if sensor in REQUIRED_SENSORS else ''}between {low:g} and {high:g}; "
+                    f"{len(indices)} invalid, first at indices {indices[:10].tolist()}"
+                )
+        return values
+    
+    class Config:
+        arbitrary_types_allowed = True
+        schema_extra = {
+            "example": {
+                "machine_id": 17,
+                "timestamp": ["2025-04-14T12:30:45", "2025-04-14T12:30:46"],
+                "temperature": [75.4, 75.6],
+                "vibration": [2.1, 2.2],
+                "pressure": [1.05, 1.04],
+                "rpm": [2500, 2510],
+                "voltage": [231.0, None],
+                "current": [12.4, 12.5],
+                "noise_level": [74.0, 74.5]
+            }
+        }
+
+class SensorDataColumnarBatchResult(BaseModel):
+    """
+    Schema for the outcome of a columnar batch submission
+    """
+    machine_id: int
+    inserted: int
+    first_timestamp: datetime
+    last_timestamp: datetime
     
 class SensorDataSummary(BaseModel):
     """
@@ -91,4 +310,42 @@ class SensorDataSummary(BaseModel):
                 "average_rpm": 2450,
                 "anomaly_count": 3
             }
-        }
\ No newline at end of file
+        }
+
+class SensorImportJobResponse(BaseModel):
+    """
+    Schema for bulk sensor data import job progress
+    """
+    id: str
+    filename: str
+    format: str
+    status: str
+    chunk_rows: int
+    total_rows: Optional[int] = None
+    rows_processed: int
+    rows_inserted: int
+    rows_rejected: int
+    chunks_completed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        orm_mode = True
+        schema_extra = {
+            "example": {
+                "id": "3f1c9a62-8d0e-4b55-9a57-2f0a4c1e7b11",
+                "filename": "plant_a_2023.csv",
+                "format": "csv",
+                "status": "running",
+                "chunk_rows": 20000,
+                "total_rows": 1250000,
+                "rows_processed": 400000,
+                "rows_inserted": 399870,
+                "rows_rejected": 130,
+                "chunks_completed": 20,
+                "error": None,
+                "created_at": "2025-04-14T09:00:00",
+                "updated_at": "2025-04-14T09:02:10"
+            }
+        }
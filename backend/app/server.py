@@ -0,0 +1,197 @@
+"""
+Preforked production server
+
+The parent process imports the app, loads the ML model and allocates the
+shared fleet state, then freezes the garbage collector and forks uvicorn
+workers that all accept on one listening socket. Workers share the parent's
+memory copy-on-write, so adding workers does not multiply the model's
+memory, and hot state lives in one shared memory segment. Crashed workers
+are restarted, after the parent releases the fleet state lock if they died
+holding it; SIGTERM or SIGINT stops all workers.
+
+Background jobs (retention and the like) run in worker 0 only. The parent
+creates the database schema before forking, so workers do not race to.
+
+Connections are spread across workers by the kernel, so each worker sees
+an interleaved subset of any machine's readings. State kept per worker
+follows from that:
+    - Latest readings and statuses are in the shared fleet state.
+    - Rolling-window features are always computed from stored readings.
+    - The status engine smooths the readings its worker sees, but applies
+      hysteresis from the shared status, so workers agree on the level.
+    - Each worker writes partial quantile sketches of its readings;
+      sketches merge exactly, and compaction merges the partial rows.
+    - Admission limits apply per worker, so the fleet-wide ingest rate
+      and analytics concurrency are up to --workers times the settings.
+    - Each worker dispatches the alerts raised by its own requests, with
+      its own dedup window and ALERT_RATE_PER_MINUTE bucket. A machine
+      whose readings reach several workers can have an alert sent once
+      per worker within ALERT_DEDUP_SECONDS, and the fleet-wide alert
+      rate is up to --workers times the setting. Sinks should tolerate
+      repeats, and a webhook receiver can dedup on machine_id and
+      condition.
+    - Metrics are counted per worker and carry a worker label. /metrics on
+      the API port answers from whichever worker takes the request, so
+      with --metrics-port each worker also serves its own /metrics on
+      that port plus its index. Scrape every one of those ports and sum
+      across the worker label:
+          - job_name: predictive-maintenance
+            static_configs:
+              - targets: ["host:9100", "host:9101", "host:9102", "host:9103"]
+      A restarted worker starts its counters from zero, which rate()
+      treats as a counter reset.
+
+Usage (from backend/):
+    python -m app.server --host 0.0.0.0 --port 8000 --workers 4 --metrics-port 9100
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+import traceback
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before restarting a worker that exited
+RESTART_DELAY_SECONDS = 1.0
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    """Open the listening socket shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def preload() -> None:
+    """Load everything workers should share before forking"""
+    from app import main
+    from app.db.database import SessionLocal, engine
+    from app.db.shards import shard_router
+    from app.ml.model import load_ml_model
+    from app.utils.shared_state import fleet_state
+
+    # Workers would race to create missing tables at startup
+    main.create_schema()
+    load_ml_model()
+
+    fleet_state.allocate(shared=True)
+    with SessionLocal() as db:
+        fleet_state.load_statuses(db)
+
+    # Connections must not be shared across fork
+    engine.dispose()
+    shard_router.dispose()
+
+    # Objects that survive to here are never collected, so the collector
+    # does not touch (and copy) their pages in every worker
+    gc.collect()
+    gc.freeze()
+
+def _run_worker(index: int, sock: socket.socket, args) -> None:
+    """Serve requests in a forked worker process"""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+
+    from app.core.config import settings
+    from app.main import app
+    from app.utils import metrics
+
+    settings.BACKGROUND_JOBS_ENABLED = settings.BACKGROUND_JOBS_ENABLED and index == 0
+    settings.WORKERS = args.workers
+
+    metrics.set_constant_labels(worker=index)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.host, args.metrics_port + index)
+
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        timeout_keep_alive=args.keep_alive,
+        access_log=args.access_log,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _spawn(index: int, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            _run_worker(index, sock, args)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os._exit(status)
+    logger.info(f"Started worker {index} (pid {pid})")
+    return pid
+
+def serve(args) -> None:
+    """Preload, fork the workers and supervise them until stopped"""
+    from app.utils.shared_state import fleet_state
+
+    preload()
+    sock = _bind(args.host, args.port, args.backlog)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(args.workers):
+        children[_spawn(index, sock, args)] = index
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            # A worker killed while writing the fleet state still holds its lock
+            fleet_state.recover_lock(pid)
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(RESTART_DELAY_SECONDS)
+            if not stopping:
+                children[_spawn(index, sock, args)] = index
+    finally:
+        sock.close()
+        fleet_state.close(unlink=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="Keep-alive timeout in seconds")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    parser.add_argument("--metrics-port", type=int, help="First port of the per-worker /metrics servers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    serve(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.notification import emit_alert
+
+# Machine statuses that raise an alert when a machine enters them
+ALERT_STATUSES = {"warning": "warning", "critical": "critical"}
+
+def check_columns(machine_id: int, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Raise alerts for sensors whose readings exceed their thresholds
+
+    Evaluates the whole batch at once and emits at most one alert per
+    sensor, carrying the peak value.
+
+    Args:
+        machine_id: Machine the readings belong to
+        columns: One array of readings per sensor, NaN where missing
+    """
+    thresholds = settings.ALERT_THRESHOLDS
+    sensors = [sensor for sensor in thresholds if sensor in columns]
+    if not settings.ALERTS_ENABLED or not sensors or not len(columns[sensors[0]]):
+        return
+
+    limits = np.array([thresholds[sensor] for sensor in sensors], dtype=np.float64)
+    values = np.column_stack([columns[sensor] for sensor in sensors])
+
+    # Missing readings are NaN and never exceed a threshold
+    exceeded = values > limits
+    for index in np.flatnonzero(exceeded.any(axis=0)):
+        sensor = sensors[index]
+        peak = float(np.nanmax(values[:, index]))
+        emit_alert(
+            machine_id, f"{sensor}_high", "warning",
+            f"{sensor} reached {peak:g}, above the threshold of {limits[index]:g}",
+            value=peak
+        )
+
+def status_changed(machine_id: int, previous: Optional[str], status: str) -> None:
+    """Raise an alert when a machine enters a warning or critical status"""
+    severity = ALERT_STATUSES.get(status)
+    if severity and status != previous:
+        emit_alert(machine_id, "status", severity, f"Status changed from {previous or 'unknown'} to {status}")
@@ -0,0 +1,283 @@
+import logging
+import warnings
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+
+from app.db.shards import shard_router
+from app.models.sensor import SensorData
+
+logger = logging.getLogger(__name__)
+
+# Rows of the correlation matrix computed per block
+CORRELATION_BLOCK_ROWS = 128
+
+# Grid cells fetched per round trip when aggregating in the database
+FETCH_ROWS = 50000
+
+# Median absolute deviation to standard deviation, for normal data
+MAD_SCALE = 1.4826
+
+# Mean absolute deviation to standard deviation, for normal data
+MEAN_AD_SCALE = 1.2533
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _bucket_expression(dialect: str, start_epoch: int, grid_seconds: int):
+    """Grid cell index of each reading, computed by the database, or None if unsupported"""
+    if dialect == "sqlite":
+        seconds = cast(func.strftime("%s", SensorData.timestamp), Integer) - start_epoch
+        return cast(seconds / grid_seconds, Integer)
+    if dialect == "postgresql":
+        seconds = func.extract("epoch", SensorData.timestamp) - start_epoch
+        return cast(func.floor(seconds / grid_seconds), Integer)
+    return None
+
+def align_to_grid(db, machine_ids: Sequence[int], sensor: str, start_date: datetime, end_date: datetime,
+                  grid_seconds: int) -> np.ndarray:
+    """
+    Average each machine's readings of one sensor over a common time grid
+
+    The database groups readings into grid cells, so only one row per
+    machine and cell is transferred; the cells are scattered into the grid
+    with np.add.at. Databases without a supported epoch function send raw
+    readings, which are bucketed in NumPy.
+
+    Args:
+        db: Database session
+        machine_ids: Machines, in row order
+        sensor: Sensor column to align
+        start_date: Start of the first cell
+        end_date: End of the grid
+        grid_seconds: Cell width in seconds
+
+    Returns:
+        Array of shape (machines, cells), NaN where a machine has no readings
+    """
+    # Stored timestamps are naive UTC
+    start_date = start_date.replace(tzinfo=None)
+    end_date = end_date.replace(tzinfo=None)
+    cells = int(np.ceil((end_date - start_date).total_seconds() / grid_seconds))
+    rows_of = {machine_id: row for row, machine_id in enumerate(machine_ids)}
+    sums = np.zeros((len(machine_ids), cells))
+    counts = np.zeros((len(machine_ids), cells))
+
+    column = getattr(SensorData, sensor)
+    filters = (
+        SensorData.machine_id.in_(list(machine_ids)),
+        SensorData.timestamp >= start_date,
+        SensorData.timestamp < end_date,
+        column.isnot(None),
+    )
+    dialect = db.get_bind(SensorData).dialect.name
+    bucket = _bucket_expression(dialect, int((start_date - _EPOCH).total_seconds()), grid_seconds)
+
+    if bucket is not None:
+        query = select(SensorData.machine_id, bucket, func.sum(column), func.count(column)).where(*filters).group_by(
+            SensorData.machine_id, bucket
+        )
+    else:
+        query = select(SensorData.machine_id, SensorData.timestamp, column).where(*filters)
+
+    result = db.execute(query.execution_options(yield_per=FETCH_ROWS))
+    for partition in result.partitions():
+        machines = np.fromiter((rows_of[row[0]] for row in partition), dtype=np.int64, count=len(partition))
+        if bucket is not None:
+            positions = np.array([row[1] for row in partition], dtype=np.int64)
+            totals = np.array([row[2] for row in partition], dtype=np.float64)
+            observed = np.array([row[3] for row in partition], dtype=np.float64)
+        else:
+            timestamps = np.array([row[1] for row in partition], dtype="datetime64[s]")
+            offsets = (timestamps - np.datetime64(start_date, "s")).astype(np.int64)
+            positions = offsets // grid_seconds
+            totals = np.array([row[2] for row in partition], dtype=np.float64)
+            observed = np.ones(len(partition))
+        inside = (positions >= 0) & (positions < cells)
+        np.add.at(sums, (machines[inside], positions[inside]), totals[inside])
+        np.add.at(counts, (machines[inside], positions[inside]), observed[inside])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def align_fleet_to_grid(db, machine_ids: Sequence[int], sensor: str, start_date: datetime, end_date: datetime,
+                       grid_seconds: int) -> np.ndarray:
+    """Align machines on any number of shards to one grid, aligning every shard's machines in parallel"""
+    groups = shard_router.group(db, machine_ids)
+    grids = shard_router.map(
+        lambda shard_db, ids: align_to_grid(shard_db, ids, sensor, start_date, end_date, grid_seconds),
+        groups,
+        db
+    )
+    if len(groups) == 1:
+        return next(iter(grids.values()))
+
+    rows_of = {machine_id: row for row, machine_id in enumerate(machine_ids)}
+    grid = np.empty((len(machine_ids), next(iter(grids.values())).shape[1]))
+    for shard, ids in groups.items():
+        grid[[rows_of[machine_id] for machine_id in ids]] = grids[shard]
+    return grid
+
+def correlation_matrix(grid: np.ndarray, min_overlap: int, block_rows: int = CORRELATION_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pearson correlation between every pair of rows, over the cells both have
+
+    Computed with masked matrix products one block of rows at a time, so
+    memory grows with block size times machines rather than machines
+    squared times cells.
+
+    Args:
+        grid: Array of shape (machines, cells), NaN where missing
+        min_overlap: Pairs sharing fewer cells get NaN
+        block_rows: Rows per block
+
+    Returns:
+        Tuple of the correlation matrix and the number of shared cells per pair
+    """
+    present = ~np.isnan(grid)
+    mask = present.astype(np.float64)
+    # Centering on each row's mean keeps the sums of squares well conditioned
+    means = np.nansum(grid, axis=1, keepdims=True) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    centered = np.where(present, grid - means, 0.0)
+    squared = centered * centered
+
+    machines = grid.shape[0]
+    correlation = np.full((machines, machines), np.nan)
+    overlap = np.zeros((machines, machines), dtype=np.int64)
+
+    for start in range(0, machines, block_rows):
+        stop = min(start + block_rows, machines)
+        block_mask, block_x, block_xx = mask[start:stop], centered[start:stop], squared[start:stop]
+
+        n = block_mask @ mask.T
+        sum_x = block_x @ mask.T
+        sum_y = block_mask @ centered.T
+        sum_xx = block_xx @ mask.T
+        sum_yy = block_mask @ squared.T
+        sum_xy = block_x @ centered.T
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = sum_xy - sum_x * sum_y / n
+            variance_x = sum_xx - sum_x * sum_x / n
+            variance_y = sum_yy - sum_y * sum_y / n
+            block = covariance / np.sqrt(variance_x * variance_y)
+
+        block[(n < max(min_overlap, 2)) | ~np.isfinite(block)] = np.nan
+        correlation[start:stop] = np.clip(block, -1.0, 1.0)
+        overlap[start:stop] = n.astype(np.int64)
+
+    return correlation, overlap
+
+def top_pairs(correlation: np.ndarray, machine_ids: Sequence[int], limit: int) -> List[Dict[str, Any]]:
+    """Most strongly correlated distinct pairs, by absolute correlation"""
+    rows, columns = np.triu_indices(len(machine_ids), k=1)
+    values = correlation[rows, columns]
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid):
+        return []
+    strength = np.abs(values[valid])
+    keep = valid[np.argsort(-strength, kind="stable")[:limit]]
+    return [
+        {
+            "machine_a": int(machine_ids[rows[index]]),
+            "machine_b": int(machine_ids[columns[index]]),
+            "correlation": float(values[index]),
+        }
+        for index in keep
+    ]
+
+def anomaly_mask(grid: np.ndarray, z_threshold: float) -> np.ndarray:
+    """
+    Cells whose robust z-score (median and MAD per machine) exceeds the threshold
+
+    When more than half of a machine's readings equal its median the MAD is
+    0, so the mean absolute deviation from the median is used instead. A
+    machine whose readings are all equal has no anomalies.
+    """
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # Machines without readings have all-NaN rows
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(grid, axis=1, keepdims=True)
+        deviation = np.abs(grid - median)
+        spread = np.nanmedian(deviation, axis=1, keepdims=True) * MAD_SCALE
+        spread = np.where(spread > 0, spread, np.nanmean(deviation, axis=1, keepdims=True) * MEAN_AD_SCALE)
+        scores = deviation / np.where(spread > 0, spread, np.inf)
+    return np.nan_to_num(scores, nan=0.0) > z_threshold
+
+def co_anomaly_windows(anomalies: np.ndarray, machine_ids: Sequence[int], start_date: datetime, grid_seconds: int,
+                       min_machines: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Runs of grid cells in which at least ``min_machines`` machines are anomalous
+
+    Returns:
+        Windows with their time span, the machines anomalous within them and
+        the peak number anomalous at once, largest peak first
+    """
+    per_cell = anomalies.sum(axis=0)
+    active = per_cell >= min_machines
+    if not active.any():
+        return []
+
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    # Each segment runs to the next window's start, but the cells between
+    # windows are below min_machines, so the maximum is the window's peak
+    peaks = np.maximum.reduceat(per_cell, starts)
+    order = np.argsort(-peaks, kind="stable")[:limit]
+
+    windows = []
+    for index in order:
+        start, end = starts[index], ends[index]
+        involved = np.flatnonzero(anomalies[:, start:end].any(axis=1))
+        windows.append({
+            "start": (start_date + timedelta(seconds=int(start) * grid_seconds)).isoformat(),
+            "end": (start_date + timedelta(seconds=int(end) * grid_seconds)).isoformat(),
+            "peak_machines": int(peaks[index]),
+            "machine_ids": [int(machine_ids[row]) for row in involved],
+        })
+    return windows
+
+def fleet_correlation(db, machine_ids: Sequence[int], sensor: str, start_date: datetime, end_date: datetime,
+                      grid_seconds: int, min_overlap: float, z_threshold: float, min_machines: int,
+                      top: int, max_windows: int) -> Dict[str, Any]:
+    """
+    Correlation and co-anomaly analysis of one sensor across machines
+
+    Args:
+        db: Database session
+        machine_ids: Machines to compare
+        sensor: Sensor column
+        start_date: Start of the period
+        end_date: End of the period
+        grid_seconds: Width of the common time grid cells
+        min_overlap: Fraction of cells a pair must share for a correlation
+        z_threshold: Robust z-score above which a cell is anomalous
+        min_machines: Machines anomalous at once that make a co-anomaly window
+        top: Number of most correlated pairs to list
+        max_windows: Number of co-anomaly windows to list
+
+    Returns:
+        Dictionary with the grid, correlation matrix, top pairs and windows
+    """
+    machine_ids = list(machine_ids)
+    grid = align_fleet_to_grid(db, machine_ids, sensor, start_date, end_date, grid_seconds)
+    cells = grid.shape[1]
+
+    correlation, overlap = correlation_matrix(grid, int(np.ceil(min_overlap * cells)))
+    anomalies = anomaly_mask(grid, z_threshold)
+    coverage = (~np.isnan(grid)).mean(axis=1) if cells else np.zeros(len(machine_ids))
+
+    return {
+        "sensor": sensor,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "grid_seconds": grid_seconds,
+        "cells": cells,
+        "machine_ids": machine_ids,
+        "coverage": [round(float(value), 4) for value in coverage],
+        "correlation": [[None if np.isnan(value) else round(float(value), 4) for value in row] for row in correlation],
+        "top_pairs": top_pairs(correlation, machine_ids, top),
+        "co_anomaly_windows": co_anomaly_windows(anomalies, machine_ids, start_date, grid_seconds, min_machines, max_windows),
+    }
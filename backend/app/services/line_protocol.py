@@ -0,0 +1,334 @@
+"""
+Line protocol ingest listener for edge gateways
+
+Accepts InfluxDB line protocol over TCP and UDP, for gateways that cannot
+send HTTP/JSON efficiently:
+
+    sensors,machine_id=17 temperature=75.4,vibration=2.1,pressure=1.05,rpm=2500i 1713097845000000000
+
+The machine comes from the LINE_INGEST_MACHINE_TAG tag and the readings
+from fields named like the SensorData columns; other tags and fields are
+ignored. Integer (``i``/``u`` suffixed) and float fields are accepted. The
+timestamp is optional (time of receipt) and in LINE_INGEST_PRECISION units.
+
+Parsed points are buffered and written every
+LINE_INGEST_FLUSH_INTERVAL_SECONDS, or as soon as LINE_INGEST_BATCH_SIZE
+points are buffered, through the same bulk insert and consumers as the
+HTTP endpoints. When LINE_INGEST_MAX_BUFFERED points are waiting, TCP
+connections stop being read (the gateways see backpressure) and UDP
+datagrams are dropped. Every point is counted by outcome in
+line_ingest_points_total.
+
+Each worker runs its own listener; the ports are bound with SO_REUSEPORT
+where available, so the kernel spreads connections across workers.
+"""
+import asyncio
+import logging
+import socket
+import time
+from typing import List, Optional, Set
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.crud import machines as machines_crud
+from app.db.database import SessionLocal
+from app.ml.features import SENSOR_COLUMNS
+from app.schemas.sensor import sensor_violations
+from app.services import sensor_ingest
+from app.utils.metrics import LINE_INGEST_POINTS
+
+logger = logging.getLogger(__name__)
+
+# Nanoseconds per timestamp unit
+PRECISION_NS = {"ns": 1, "us": 1000, "ms": 1000000, "s": 1000000000}
+
+_FIELD_INDEX = {sensor.encode(): index for index, sensor in enumerate(SENSOR_COLUMNS)}
+_EMPTY_ROW = [np.nan] * len(SENSOR_COLUMNS)
+# Timestamps and machine IDs are stored as int64; its minimum is NaT in datetime64[ns]
+_INT64_MAX = np.iinfo(np.int64).max
+
+class ParsedPoints:
+    """Points parsed from line protocol, one list per column"""
+
+    __slots__ = ("machine_ids", "timestamps", "values", "errors")
+
+    def __init__(self):
+        self.machine_ids: List[int] = []
+        self.timestamps: List[int] = []  # Nanoseconds since the epoch
+        self.values: List[List[float]] = []  # In SENSOR_COLUMNS order, NaN where missing
+        self.errors = 0
+
+    def __len__(self) -> int:
+        return len(self.machine_ids)
+
+    def extend(self, other: "ParsedPoints") -> None:
+        self.machine_ids.extend(other.machine_ids)
+        self.timestamps.extend(other.timestamps)
+        self.values.extend(other.values)
+
+def parse_lines(data: bytes, machine_tag: bytes = b"machine_id", precision: str = "ns",
+                measurement: Optional[bytes] = None) -> ParsedPoints:
+    """
+    Parse newline separated line protocol points
+
+    Points whose measurement differs from ``measurement`` (if given) are
+    skipped without counting as errors. Lines that are malformed, lack the
+    machine tag, have non-numeric sensor fields, use escaping or quoted
+    strings, or have a machine ID or timestamp outside the int64 range
+    (about 1677 to 2262 for nanosecond timestamps) are counted as errors.
+
+    Args:
+        data: Complete lines
+        machine_tag: Tag holding the machine ID
+        precision: Unit of the timestamps, one of PRECISION_NS
+        measurement: Only points of this measurement are kept
+
+    Returns:
+        The parsed points and the number of lines rejected
+    """
+    points = ParsedPoints()
+    machine_ids, timestamps, values = points.machine_ids, points.timestamps, points.values
+    prefix = machine_tag + b"="
+    skip = len(prefix)
+    scale = PRECISION_NS[precision]
+    received = time.time_ns()
+    field_index = _FIELD_INDEX
+    empty_row = _EMPTY_ROW
+
+    for line in data.split(b"\n"):
+        if line[-1:] == b"\r":
+            line = line[:-1]
+        if not line or line[0] == 35:  # Empty or a "#" comment
+            continue
+        try:
+            parts = line.split(b" ")
+            if len(parts) == 3:
+                key, fields, timestamp = parts
+                # A trailing space leaves an empty timestamp
+                timestamp = int(timestamp) * scale if timestamp else received
+            elif len(parts) == 2:
+                key, fields = parts
+                timestamp = received
+            else:
+                raise ValueError
+            tags = key.split(b",")
+            if measurement is not None and tags[0] != measurement:
+                continue
+
+            machine_id = None
+            for tag in tags:
+                if tag.startswith(prefix):
+                    machine_id = int(tag[skip:])
+                    break
+            if machine_id is None:
+                raise ValueError
+            if not (-_INT64_MAX <= timestamp <= _INT64_MAX and -_INT64_MAX <= machine_id <= _INT64_MAX):
+                raise ValueError
+
+            row = empty_row[:]
+            for field in fields.split(b","):
+                name, _, value = field.partition(b"=")
+                index = field_index.get(name)
+                if index is not None:
+                    row[index] = float(value.rstrip(b"iu"))
+        except ValueError:
+            points.errors += 1
+            continue
+        machine_ids.append(machine_id)
+        timestamps.append(timestamp)
+        values.append(row)
+    return points
+
+def store_points(points: ParsedPoints) -> int:
+    """
+    Validate buffered points and write them through the shared ingest path
+
+    Points of unknown machines and points with invalid readings are
+    dropped and counted.
+
+    Returns:
+        Number of points stored
+    """
+    machine_ids = np.array(points.machine_ids, dtype=np.int64)
+    values = np.array(points.values, dtype=np.float64).reshape(len(points), len(SENSOR_COLUMNS))
+    columns = {sensor: values[:, index] for index, sensor in enumerate(SENSOR_COLUMNS)}
+
+    invalid = np.zeros(len(points), dtype=bool)
+    for violations in sensor_violations(columns).values():
+        invalid |= violations
+
+    with SessionLocal() as db:
+        unique_ids = np.unique(machine_ids[~invalid])
+        unknown = [machine_id for machine_id in unique_ids.tolist() if not machines_crud.machine_exists(db, machine_id)]
+        missing = np.isin(machine_ids, unknown) & ~invalid
+        keep = ~(invalid | missing)
+
+        LINE_INGEST_POINTS.labels("invalid").inc(int(invalid.sum()))
+        LINE_INGEST_POINTS.labels("unknown_machine").inc(int(missing.sum()))
+        if not keep.any():
+            return 0
+
+        columns = {sensor: column[keep] for sensor, column in columns.items()}
+        columns["machine_id"] = machine_ids[keep]
+        columns["timestamp"] = np.array(points.timestamps, dtype=np.int64)[keep].astype("datetime64[ns]")
+        stored = sensor_ingest.store_columns(db, columns, "line")
+    LINE_INGEST_POINTS.labels("stored").inc(stored)
+    return stored
+
+class _TCPProtocol(asyncio.Protocol):
+    def __init__(self, listener: "LineProtocolListener"):
+        self.listener = listener
+        self.transport = None
+        self._partial = b""
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        data = self._partial + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._partial = data
+            if len(data) > self.listener.max_line_bytes:
+                # No line ends within the limit; discard it
+                self._partial = b""
+                self.listener.count_errors(1)
+            return
+        self._partial = data[end + 1:]
+        self.listener.receive(data[:end], self)
+
+    def eof_received(self) -> Optional[bool]:
+        if self._partial:
+            self.listener.receive(self._partial, self)
+            self._partial = b""
+        return None
+
+    def connection_lost(self, exc) -> None:
+        self.listener.forget(self)
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "LineProtocolListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.listener.receive(data, None)
+
+class LineProtocolListener:
+    """Receives line protocol points over TCP and UDP and writes them in batches
+
+    Parsing runs on the event loop as data arrives; writing runs in the
+    threadpool, one batch at a time, while new points keep buffering.
+    """
+
+    def __init__(self, host: str, tcp_port: Optional[int], udp_port: Optional[int],
+                 batch_size: int, flush_interval: float, max_buffered: int, max_line_bytes: int,
+                 machine_tag: str, precision: str, measurement: Optional[str]):
+        if precision not in PRECISION_NS:
+            raise ValueError(f"Precision must be one of {', '.join(PRECISION_NS)}")
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_line_bytes = max_line_bytes
+        self.machine_tag = machine_tag.encode()
+        self.precision = precision
+        self.measurement = measurement.encode() if measurement else None
+        self._buffer = ParsedPoints()
+        self._paused: Set[_TCPProtocol] = set()
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def buffered(self) -> int:
+        """Points waiting to be written"""
+        return len(self._buffer)
+
+    def receive(self, data: bytes, connection: Optional[_TCPProtocol]) -> None:
+        """Parse received lines into the buffer; UDP datagrams pass no connection"""
+        if connection is None and len(self._buffer) >= self.max_buffered:
+            # Count the dropped datagram's points without parsing them
+            LINE_INGEST_POINTS.labels("dropped").inc(data.count(b"\n") + (not data.endswith(b"\n")))
+            return
+
+        points = parse_lines(data, self.machine_tag, self.precision, self.measurement)
+        self.count_errors(points.errors)
+        self._buffer.extend(points)
+
+        if len(self._buffer) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        if connection is not None and len(self._buffer) >= self.max_buffered:
+            connection.transport.pause_reading()
+            self._paused.add(connection)
+
+    def count_errors(self, errors: int) -> None:
+        if errors:
+            LINE_INGEST_POINTS.labels("parse_error").inc(errors)
+
+    def forget(self, connection: _TCPProtocol) -> None:
+        self._paused.discard(connection)
+
+    async def flush(self) -> int:
+        """Write the buffered points and resume paused connections"""
+        points, self._buffer = self._buffer, ParsedPoints()
+        stored = 0
+        if len(points):
+            try:
+                stored = await run_in_threadpool(store_points, points)
+            except Exception as e:
+                LINE_INGEST_POINTS.labels("failed").inc(len(points))
+                logger.error(f"Failed to store {len(points)} line protocol points: {e}")
+
+        paused, self._paused = self._paused, set()
+        for connection in paused:
+            if not connection.transport.is_closing():
+                connection.transport.resume_reading()
+        return stored
+
+    async def serve(self) -> None:
+        """Listen until cancelled, then write what is still buffered"""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        reuse_port = hasattr(socket, "SO_REUSEPORT")
+        servers = []
+        try:
+            if self.tcp_port:
+                servers.append(await loop.create_server(
+                    lambda: _TCPProtocol(self), self.host, self.tcp_port, reuse_port=reuse_port
+                ))
+                logger.info(f"Line protocol listener on tcp://{self.host}:{self.tcp_port}")
+            if self.udp_port:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _UDPProtocol(self), local_addr=(self.host, self.udp_port), reuse_port=reuse_port
+                )
+                servers.append(transport)
+                logger.info(f"Line protocol listener on udp://{self.host}:{self.udp_port}")
+
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                await self.flush()
+        finally:
+            for server in servers:
+                server.close()
+            await self.flush()
+
+def create_listener() -> LineProtocolListener:
+    """Build the listener from settings"""
+    return LineProtocolListener(
+        host=settings.LINE_INGEST_HOST,
+        tcp_port=settings.LINE_INGEST_TCP_PORT,
+        udp_port=settings.LINE_INGEST_UDP_PORT,
+        batch_size=settings.LINE_INGEST_BATCH_SIZE,
+        flush_interval=settings.LINE_INGEST_FLUSH_INTERVAL_SECONDS,
+        max_buffered=settings.LINE_INGEST_MAX_BUFFERED,
+        max_line_bytes=settings.LINE_INGEST_MAX_LINE_BYTES,
+        machine_tag=settings.LINE_INGEST_MACHINE_TAG,
+        precision=settings.LINE_INGEST_PRECISION,
+        measurement=settings.LINE_INGEST_MEASUREMENT,
+    )
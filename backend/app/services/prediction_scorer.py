@@ -0,0 +1,156 @@
+"""
+Background batch scoring of failure predictions
+
+Every PREDICTION_SCORE_INTERVAL_SECONDS the scorer walks the machines in
+batches of PREDICTION_SCORE_BATCH_MACHINES, picks those with readings newer
+than both the lookback cutoff and their last stored prediction, and scores
+the whole batch with one model call. Results are appended to the
+predictions table, which serves the latest prediction and its history.
+
+Usage (from backend/), to score once:
+    python -m app.services.prediction_scorer
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import func, literal, select, union_all
+
+from app.core.config import settings
+from app.db.crud import predictions as predictions_crud
+from app.db.database import SessionLocal
+from app.db.shards import shard_router
+from app.ml.features import SENSOR_COLUMNS
+from app.ml.model import MLModel
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+from app.utils.metrics import PREDICTIONS_SCORED
+
+logger = logging.getLogger(__name__)
+
+# Readings per machine passed to the model, as for on-demand predictions
+HISTORY_ROWS = 100
+
+# Per-machine reads combined into one statement (SQLite allows 500 compound terms)
+READS_PER_STATEMENT = 200
+
+def newest_readings(db, machine_ids: Sequence[int]) -> Dict[int, datetime]:
+    """Newest reading timestamp per machine, each found with an index lookup"""
+    newest = {}
+    machine_ids = list(machine_ids)
+    for start in range(0, len(machine_ids), READS_PER_STATEMENT):
+        reads = [
+            select(
+                literal(machine_id),
+                select(func.max(SensorData.timestamp))
+                .where(SensorData.machine_id == machine_id)
+                .scalar_subquery()
+            )
+            for machine_id in machine_ids[start:start + READS_PER_STATEMENT]
+        ]
+        rows = db.execute(union_all(*reads)).all()
+        newest.update((machine_id, timestamp) for machine_id, timestamp in rows if timestamp is not None)
+    return newest
+
+def recent_readings(db, machine_ids: Sequence[int], limit: int = HISTORY_ROWS) -> pd.DataFrame:
+    """
+    The most recent readings of each machine
+
+    Each machine's readings are read with its own ORDER BY ... LIMIT on the
+    (machine_id, timestamp) index, combined into few statements with
+    UNION ALL, so machines with long histories cost no more than others.
+
+    Returns:
+        DataFrame with machine_id, timestamp and sensor columns
+    """
+    columns = [SensorData.machine_id, SensorData.timestamp] + [getattr(SensorData, column) for column in SENSOR_COLUMNS]
+    frames = []
+    machine_ids = list(machine_ids)
+    for start in range(0, len(machine_ids), READS_PER_STATEMENT):
+        reads = [
+            select(*columns).where(SensorData.machine_id == machine_id)
+            .order_by(SensorData.timestamp.desc()).limit(limit).subquery()
+            for machine_id in machine_ids[start:start + READS_PER_STATEMENT]
+        ]
+        rows = db.execute(union_all(*[select(read) for read in reads])).all()
+        frames.append(pd.DataFrame(rows, columns=['machine_id', 'timestamp'] + SENSOR_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+def score_machines(db, ml_model: MLModel, machine_ids: Sequence[int], since: datetime) -> int:
+    """
+    Score the machines of one batch that have new readings
+
+    Args:
+        db: Database session
+        ml_model: Model to score with
+        machine_ids: Machines of the batch
+        since: Machines whose newest reading is older are skipped
+
+    Returns:
+        Number of predictions stored
+    """
+    # Readings live on the shard of each machine, predictions in the main database
+    newest = {}
+    for shard_newest in shard_router.map(newest_readings, shard_router.group(db, machine_ids), db).values():
+        newest.update(shard_newest)
+    scored = predictions_crud.get_scored_as_of(db, list(newest))
+    due = [
+        machine_id for machine_id, as_of in newest.items()
+        if as_of >= since and (scored.get(machine_id) is None or as_of > scored[machine_id])
+    ]
+    if not due:
+        return 0
+
+    readings = shard_router.map(recent_readings, shard_router.group(db, due), db)
+    results = ml_model.predict_failure_batch(pd.concat(readings.values(), ignore_index=True))
+    now = datetime.utcnow()
+    predictions_crud.create_predictions(db, [
+        {
+            "machine_id": int(row.machine_id),
+            "timestamp": now,
+            "as_of": newest[int(row.machine_id)],
+            "failure_probability": float(row.failure_probability),
+            "is_failure_predicted": bool(row.is_failure_predicted),
+            "confidence": float(row.prediction_confidence),
+            "model_version": ml_model.version,
+        }
+        for row in results.itertuples(index=False)
+    ])
+    PREDICTIONS_SCORED.inc(len(results))
+    return len(results)
+
+def score_all(db, ml_model: MLModel, batch_machines: Optional[int] = None) -> int:
+    """
+    Score every machine with new readings, one batch of machines at a time
+
+    Returns:
+        Number of predictions stored
+    """
+    batch_machines = batch_machines or settings.PREDICTION_SCORE_BATCH_MACHINES
+    since = datetime.utcnow() - timedelta(hours=settings.PREDICTION_SCORE_LOOKBACK_HOURS)
+    total = 0
+    after_id = 0
+    while True:
+        machine_ids: List[int] = db.execute(
+            select(Machine.id).where(Machine.id > after_id).order_by(Machine.id).limit(batch_machines)
+        ).scalars().all()
+        if not machine_ids:
+            break
+        total += score_machines(db, ml_model, machine_ids, since)
+        after_id = machine_ids[-1]
+    if total:
+        logger.info(f"Scored {total} machines")
+    return total
+
+def run_scorer(ml_model: MLModel) -> int:
+    """Score in a session of its own, for the background job"""
+    with SessionLocal() as db:
+        return score_all(db, ml_model)
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(f"Scored {run_scorer(MLModel(settings.MODEL_PATH))} machines")
+
+if __name__ == "__main__":
+    main()
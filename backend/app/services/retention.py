@@ -0,0 +1,256 @@
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pandas as pd
+from sqlalchemy import delete, select, text
+
+from app.core.config import settings
+from app.db.shards import shard_router
+from app.models.sensor import SensorData
+from app.models.sensor_rollup import SensorDataRollup
+
+logger = logging.getLogger(__name__)
+
+SENSOR_COLUMNS = ['temperature', 'vibration', 'pressure', 'rpm', 'voltage', 'current', 'noise_level']
+
+# Rows read per chunk when rewriting CSV files
+CSV_CHUNK_ROWS = 100000
+
+# Report of the most recent retention run
+last_report: Dict[str, Any] = {}
+
+def retention_cutoff(now: datetime = None) -> datetime:
+    """Oldest timestamp kept as raw readings, aligned to the hour"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.SENSOR_RETENTION_DAYS)
+    return cutoff.replace(minute=0, second=0, microsecond=0)
+
+def _hourly_aggregates(df: pd.DataFrame, key_columns: list) -> pd.DataFrame:
+    """Aggregate readings per hour and sensor into mergeable count/total/min/max"""
+    df = df.assign(bucket_start=df['timestamp'].dt.floor('H'))
+    long = df.melt(
+        id_vars=key_columns + ['bucket_start'],
+        value_vars=[column for column in SENSOR_COLUMNS if column in df.columns],
+        var_name='sensor'
+    ).dropna(subset=['value'])
+    long['value_sq'] = long['value'] ** 2
+
+    grouped = long.groupby(key_columns + ['bucket_start', 'sensor'])
+    return grouped.agg(
+        count=('value', 'count'),
+        total=('value', 'sum'),
+        total_sq=('value_sq', 'sum'),
+        minimum=('value', 'min'),
+        maximum=('value', 'max'),
+    ).reset_index()
+
+def fold_expired_chunk(db, cutoff: datetime, batch_size: int) -> int:
+    """
+    Fold one chunk of expired readings into hourly rollups and delete them
+
+    Aggregates are merged into any existing rollup rows, so buckets that span
+    several chunks or runs stay correct. The fold and the delete commit in one
+    short transaction.
+
+    Args:
+        db: Database session
+        cutoff: Readings older than this are expired
+        batch_size: Maximum number of readings handled in this chunk
+
+    Returns:
+        Number of readings folded and deleted
+    """
+    columns = [SensorData.id, SensorData.machine_id, SensorData.timestamp]
+    columns += [getattr(SensorData, column) for column in SENSOR_COLUMNS]
+    rows = db.execute(
+        select(*columns).where(SensorData.timestamp < cutoff).order_by(SensorData.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    df = pd.DataFrame(rows, columns=['id', 'machine_id', 'timestamp'] + SENSOR_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    aggregates = _hourly_aggregates(df, ['machine_id'])
+
+    existing = db.query(SensorDataRollup).filter(
+        SensorDataRollup.machine_id.in_(aggregates['machine_id'].unique().tolist()),
+        SensorDataRollup.bucket_start >= aggregates['bucket_start'].min().to_pydatetime(),
+        SensorDataRollup.bucket_start <= aggregates['bucket_start'].max().to_pydatetime()
+    ).all()
+    existing = {(rollup.machine_id, rollup.bucket_start, rollup.sensor): rollup for rollup in existing}
+
+    for row in aggregates.itertuples(index=False):
+        key = (int(row.machine_id), row.bucket_start.to_pydatetime(), row.sensor)
+        rollup = existing.get(key)
+        if rollup is None:
+            db.add(SensorDataRollup(
+                machine_id=key[0],
+                bucket_start=key[1],
+                sensor=key[2],
+                count=int(row.count),
+                total=float(row.total),
+                total_sq=float(row.total_sq),
+                minimum=float(row.minimum),
+                maximum=float(row.maximum)
+            ))
+        else:
+            rollup.count += int(row.count)
+            rollup.total += float(row.total)
+            rollup.total_sq += float(row.total_sq)
+            rollup.minimum = min(rollup.minimum, float(row.minimum))
+            rollup.maximum = max(rollup.maximum, float(row.maximum))
+
+    db.execute(delete(SensorData).where(SensorData.id.in_(df['id'].tolist())))
+    db.commit()
+    return len(rows)
+
+def prune_csv_files(cutoff: datetime) -> int:
+    """
+    Fold expired rows of the CSV files in SENSOR_DATA_DIR into hourly rollup files
+
+    Each file is streamed in chunks into a temporary file holding only the
+    rows that are kept, and the rollups of the expired rows into another.
+    The rollups are appended to the rollup file only after the pruned file
+    has been swapped in place, so a run that fails part way leaves both
+    files as they were and a rerun does not count the rows twice.
+
+    Args:
+        cutoff: Rows older than this are expired
+
+    Returns:
+        Number of CSV rows pruned
+    """
+    pruned = 0
+    for file_path in Path(settings.SENSOR_DATA_DIR).glob("*_sensor_data.csv"):
+        temp_path = file_path.with_suffix(".csv.tmp")
+        rollup_path = file_path.with_name(file_path.name.replace("_sensor_data.csv", "_sensor_rollup.csv"))
+        rollup_temp_path = rollup_path.with_suffix(".csv.tmp")
+        file_pruned = 0
+
+        try:
+            write_header = True
+            for chunk in pd.read_csv(file_path, chunksize=CSV_CHUNK_ROWS):
+                timestamps = pd.to_datetime(chunk['timestamp'], errors='coerce')
+                expired = timestamps < cutoff
+
+                if expired.any():
+                    expired_rows = chunk[expired].assign(timestamp=timestamps[expired])
+                    rollups = _hourly_aggregates(expired_rows, ['machine_id'])
+                    rollups.to_csv(rollup_temp_path, mode='a' if file_pruned else 'w', header=not file_pruned, index=False)
+                    file_pruned += int(expired.sum())
+
+                chunk[~expired].to_csv(temp_path, mode='w' if write_header else 'a', header=write_header, index=False)
+                write_header = False
+
+            if file_pruned:
+                os.replace(temp_path, file_path)
+                _append_rollups(rollup_temp_path, rollup_path)
+                pruned += file_pruned
+            elif temp_path.exists():
+                temp_path.unlink()
+
+        except Exception as e:
+            logger.error(f"Error pruning {file_path}: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
+        finally:
+            if rollup_temp_path.exists():
+                rollup_temp_path.unlink()
+
+    return pruned
+
+def _append_rollups(rollup_temp_path: Path, rollup_path: Path) -> None:
+    """Move new rollups into the rollup file, keeping only its first header"""
+    if not rollup_path.exists():
+        os.replace(rollup_temp_path, rollup_path)
+        return
+    with open(rollup_temp_path, 'rb') as source, open(rollup_path, 'ab') as target:
+        source.readline()
+        shutil.copyfileobj(source, target)
+
+def reclaim_space(engine) -> str:
+    """
+    Return freed pages of one database to the operating system
+
+    SQLite databases created with auto_vacuum=INCREMENTAL release a bounded
+    number of pages per run; other SQLite databases are left alone because a
+    full VACUUM locks the whole file. PostgreSQL gets VACUUM ANALYZE.
+
+    Args:
+        engine: Engine of the database (the main database or a shard)
+
+    Returns:
+        Description of what was done
+    """
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            auto_vacuum = connection.execute(text("PRAGMA auto_vacuum")).scalar()
+            if auto_vacuum != 2:
+                return "skipped (auto_vacuum is not INCREMENTAL)"
+            # The sqlite3 driver steps a PRAGMA once and each step frees one page
+            free_pages = connection.execute(text("PRAGMA freelist_count")).scalar()
+            pages = min(free_pages, settings.RETENTION_VACUUM_PAGES)
+            for _ in range(pages):
+                connection.exec_driver_sql("PRAGMA incremental_vacuum(1)")
+            connection.commit()
+        return f"incremental_vacuum ({pages} pages)"
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM (ANALYZE) sensor_data"))
+        return "vacuum_analyze"
+
+    return "skipped"
+
+def _fold_expired(db, cutoff: datetime) -> Tuple[int, int]:
+    """Fold all expired readings of one database, returning the readings and chunks folded"""
+    rows_pruned = 0
+    chunks = 0
+    while True:
+        folded = fold_expired_chunk(db, cutoff, settings.RETENTION_BATCH_SIZE)
+        if not folded:
+            return rows_pruned, chunks
+        rows_pruned += folded
+        chunks += 1
+
+def run_retention() -> Dict[str, Any]:
+    """
+    Run one retention pass over the database (every shard) and the CSV store
+
+    Returns:
+        Report with the number of rows pruned and how long the run took
+    """
+    global last_report
+    started = time.monotonic()
+    cutoff = retention_cutoff()
+
+    # Shards are pruned in parallel, each in chunks of its own
+    results = shard_router.scatter(_fold_expired, cutoff)
+    rows_pruned = sum(rows for rows, _ in results)
+    chunks = sum(chunks for _, chunks in results)
+
+    csv_rows_pruned = prune_csv_files(cutoff)
+    if rows_pruned:
+        vacuum = ", ".join(sorted({reclaim_space(shard_engine) for shard_engine in shard_router.engines}))
+    else:
+        vacuum = "skipped (nothing pruned)"
+
+    last_report = {
+        "run_at": datetime.utcnow().isoformat(),
+        "cutoff": cutoff.isoformat(),
+        "rows_pruned": rows_pruned,
+        "chunks": chunks,
+        "csv_rows_pruned": csv_rows_pruned,
+        "vacuum": vacuum,
+        "duration_seconds": round(time.monotonic() - started, 3),
+    }
+    logger.info(
+        f"Retention pruned {rows_pruned} readings in {chunks} chunks and "
+        f"{csv_rows_pruned} CSV rows older than {cutoff.isoformat()}"
+    )
+    return last_report
@@ -5,6 +5,8 @@ from pathlib import Path
 import logging
 from typing import Dict, Any
 
+from app.core.config import settings
+
 # Import ML model for anomaly detection
 from app.ml.model import detect_anomalies
 
@@ -14,7 +16,7 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 # Data storage directory
-DATA_DIR = Path("./data/sensor_data")
+DATA_DIR = Path(settings.SENSOR_DATA_DIR)
 DATA_DIR.mkdir(exist_ok=True, parents=True)
 
 def process_sensor_data(data: Dict[str, Any]) -> Dict[str, Any]:
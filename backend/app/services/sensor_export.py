@@ -0,0 +1,195 @@
+import csv
+import heapq
+import io
+import itertools
+import logging
+from datetime import datetime
+from operator import itemgetter
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.crud.sensors import SENSOR_DATA_COLUMNS
+from app.db.database import SessionLocal
+from app.db.shards import shard_router
+from app.models.sensor import SensorData
+from app.services.sensor_formats import ARROW_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor and emitted per response chunk
+EXPORT_CHUNK_ROWS = 50000
+
+def _export_filter(query, machine_ids: Optional[List[int]], start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Apply the export selection to a query"""
+    if machine_ids:
+        query = query.where(SensorData.machine_id.in_(machine_ids))
+    if start_date:
+        query = query.where(SensorData.timestamp >= start_date)
+    if end_date:
+        query = query.where(SensorData.timestamp <= end_date)
+    return query
+
+def _export_shards(db: Session, machine_ids: Optional[List[int]]) -> List[int]:
+    """Shards holding the exported machines"""
+    if not machine_ids:
+        return list(range(shard_router.count))
+    return sorted(shard_router.group(db, machine_ids))
+
+def count_export_rows(
+    db: Session,
+    machine_ids: Optional[List[int]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> int:
+    """Count the rows an export will produce, so clients can report progress"""
+    query = _export_filter(select(func.count(SensorData.id)), machine_ids, start_date, end_date)
+    counts = shard_router.map(
+        lambda shard_db, _: shard_db.execute(query).scalar_one(),
+        dict.fromkeys(_export_shards(db, machine_ids)),
+        db
+    )
+    return sum(counts.values())
+
+def _iter_partitions(
+    machine_ids: Optional[List[int]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    chunk_rows: int
+) -> Iterator[list]:
+    """
+    Stream export rows from server-side cursors, one partition at a time
+
+    With shards, every shard's cursor is ordered by machine and time and
+    their rows are merged into one ordered stream. The generator owns its
+    sessions because it outlives the request handler that created the
+    response.
+    """
+    columns = [getattr(SensorData, column) for column in SENSOR_DATA_COLUMNS]
+    query = _export_filter(select(*columns), machine_ids, start_date, end_date)
+    query = query.order_by(SensorData.machine_id, SensorData.timestamp)
+    query = query.execution_options(yield_per=chunk_rows)
+
+    with SessionLocal() as db:
+        shards = _export_shards(db, machine_ids)
+
+    sessions = [shard_router.session(shard) for shard in shards]
+    try:
+        streams = [db.execute(query).partitions() for db in sessions]
+        if len(streams) == 1:
+            yield from streams[0]
+            return
+
+        # Rows are (id, machine_id, timestamp, ...)
+        rows = heapq.merge(*[itertools.chain.from_iterable(stream) for stream in streams], key=itemgetter(1, 2))
+        while True:
+            partition = list(itertools.islice(rows, chunk_rows))
+            if not partition:
+                break
+            yield partition
+    finally:
+        for db in sessions:
+            db.close()
+
+def iter_export_csv(
+    machine_ids: Optional[List[int]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """
+    Generate a CSV export of sensor data
+
+    Args:
+        machine_ids: Machines to export, or None for all machines
+        start_date: Inclusive start of the time range
+        end_date: Inclusive end of the time range
+        chunk_rows: Number of rows encoded per yielded chunk
+
+    Yields:
+        The header line, then one CSV chunk of up to ``chunk_rows`` rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(SENSOR_DATA_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+
+    exported = 0
+    for partition in _iter_partitions(machine_ids, start_date, end_date, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(partition)
+        exported += len(partition)
+        yield buffer.getvalue().encode("utf-8")
+
+    logger.info(f"Exported {exported} sensor readings as CSV")
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_export_parquet(
+    machine_ids: Optional[List[int]] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """
+    Generate a Parquet export of sensor data
+
+    Each partition of the cursor becomes one row group, and its bytes are
+    yielded as soon as the row group is written.
+
+    Args:
+        machine_ids: Machines to export, or None for all machines
+        start_date: Inclusive start of the time range
+        end_date: Inclusive end of the time range
+        chunk_rows: Number of rows per row group
+
+    Yields:
+        Parquet file bytes, one row group at a time, then the footer
+    """
+    schema = pa.schema([ARROW_SCHEMA.field(column) for column in SENSOR_DATA_COLUMNS])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    exported = 0
+    for partition in _iter_partitions(machine_ids, start_date, end_date, chunk_rows):
+        arrays = [
+            pa.array(values, type=field.type)
+            for values, field in zip(zip(*partition), schema)
+        ]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        exported += len(partition)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+    logger.info(f"Exported {exported} sensor readings as Parquet")
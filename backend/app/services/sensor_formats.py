@@ -0,0 +1,119 @@
+import json
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import pyarrow as pa
+
+# Media types offered by the sensor data read endpoints
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.sensor-columns+json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Short names accepted through the ``format`` query parameter
+FORMAT_MEDIA_TYPES = {
+    "json": JSON_MEDIA_TYPE,
+    "columnar": COLUMNAR_JSON_MEDIA_TYPE,
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+}
+
+# Arrow types for each sensor data column
+ARROW_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("machine_id", pa.int64()),
+    ("timestamp", pa.timestamp("us")),
+    ("temperature", pa.float64()),
+    ("vibration", pa.float64()),
+    ("pressure", pa.float64()),
+    ("rpm", pa.float64()),
+    ("voltage", pa.float64()),
+    ("current", pa.float64()),
+    ("noise_level", pa.float64()),
+])
+
+def negotiate_media_type(accept: Optional[str], format: Optional[str] = None) -> Optional[str]:
+    """
+    Pick the response media type for a sensor data read
+
+    Args:
+        accept: Raw Accept header sent by the client
+        format: Optional short format name that overrides the Accept header
+
+    Returns:
+        The chosen media type, or None if nothing acceptable is offered
+    """
+    if format:
+        return FORMAT_MEDIA_TYPES.get(format)
+
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    # Collect (quality, position, media type) and keep the best offered match
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+
+        if media_type in ("*/*", "application/*"):
+            candidates.append((quality, position, JSON_MEDIA_TYPE))
+        elif media_type in FORMAT_MEDIA_TYPES.values():
+            candidates.append((quality, position, media_type))
+
+    if not candidates:
+        return None
+
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+    return candidates[0][2]
+
+def _encode_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Encode a timestamp the same way the row JSON responses do"""
+    return value.isoformat() if value is not None else None
+
+def to_columnar_json(columns: Dict[str, List[Any]]) -> bytes:
+    """
+    Encode column lists as a columnar JSON document
+
+    Args:
+        columns: Mapping of column name to the list of its values
+
+    Returns:
+        UTF-8 JSON with one array per field
+    """
+    data = dict(columns)
+    if "timestamp" in data:
+        data["timestamp"] = list(map(_encode_timestamp, data["timestamp"]))
+
+    row_count = len(next(iter(data.values()))) if data else 0
+    document = {
+        "columns": list(data.keys()),
+        "row_count": row_count,
+        "data": data,
+    }
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+def to_arrow_ipc(columns: Dict[str, List[Any]]) -> bytes:
+    """
+    Encode column lists as an Apache Arrow IPC stream
+
+    Args:
+        columns: Mapping of column name to the list of its values
+
+    Returns:
+        Bytes of a single-batch Arrow IPC stream
+    """
+    schema = pa.schema([ARROW_SCHEMA.field(name) for name in columns])
+    arrays = [pa.array(values, type=schema.field(name).type) for name, values in columns.items()]
+    batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
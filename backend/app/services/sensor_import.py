@@ -0,0 +1,215 @@
+import csv
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.crud import import_jobs as import_jobs_crud
+from app.db.database import SessionLocal
+from app.db.shards import shard_router
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+from app.models.sensor_sketch import SensorSketch
+from app.services import sketches
+from app.utils.metrics import SENSOR_INGEST_ROWS
+
+logger = logging.getLogger(__name__)
+
+# Uploaded files are spooled here so jobs can be resumed without re-uploading
+IMPORT_DIR = Path("./data/imports")
+IMPORT_DIR.mkdir(exist_ok=True, parents=True)
+
+# Rows parsed, validated and committed per transaction
+IMPORT_CHUNK_ROWS = 20000
+
+# Bytes copied per read while spooling an upload
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+REQUIRED_COLUMNS = ['machine_id', 'timestamp', 'temperature', 'vibration', 'pressure', 'rpm']
+OPTIONAL_COLUMNS = ['voltage', 'current', 'noise_level']
+SENSOR_COLUMNS = ['temperature', 'vibration', 'pressure', 'rpm'] + OPTIONAL_COLUMNS
+
+# Jobs currently executing in this process
+_running_jobs = set()
+
+def spool_path(job_id: str, format: str) -> Path:
+    """Location of the spooled upload for a job"""
+    return IMPORT_DIR / f"{job_id}.{format}"
+
+def spool_upload(source, job_id: str, format: str) -> Optional[int]:
+    """
+    Copy an uploaded file to the import directory block by block
+
+    Blocking; call it from the threadpool in async code.
+
+    Args:
+        source: Readable binary file object of the upload
+        job_id: ID of the import job the file belongs to
+        format: File format, 'csv' or 'parquet'
+
+    Returns:
+        Number of data rows in the file
+    """
+    path = spool_path(job_id, format)
+    with open(path, "wb") as target:
+        while True:
+            block = source.read(SPOOL_BLOCK_SIZE)
+            if not block:
+                break
+            target.write(block)
+
+    if format == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    return count_csv_rows(path)
+
+def count_csv_rows(path: Path) -> int:
+    """Number of data rows in a CSV file, with quoted fields that span lines counted once"""
+    with open(path, newline="", encoding="utf-8", errors="replace") as file:
+        # Blank lines are skipped like pandas does, and the header is not a row
+        rows = sum(1 for row in csv.reader(file) if row)
+    return max(rows - 1, 0)
+
+def _iter_chunks(path: Path, format: str, chunk_rows: int, skip_chunks: int) -> Iterator[pd.DataFrame]:
+    """Read a spooled file chunk by chunk, skipping chunks already committed"""
+    if format == "parquet":
+        parquet_file = pq.ParquetFile(path)
+        for index, batch in enumerate(parquet_file.iter_batches(batch_size=chunk_rows)):
+            if index < skip_chunks:
+                continue
+            yield batch.to_pandas()
+    else:
+        skip_rows = range(1, skip_chunks * chunk_rows + 1) if skip_chunks else None
+        yield from pd.read_csv(path, chunksize=chunk_rows, skiprows=skip_rows)
+
+def validate_chunk(db, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """
+    Validate a chunk of imported rows against the SensorData model
+
+    All checks run column-wise over the whole chunk: numeric and timestamp
+    coercion, required values present and finite, and machine IDs known.
+
+    Args:
+        db: Database session used to look up machine IDs
+        chunk: Raw rows parsed from the upload
+
+    Returns:
+        Tuple of the valid rows ready for insert and the number rejected
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    rows = pd.DataFrame({
+        'machine_id': pd.to_numeric(chunk['machine_id'], errors='coerce'),
+        'timestamp': pd.to_datetime(chunk['timestamp'], errors='coerce', utc=True).dt.tz_localize(None),
+    })
+    for column in SENSOR_COLUMNS:
+        if column in chunk.columns:
+            rows[column] = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+        else:
+            rows[column] = np.nan
+
+    required = rows[REQUIRED_COLUMNS]
+    valid = required.notna().all(axis=1).to_numpy()
+    valid &= np.isfinite(rows[SENSOR_COLUMNS[:4]].to_numpy()).all(axis=1)
+
+    # Optional readings may be missing but never infinite
+    optional = rows[OPTIONAL_COLUMNS].to_numpy()
+    valid &= ~np.isinf(optional).any(axis=1)
+
+    machine_ids = rows['machine_id'].to_numpy()
+    valid &= machine_ids == np.floor(machine_ids)
+    candidate_ids = [int(machine_id) for machine_id in np.unique(machine_ids[valid])]
+    if candidate_ids:
+        known_ids = db.execute(select(Machine.id).where(Machine.id.in_(candidate_ids))).scalars().all()
+        valid &= rows['machine_id'].isin(known_ids).to_numpy()
+    else:
+        valid[:] = False
+
+    accepted = rows[valid].astype({'machine_id': 'int64'})
+    return accepted, int((~valid).sum())
+
+def _to_records(rows: pd.DataFrame) -> List[dict]:
+    """Convert validated rows to insert parameters, mapping NaN to NULL"""
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows['timestamp'] = [timestamp.to_pydatetime() for timestamp in rows['timestamp']]
+    return rows.to_dict('records')
+
+def _insert_rows(db, rows: pd.DataFrame) -> None:
+    """Insert validated rows and, if enabled, their hourly sketches"""
+    db.execute(insert(SensorData), _to_records(rows))
+    if settings.SKETCHES_ENABLED:
+        # Committed with the rows, so a resumed job does not sketch them twice
+        sketch_rows = sketches.frame_sketch_rows(rows, settings.SKETCH_RELATIVE_ACCURACY)
+        if sketch_rows:
+            db.execute(insert(SensorSketch), sketch_rows)
+
+def _insert_shard_rows(db, rows: pd.DataFrame) -> None:
+    _insert_rows(db, rows)
+    db.commit()
+
+def run_import_job(job_id: str) -> None:
+    """
+    Run or resume a bulk sensor data import job
+
+    Each chunk is inserted and the job's progress updated in the same
+    transaction, so a failed or interrupted job resumes after the last
+    committed chunk. With shards, each shard commits its part of a chunk
+    in parallel before the progress is committed, so a job interrupted in
+    between imports that chunk again when resumed.
+
+    Args:
+        job_id: ID of the import job to run
+    """
+    if job_id in _running_jobs:
+        logger.warning(f"Import job {job_id} is already running")
+        return
+    _running_jobs.add(job_id)
+
+    db = SessionLocal()
+    try:
+        job = import_jobs_crud.update_import_job_status(db, job_id, "running")
+        path = spool_path(job.id, job.format)
+
+        for chunk in _iter_chunks(path, job.format, job.chunk_rows, job.chunks_completed):
+            rows, rejected = validate_chunk(db, chunk)
+            if len(rows) and shard_router.sharded:
+                shards = shard_router.assign(db, rows['machine_id'].to_numpy())
+                shard_router.map(_insert_shard_rows, {
+                    int(shard): rows[shards == shard] for shard in np.unique(shards)
+                })
+            elif len(rows):
+                _insert_rows(db, rows)
+
+            job.rows_processed += len(chunk)
+            job.rows_inserted += len(rows)
+            job.rows_rejected += rejected
+            job.chunks_completed += 1
+            db.commit()
+            SENSOR_INGEST_ROWS.labels("import").inc(len(rows))
+
+            logger.info(
+                f"Import job {job_id}: {job.rows_processed}/{job.total_rows or '?'} rows processed"
+            )
+
+        import_jobs_crud.update_import_job_status(db, job_id, "completed")
+        path.unlink(missing_ok=True)
+        logger.info(f"Import job {job_id} completed: {job.rows_inserted} inserted, {job.rows_rejected} rejected")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Import job {job_id} failed: {e}")
+        import_jobs_crud.update_import_job_status(db, job_id, "failed", error=str(e))
+
+    finally:
+        _running_jobs.discard(job_id)
+        db.close()
+
+def is_job_running(job_id: str) -> bool:
+    """Check whether an import job is executing in this process"""
+    return job_id in _running_jobs
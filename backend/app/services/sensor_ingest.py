@@ -0,0 +1,108 @@
+"""
+Shared write path for ingested sensor readings
+
+Every ingest route (the HTTP endpoints and the line protocol listener)
+stores readings and then hands them to the in-memory consumers: rolling
+features, shared fleet state, alerts, the status engine and the quantile
+sketch buffer. The consumers take one array per column, so a large batch
+costs a few vectorized passes rather than attribute lookups per reading.
+
+Readings of machines on different shards are written in parallel.
+"""
+from datetime import datetime
+from typing import Dict, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.crud import sensors as sensors_crud
+from app.db.shards import shard_router
+from app.ml.features import SENSOR_COLUMNS, feature_engine
+from app.services import alerts
+from app.services.sketches import sketch_accumulator
+from app.services.status_engine import status_engine
+from app.utils.metrics import SENSOR_INGEST_ROWS
+from app.utils.shared_state import fleet_state
+
+def after_store(machine_id: int, rows: Sequence) -> None:
+    """
+    Feed one machine's stored readings to the in-memory consumers
+
+    Args:
+        machine_id: Machine the readings belong to
+        rows: Stored readings (objects with timestamp and sensor attributes)
+    """
+    if not rows:
+        return
+    rows = sorted(rows, key=lambda row: row.timestamp)
+    timestamps = np.array([row.timestamp for row in rows], dtype="datetime64[us]")
+    columns = {
+        sensor: np.array([getattr(row, sensor) for row in rows], dtype=np.float64)
+        for sensor in SENSOR_COLUMNS
+    }
+    after_store_columns(machine_id, timestamps, columns)
+
+def after_store_columns(machine_id: int, timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Feed one machine's stored readings, given as arrays, to the in-memory consumers
+
+    Args:
+        machine_id: Machine the readings belong to
+        timestamps: datetime64 timestamps in time order
+        columns: One array per sensor in the same order, NaN where missing
+    """
+    if not len(timestamps):
+        return
+    values = np.column_stack([columns[sensor] for sensor in SENSOR_COLUMNS])
+    # Each worker sees only some of a machine's readings, so several workers read features from the database
+    if settings.WORKERS == 1:
+        feature_engine.update_values(machine_id, values)
+
+    # Share the newest reading with all workers
+    newest = timestamps[-1].astype("datetime64[us]").astype(datetime)
+    fleet_state.record_reading(machine_id, newest, values[-1])
+
+    alerts.check_columns(machine_id, columns)
+    if settings.STATUS_ENGINE_ENABLED:
+        status_engine.update_columns(machine_id, columns)
+    if settings.SKETCHES_ENABLED:
+        sketch_accumulator.add_columns(np.full(len(timestamps), machine_id, dtype=np.int64), timestamps, values)
+
+def store_columns(db, columns: Dict[str, np.ndarray], path: str) -> int:
+    """
+    Store validated readings of any number of machines and feed them to the consumers
+
+    Args:
+        db: Database session
+        columns: One array per column: machine_id, timestamp (datetime64) and
+            every sensor (NaN where missing)
+        path: Ingest path label for the ingest metrics
+
+    Returns:
+        Number of readings stored
+    """
+    if not len(columns["machine_id"]):
+        return 0
+    shards = shard_router.assign(db, columns["machine_id"])
+    order = np.lexsort((columns["timestamp"], columns["machine_id"], shards))
+    columns = {column: values[order] for column, values in columns.items()}
+    shards = shards[order]
+
+    # Each shard's readings are a contiguous slice after sorting
+    bounds = np.flatnonzero(np.diff(shards)) + 1
+    parts = {
+        int(shards[start]): {column: values[start:end] for column, values in columns.items()}
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(shards)]]))
+    }
+    stored = sum(shard_router.map(sensors_crud.create_sensor_data_columns, parts, db).values())
+    SENSOR_INGEST_ROWS.labels(path).inc(stored)
+
+    machine_ids = columns["machine_id"]
+    boundaries = np.flatnonzero(np.diff(machine_ids)) + 1
+    for start, end in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(machine_ids)]])):
+        after_store_columns(
+            int(machine_ids[start]),
+            columns["timestamp"][start:end],
+            {sensor: columns[sensor][start:end] for sensor in SENSOR_COLUMNS}
+        )
+    return stored
@@ -0,0 +1,376 @@
+"""
+Hourly quantile sketches of sensor readings
+
+Readings are buffered at ingest and folded into one QuantileSketch per
+machine, sensor and hour. Each worker appends its partial sketches to
+sensor_sketches every SKETCH_FLUSH_INTERVAL_SECONDS. Compaction later
+merges the partial rows of finished hours into one row each.
+
+Range queries merge the hourly rows that overlap the range, so ranges are
+widened to whole hours. Readings not yet flushed are not included.
+
+Statistics fall back to the raw readings for ranges reaching back before
+the first sketched hour. To build sketches for readings stored before
+sketches existed (with ingest stopped), from backend/:
+    python -m app.services.sketches --backfill [--machine-id ID]
+"""
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.shards import shard_router
+from app.ml.features import SENSOR_COLUMNS
+from app.models.sensor import SensorData
+from app.models.sensor_sketch import SensorSketch
+from app.utils.quantile_sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Keys of compacted hours merged per transaction
+COMPACTION_BATCH = 500
+
+# Readings read per chunk when backfilling
+BACKFILL_CHUNK_ROWS = 200000
+
+_EPOCH_HOUR = np.datetime64("1970-01-01T00", "h")
+
+def hour_floor(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _sketch_rows(machine_ids: np.ndarray, hours: np.ndarray, values: np.ndarray, alpha: float) -> List[dict]:
+    """Sketch readings per machine, hour and sensor, as sensor_sketches rows"""
+    order = np.lexsort((hours, machine_ids))
+    machine_ids, hours, values = machine_ids[order], hours[order], values[order]
+    boundaries = np.flatnonzero((np.diff(machine_ids) != 0) | (np.diff(hours) != 0)) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(machine_ids)]])
+
+    rows = []
+    for start, end in zip(starts, ends):
+        bucket_start = (_EPOCH_HOUR + hours[start]).astype(datetime)
+        for index, sensor in enumerate(SENSOR_COLUMNS):
+            sketch = QuantileSketch.from_values(values[start:end, index], alpha)
+            if sketch.count:
+                rows.append(_to_row(int(machine_ids[start]), sensor, bucket_start, sketch))
+    return rows
+
+def frame_sketch_rows(df: pd.DataFrame, alpha: float) -> List[dict]:
+    """Sketch readings from a DataFrame with machine_id, timestamp and sensor columns"""
+    if not len(df):
+        return []
+    hours = pd.to_datetime(df["timestamp"]).to_numpy().astype("datetime64[h]")
+    values = np.column_stack([
+        df[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in df.columns
+        else np.full(len(df), np.nan)
+        for column in SENSOR_COLUMNS
+    ])
+    return _sketch_rows(df["machine_id"].to_numpy(dtype=np.int64), (hours - _EPOCH_HOUR).astype(np.int64), values, alpha)
+
+def _to_row(machine_id: int, sensor: str, bucket_start: datetime, sketch: QuantileSketch) -> dict:
+    return {
+        "machine_id": machine_id,
+        "sensor": sensor,
+        "bucket_start": bucket_start,
+        "count": sketch.count,
+        "total": sketch.total,
+        "total_sq": sketch.total_sq,
+        "minimum": sketch.minimum,
+        "maximum": sketch.maximum,
+        "sketch": sketch.to_bytes(),
+    }
+
+def _from_row(row) -> QuantileSketch:
+    return QuantileSketch.from_bytes(row.sketch, row.count, row.total, row.total_sq, row.minimum, row.maximum)
+
+class SketchAccumulator:
+    """Buffers ingested readings and writes them as hourly sketches
+
+    ``add_columns`` only appends a block of arrays to a buffer, so ingest
+    pays no sketching cost. ``flush`` sketches the whole buffer
+    at once and appends one row per machine, sensor and hour.
+    """
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self._blocks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._lock = threading.Lock()
+
+    def add_columns(self, machine_ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        Buffer stored readings given as arrays
+
+        Args:
+            machine_ids: Machine of each reading
+            timestamps: datetime64 timestamp of each reading
+            values: Array of shape (readings, sensors) in SENSOR_COLUMNS order, NaN where missing
+        """
+        hours = (timestamps.astype("datetime64[h]") - _EPOCH_HOUR).astype(np.int64)
+        with self._lock:
+            self._blocks.append((machine_ids, hours, values))
+
+    @property
+    def buffered(self) -> int:
+        """Readings waiting to be flushed"""
+        with self._lock:
+            return sum(len(block[0]) for block in self._blocks)
+
+    def flush(self) -> int:
+        """
+        Sketch and write the buffered readings
+
+        Returns:
+            Number of sketch rows written
+        """
+        with self._lock:
+            blocks, self._blocks = self._blocks, []
+        if not blocks:
+            return 0
+
+        machine_ids = np.concatenate([block[0] for block in blocks])
+        hours = np.concatenate([block[1] for block in blocks])
+        values = np.concatenate([block[2] for block in blocks])
+        with SessionLocal() as db:
+            shards = shard_router.assign(db, machine_ids)
+        parts = {int(shard): shards == shard for shard in np.unique(shards)}
+
+        def write(db, mask: np.ndarray) -> int:
+            rows = _sketch_rows(machine_ids[mask], hours[mask], values[mask], self.alpha)
+            db.execute(insert(SensorSketch), rows)
+            db.commit()
+            return len(rows)
+
+        results = shard_router.map(write, parts, return_exceptions=True)
+        failed = [shard for shard, result in results.items() if isinstance(result, Exception)]
+        if failed:
+            # Keep the readings of the failed shards for the next flush
+            with self._lock:
+                self._blocks[:0] = [
+                    (machine_ids[parts[shard]], hours[parts[shard]], values[parts[shard]]) for shard in failed
+                ]
+            raise results[failed[0]]
+        return sum(results.values())
+
+def compact_sketches(db, before: Optional[datetime] = None, batch_size: int = COMPACTION_BATCH) -> int:
+    """
+    Merge the partial sketches of each finished hour into one row
+
+    Args:
+        db: Database session
+        before: Only hours starting before this are compacted (defaults to the current hour)
+        batch_size: Hours merged per transaction
+
+    Returns:
+        Number of hours compacted
+    """
+    before = before or hour_floor(datetime.utcnow())
+    compacted = 0
+    while True:
+        keys = db.execute(
+            select(SensorSketch.machine_id, SensorSketch.sensor, SensorSketch.bucket_start)
+            .where(SensorSketch.bucket_start < before)
+            .group_by(SensorSketch.machine_id, SensorSketch.sensor, SensorSketch.bucket_start)
+            .having(func.count() > 1)
+            .limit(batch_size)
+        ).all()
+        if not keys:
+            return compacted
+
+        for machine_id, sensor, bucket_start in keys:
+            parts = db.execute(
+                select(SensorSketch).where(
+                    SensorSketch.machine_id == machine_id,
+                    SensorSketch.sensor == sensor,
+                    SensorSketch.bucket_start == bucket_start
+                )
+            ).scalars().all()
+            sketches = [_from_row(part) for part in parts]
+            merged = QuantileSketch.merge_all(sketches, sketches[0].alpha)
+            db.execute(delete(SensorSketch).where(SensorSketch.id.in_([part.id for part in parts])))
+            db.execute(insert(SensorSketch), [_to_row(machine_id, sensor, bucket_start, merged)])
+        db.commit()
+        compacted += len(keys)
+        logger.info(f"Compacted sketches of {len(keys)} machine hours")
+
+def run_compaction() -> int:
+    """Compact sketches on every shard in parallel, for the background job"""
+    return sum(shard_router.scatter(compact_sketches))
+
+def range_sketches(db, machine_id: int, start_date: datetime, end_date: datetime,
+                   sensors: Sequence[str] = SENSOR_COLUMNS) -> Dict[str, QuantileSketch]:
+    """
+    Merge a machine's hourly sketches per sensor over a time range
+
+    The range is widened to whole hours. Sketches built with a different
+    accuracy than SKETCH_RELATIVE_ACCURACY are skipped.
+
+    Returns:
+        Merged sketch per sensor that has readings in the range
+    """
+    rows = db.execute(
+        select(
+            SensorSketch.sensor, SensorSketch.count, SensorSketch.total, SensorSketch.total_sq,
+            SensorSketch.minimum, SensorSketch.maximum, SensorSketch.sketch
+        ).where(
+            SensorSketch.machine_id == machine_id,
+            SensorSketch.sensor.in_(list(sensors)),
+            SensorSketch.bucket_start >= hour_floor(start_date),
+            SensorSketch.bucket_start <= end_date
+        )
+    ).all()
+
+    by_sensor: Dict[str, List[QuantileSketch]] = {}
+    skipped = 0
+    for row in rows:
+        sketch = _from_row(row)
+        if sketch.alpha != settings.SKETCH_RELATIVE_ACCURACY:
+            skipped += 1
+            continue
+        by_sensor.setdefault(row.sensor, []).append(sketch)
+    if skipped:
+        logger.warning(f"Skipped {skipped} sketches of machine {machine_id} built with a different accuracy")
+
+    return {
+        sensor: QuantileSketch.merge_all(sketches, settings.SKETCH_RELATIVE_ACCURACY)
+        for sensor, sketches in by_sensor.items()
+    }
+
+def sketches_cover(db, machine_id: int, start_date: datetime, end_date: datetime) -> bool:
+    """
+    Whether a machine's sketches reach back to its first stored reading in a range
+
+    Readings stored before sketches existed have none until they are
+    backfilled, so a range reaching into that history is not covered.
+    """
+    start = hour_floor(start_date)
+    first_bucket = db.execute(
+        select(func.min(SensorSketch.bucket_start)).where(
+            SensorSketch.machine_id == machine_id,
+            # Required in every reading, so every sketched hour has it
+            SensorSketch.sensor == "temperature",
+            SensorSketch.bucket_start >= start,
+            SensorSketch.bucket_start <= end_date
+        )
+    ).scalar()
+    if first_bucket is None:
+        return False
+
+    first_reading = db.execute(
+        select(func.min(SensorData.timestamp)).where(
+            SensorData.machine_id == machine_id,
+            SensorData.timestamp >= start,
+            SensorData.timestamp <= end_date
+        )
+    ).scalar()
+    return first_reading is None or hour_floor(first_reading) >= first_bucket
+
+def range_statistics(db, machine_id: int, start_date: datetime, end_date: datetime) -> Optional[Dict]:
+    """
+    Summary statistics over a time range from hourly sketches
+
+    Count, mean, min, max and std are exact; the median is within
+    SKETCH_RELATIVE_ACCURACY of the true value. Returns None if the
+    sketches do not cover the stored readings of the range (see
+    sketches_cover), so callers fall back to the raw readings.
+    """
+    if not sketches_cover(db, machine_id, start_date, end_date):
+        return None
+    sketches = range_sketches(db, machine_id, start_date, end_date)
+    if not sketches:
+        return None
+
+    statistics = {}
+    for sensor in SENSOR_COLUMNS:
+        sketch = sketches.get(sensor)
+        if sketch is None:
+            continue
+        statistics[sensor] = {
+            'mean': sketch.mean,
+            'min': sketch.minimum,
+            'max': sketch.maximum,
+            'std': sketch.std,
+            'median': sketch.quantiles([0.5])[0],
+            'count': sketch.count
+        }
+    return {
+        'machine_id': machine_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'data_points': max(sketch.count for sketch in sketches.values()),
+        'statistics': statistics,
+        'source': 'sketches',
+        'relative_accuracy': settings.SKETCH_RELATIVE_ACCURACY
+    }
+
+def backfill(machine_id: Optional[int] = None, chunk_rows: int = BACKFILL_CHUNK_ROWS) -> int:
+    """
+    Rebuild sketches from the stored raw readings
+
+    Existing sketches of the hours covered by stored readings are replaced.
+    Run it while ingest is stopped: readings that running workers flush in
+    the meantime would be counted twice.
+
+    Returns:
+        Number of readings sketched
+    """
+    if machine_id is not None:
+        with SessionLocal() as db:
+            return _backfill(shard_router.bind_machine(db, machine_id), machine_id, chunk_rows)
+    return sum(shard_router.scatter(_backfill, None, chunk_rows))
+
+def _backfill(db, machine_id: Optional[int], chunk_rows: int) -> int:
+    """Rebuild the sketches of one machine, or of every machine of the session's shard"""
+    alpha = settings.SKETCH_RELATIVE_ACCURACY
+    query = select(SensorData.machine_id, SensorData.timestamp, *[getattr(SensorData, column) for column in SENSOR_COLUMNS])
+    bounds_query = select(func.min(SensorData.timestamp), func.max(SensorData.timestamp))
+    cleared = delete(SensorSketch)
+    if machine_id is not None:
+        query = query.where(SensorData.machine_id == machine_id)
+        bounds_query = bounds_query.where(SensorData.machine_id == machine_id)
+        cleared = cleared.where(SensorSketch.machine_id == machine_id)
+
+    first, last = db.execute(bounds_query).one()
+    if first is None:
+        return 0
+    db.execute(cleared.where(SensorSketch.bucket_start >= hour_floor(first), SensorSketch.bucket_start <= last))
+    db.commit()
+
+    total = 0
+    for chunk in pd.read_sql(query.order_by(SensorData.machine_id, SensorData.timestamp),
+                             db.connection(bind_arguments={"mapper": SensorData}), chunksize=chunk_rows):
+        # An hour split across chunks gets two rows; compaction merges them
+        rows = frame_sketch_rows(chunk, alpha)
+        if rows:
+            db.execute(insert(SensorSketch), rows)
+        total += len(chunk)
+        logger.info(f"Sketched {total} readings")
+    db.commit()
+
+    compact_sketches(db, before=hour_floor(last) + timedelta(hours=1))
+    return total
+
+# Accumulator shared by all requests in this process
+sketch_accumulator = SketchAccumulator(settings.SKETCH_RELATIVE_ACCURACY)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="Build sketches from stored readings")
+    parser.add_argument("--machine-id", type=int, help="Only this machine")
+    parser.add_argument("--compact", action="store_true", help="Merge partial sketches of finished hours")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.backfill:
+        print(f"Sketched {backfill(args.machine_id)} readings")
+    if args.compact:
+        print(f"Compacted {run_compaction()} machine hours")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import or_, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.machine_registry import machine_registry
+from app.models.machine import Machine
+from app.services import alerts
+from app.utils.metrics import MACHINE_STATUS_TRANSITIONS
+from app.utils.shared_state import DERIVED_STATUSES, fleet_state
+
+logger = logging.getLogger(__name__)
+
+# Statuses the engine derives, by health level; it leaves any other status (e.g. maintenance) alone
+LEVELS = DERIVED_STATUSES
+
+# Machine IDs per UPDATE statement
+UPDATE_CHUNK = 500
+
+def smooth(previous: np.ndarray, values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Fold a block of readings into per-sensor exponentially weighted averages
+
+    Equivalent to applying ``ewma = alpha * x + (1 - alpha) * ewma`` reading
+    by reading, but computed in closed form per sensor. Missing readings
+    leave a sensor's average unchanged; a sensor without an average starts
+    from its first reading.
+
+    Args:
+        previous: Current averages, NaN where unknown
+        values: Readings of shape (rows, sensors), NaN where missing
+        alpha: Weight of each new reading
+
+    Returns:
+        Updated averages
+    """
+    result = previous.copy()
+    for index in range(values.shape[1]):
+        column = values[:, index]
+        column = column[~np.isnan(column)]
+        if not len(column):
+            continue
+        start = result[index]
+        if np.isnan(start):
+            start, column = column[0], column[1:]
+        decay = (1.0 - alpha) ** np.arange(len(column) - 1, -1, -1)
+        result[index] = (1.0 - alpha) ** len(column) * start + alpha * np.dot(decay, column)
+    return result
+
+def next_level(level: int, score: float, entry_levels: Sequence[float], hysteresis: float) -> int:
+    """
+    Apply hysteresis to a health score
+
+    A level is entered once the score reaches its entry level, and only left
+    once the score falls ``hysteresis`` (a fraction) below it, so a score
+    hovering around a boundary does not flap.
+    """
+    while level < len(entry_levels) - 1 and score >= entry_levels[level + 1]:
+        level += 1
+    while level > 0 and score < entry_levels[level] * (1.0 - hysteresis):
+        level -= 1
+    return level
+
+class StatusEngine:
+    """Derives machine status from incoming readings and writes it in batches
+
+    Each machine keeps a smoothed value per thresholded sensor. Its health
+    score is the highest ratio of smoothed value to alert threshold: at 1 a
+    machine is in warning, at ``STATUS_CRITICAL_RATIO`` it is critical.
+
+    A derived status that differs from the machine's current one is
+    published to the shared fleet state and the machine registry right
+    away, and queued. ``flush`` writes the queue with one UPDATE per status,
+    so a machine that changes several times between flushes costs one row
+    write. Machines in any status the engine does not derive, such as
+    maintenance, are set by people and skipped.
+
+    Hysteresis starts from the machine's current status rather than a level
+    kept in this process. Under the preforked server each worker smooths
+    only the readings it receives, but all workers step from the same shared
+    status, so they do not flap a machine back and forth between them.
+    """
+
+    def __init__(self, thresholds: Dict[str, float], alpha: float, critical_ratio: float, hysteresis: float):
+        self.sensors = list(thresholds)
+        self.limits = np.array([thresholds[sensor] for sensor in self.sensors], dtype=np.float64)
+        self.alpha = alpha
+        self.entry_levels = (0.0, 1.0, critical_ratio)
+        self.hysteresis = hysteresis
+
+        self._smoothed: Dict[int, np.ndarray] = {}
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def update_columns(self, machine_id: int, columns: Dict[str, np.ndarray]) -> Optional[str]:
+        """
+        Evaluate new readings of a machine given as one array per sensor
+
+        Args:
+            machine_id: Machine the readings belong to
+            columns: Readings in time order, NaN where missing; sensors
+                without a column count as missing
+
+        Returns:
+            The new status if it changed, else None
+        """
+        count = len(next(iter(columns.values()), ()))
+        if not self.sensors or not count:
+            return None
+
+        values = np.column_stack([columns.get(sensor, np.full(count, np.nan)) for sensor in self.sensors])
+        previous = self._smoothed.get(machine_id)
+        if previous is None:
+            previous = np.full(len(self.sensors), np.nan)
+        smoothed = smooth(previous, values, self.alpha)
+        self._smoothed[machine_id] = smoothed
+
+        current = self._current_status(machine_id)
+        # Unknown machines and manual statuses are left alone
+        if current not in LEVELS:
+            return None
+
+        ratios = smoothed / self.limits
+        score = float(np.nanmax(ratios)) if not np.isnan(ratios).all() else 0.0
+        level = next_level(LEVELS.index(current), score, self.entry_levels, self.hysteresis)
+        status = LEVELS[level]
+        if status == current:
+            return None
+
+        with self._lock:
+            self._pending[machine_id] = status
+        fleet_state.set_status(machine_id, status)
+        MACHINE_STATUS_TRANSITIONS.labels(status).inc()
+        alerts.status_changed(machine_id, current, status)
+        return status
+
+    def _current_status(self, machine_id: int) -> Optional[str]:
+        """Current status of a machine, or None if it does not exist"""
+        status = fleet_state.get_status(machine_id)
+        if status is not None:
+            return status
+        # Not in the fleet state: an ID beyond its capacity, or a status it has no code for
+        with self._lock:
+            status = self._pending.get(machine_id)
+        if status is not None:
+            return status
+        with SessionLocal() as db:
+            machine = machine_registry.get(db, machine_id)
+        if machine is None:
+            return None
+        return machine.status or "operational"
+
+    def pending(self) -> Dict[int, str]:
+        """Status changes not yet written"""
+        with self._lock:
+            return dict(self._pending)
+
+    def forget(self, machine_id: int) -> None:
+        """Drop a machine's health state, e.g. after it is deleted"""
+        self._smoothed.pop(machine_id, None)
+        with self._lock:
+            self._pending.pop(machine_id, None)
+
+    def flush(self) -> int:
+        """
+        Write queued status changes to the database
+
+        Returns:
+            Number of machines written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        by_status: Dict[str, List[int]] = {}
+        for machine_id, status in pending.items():
+            by_status.setdefault(status, []).append(machine_id)
+
+        try:
+            with SessionLocal() as db:
+                for status, machine_ids in by_status.items():
+                    for start in range(0, len(machine_ids), UPDATE_CHUNK):
+                        db.execute(
+                            update(Machine)
+                            .where(
+                                Machine.id.in_(machine_ids[start:start + UPDATE_CHUNK]),
+                                or_(Machine.status.in_(LEVELS), Machine.status.is_(None))
+                            )
+                            .values(status=status)
+                            .execution_options(synchronize_session=False)
+                        )
+                db.commit()
+        except Exception:
+            # Keep the changes for the next flush unless newer ones replaced them
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            raise
+
+        machine_registry.update_statuses(pending)
+        logger.info(f"Wrote derived status for {len(pending)} machines")
+        return len(pending)
+
+# Status engine shared by all requests in this process
+status_engine = StatusEngine(
+    settings.ALERT_THRESHOLDS,
+    alpha=settings.STATUS_EWMA_ALPHA,
+    critical_ratio=settings.STATUS_CRITICAL_RATIO,
+    hysteresis=settings.STATUS_HYSTERESIS,
+)
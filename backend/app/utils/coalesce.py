@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.metrics import REQUESTS_COALESCED
+
+class SingleFlight:
+    """Shares one in-flight computation among concurrent identical calls
+
+    The first call for a key starts the work as a task; calls with the same
+    key that arrive before it finishes await the same task instead of
+    repeating the work, and get the same result or exception. Nothing is
+    cached: once the task is done the next call starts a new one.
+
+    Callers await the task through ``asyncio.shield``, so a cancelled caller
+    (e.g. a client that disconnected) does not cancel the work for the
+    others. The work must therefore not use anything owned by one request,
+    such as its database session; it opens its own.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Await ``func(*args)``, joining a call with the same key already in flight"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            REQUESTS_COALESCED.labels(self.name).inc()
+        return await asyncio.shield(task)
+
+    async def do_blocking(self, key: Hashable, func: Callable[..., Any], *args) -> Any:
+        """Run blocking ``func(*args)`` in the threadpool, joining a call with the same key already in flight"""
+        return await self.do(key, run_in_threadpool, func, *args)
+
+    def in_flight(self) -> int:
+        """Number of distinct computations running"""
+        return len(self._tasks)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
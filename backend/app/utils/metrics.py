@@ -0,0 +1,412 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.utils import timing
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _ThreadShards:
+    """Per-thread value arrays that are summed when metrics are scraped
+
+    Each thread only ever writes its own array, so updates need no lock. The
+    lock is taken once per thread, when its array is first created.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0.0] * self._size
+        for values in shards:
+            for index, value in enumerate(values):
+                totals[index] += value
+        return totals
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _ThreadShards(1)
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.get()[0] += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from a callback at scrape time instead"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._shards.totals()[0]
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from a callback at scrape time instead"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        # Per-bucket counts, then the +Inf bucket, then sum and count
+        self._shards = _ThreadShards(len(buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        values = self._shards.get()
+        values[bisect_left(self._buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        totals = self._shards.totals()
+        return totals[:-2], totals[-2], totals[-1]
+
+class _Metric:
+    """Base class for a metric family with optional labels"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Get the child metric for a set of label values"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        pairs.extend(_CONSTANT_LABELS)
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        return lines + self._samples()
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_text(key)} {_format(child.value())}"
+            for key, child in list(self._children.items())
+        ]
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._label_text(key)} {_format(child.value())}"
+            for key, child in list(self._children.items())
+        ]
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0.0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else _format(bound)
+                labels = self._label_text(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {_format(cumulative)}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {_format(count)}")
+        return lines
+
+class Registry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+# Process-wide registry served by the /metrics endpoint
+REGISTRY = Registry()
+
+# Rendered label pairs added to every sample, see set_constant_labels
+_CONSTANT_LABELS: List[str] = []
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"]
+)
+SENSOR_INGEST_ROWS = Counter(
+    "sensor_ingest_rows_total",
+    "Sensor readings written, by ingest path (rate() gives rows per second)",
+    ["path"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time by statement type",
+    ["operation"]
+)
+ML_INFERENCE_DURATION = Histogram(
+    "ml_inference_duration_seconds",
+    "MLModel inference time by method",
+    ["method"]
+)
+CACHE_HITS = Counter("cache_hits_total", "Cache hits by cache", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses by cache", ["cache"])
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Lifetime cache hit ratio by cache", ["cache"])
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when an event loop timer was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+REQUESTS_COALESCED = Counter(
+    "requests_coalesced_total",
+    "Calls that joined an identical computation already in flight instead of running their own",
+    ["name"]
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Requests rejected by admission control, by request kind and reason",
+    ["kind", "reason"]
+)
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Admitted requests in flight by request kind", ["kind"])
+MACHINE_STATUS_TRANSITIONS = Counter(
+    "machine_status_transitions_total",
+    "Machine status changes derived from sensor readings, by new status",
+    ["status"]
+)
+ALERTS = Counter(
+    "alerts_total",
+    "Alerts by outcome: emitted, suppressed (deduplicated), dropped (over a bound), sent or failed per sink",
+    ["outcome"]
+)
+LINE_INGEST_POINTS = Counter(
+    "line_ingest_points_total",
+    "Line protocol points by outcome: stored, parse_error, invalid, unknown_machine, dropped (buffer full) or failed (write error)",
+    ["outcome"]
+)
+PREDICTIONS_SCORED = Counter("predictions_scored_total", "Machines scored and stored by the background prediction scorer")
+
+def render_metrics() -> str:
+    """Render all registered metrics in Prometheus text format"""
+    return REGISTRY.render()
+
+def set_constant_labels(**labels: str) -> None:
+    """Add labels to every sample, such as the worker under the preforked server"""
+    _CONSTANT_LABELS[:] = [f'{name}="{_escape(str(value))}"' for name, value in labels.items()]
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve this process's metrics at /metrics on a port of its own
+
+    The server runs in a daemon thread, so it answers scrapes even while
+    the event loop is busy.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+def register_cache(name: str, get_hits: Callable[[], float], get_misses: Callable[[], float]) -> None:
+    """Expose a cache's hit and miss counts and its hit ratio"""
+    def hit_ratio() -> float:
+        hits, misses = get_hits(), get_misses()
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    CACHE_HITS.labels(name).set_function(get_hits)
+    CACHE_MISSES.labels(name).set_function(get_misses)
+    CACHE_HIT_RATIO.labels(name).set_function(hit_ratio)
+
+def timed(histogram: Histogram, *label_values):
+    """Decorator that observes a function's run time in a histogram"""
+    def decorator(func):
+        child = histogram.labels(*label_values)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def instrument_engine(engine) -> None:
+    """Time every statement executed through a SQLAlchemy engine
+
+    Each statement is also added to the current request's Server-Timing
+    breakdown and to the slow query log (see app.utils.timing).
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_DURATION.labels(operation).observe(duration)
+        timing.record_query(statement, parameters, executemany, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # Failed statements never reach after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_start_time"):
+            context.connection.info["query_start_time"].pop()
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status_code
+            ).observe(time.perf_counter() - started)
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late the event loop runs a timer, until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.utils.metrics import ALERTS
+
+logger = logging.getLogger(__name__)
+alert_logger = logging.getLogger("app.alerts")
+
+# One alert; count is how many occurrences were folded into it
+Alert = namedtuple(
+    "Alert",
+    ["machine_id", "condition", "severity", "message", "value", "timestamp", "count"],
+    defaults=(None, None, 1)
+)
+
+# Lower rank is more urgent
+SEVERITY_RANK = {"critical": 0, "warning": 1, "info": 2}
+
+def _alert_dict(alert: Alert) -> dict:
+    return {**alert._asdict(), "timestamp": alert.timestamp.isoformat() if alert.timestamp else None}
+
+class AlertSink:
+    """Destination for batches of alerts"""
+    name = "sink"
+
+    async def send(self, alerts: List[Alert]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class LogSink(AlertSink):
+    """Write alerts to the app.alerts logger"""
+    name = "log"
+
+    async def send(self, alerts: List[Alert]) -> None:
+        for alert in alerts:
+            repeated = f" (x{alert.count})" if alert.count > 1 else ""
+            alert_logger.warning(f"[{alert.severity}] machine {alert.machine_id} {alert.condition}: {alert.message}{repeated}")
+
+class WebhookSink(AlertSink):
+    """POST each batch as JSON to a URL"""
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, alerts: List[Alert]) -> None:
+        response = await self._client.post(self.url, json={"alerts": [_alert_dict(alert) for alert in alerts]})
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+class EmailSink(AlertSink):
+    """Send each batch as one email through an SMTP server"""
+    name = "email"
+
+    def __init__(self, host: str, port: int, sender: str, recipients: Sequence[str], timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.timeout = timeout
+
+    def _send_blocking(self, alerts: List[Alert]) -> None:
+        message = EmailMessage()
+        worst = min(alerts, key=lambda alert: SEVERITY_RANK.get(alert.severity, 99))
+        message["Subject"] = f"[{worst.severity.upper()}] {len(alerts)} machine alert(s)"
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content("\n".join(
+            f"{alert.timestamp:%Y-%m-%d %H:%M:%S} [{alert.severity}] machine {alert.machine_id} "
+            f"{alert.condition}: {alert.message} (x{alert.count})"
+            for alert in alerts
+        ))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+    async def send(self, alerts: List[Alert]) -> None:
+        if self.recipients:
+            await run_in_threadpool(self._send_blocking, alerts)
+
+class MemorySink(AlertSink):
+    """Keep the most recent batches in memory, as a local stand-in for real sinks"""
+    name = "memory"
+
+    def __init__(self, max_batches: int = 100):
+        self.batches: Deque[List[Alert]] = deque(maxlen=max_batches)
+
+    async def send(self, alerts: List[Alert]) -> None:
+        self.batches.append(list(alerts))
+
+def create_sinks(names: Optional[Sequence[str]] = None) -> List[AlertSink]:
+    """Build the sinks named in settings.ALERT_SINKS"""
+    sinks = []
+    for name in names if names is not None else settings.ALERT_SINKS:
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "webhook" and settings.ALERT_WEBHOOK_URL:
+            sinks.append(WebhookSink(settings.ALERT_WEBHOOK_URL))
+        elif name == "email" and settings.ALERT_EMAIL_TO:
+            sinks.append(EmailSink(
+                settings.ALERT_EMAIL_HOST, settings.ALERT_EMAIL_PORT,
+                settings.ALERT_EMAIL_FROM, settings.ALERT_EMAIL_TO
+            ))
+        elif name == "memory":
+            sinks.append(MemorySink())
+        else:
+            logger.warning(f"Alert sink {name} is unknown or not configured, skipping")
+    return sinks
+
+class AlertDispatcher:
+    """Deduplicates, rate-limits and batches alerts out to sinks
+
+    ``emit`` only appends to a bounded inbox, so it never blocks or waits on
+    a sink and is safe to call from any thread. The dispatcher task drains
+    the inbox every batch interval (or sooner once a batch is waiting):
+
+    - alerts for a (machine, condition) that was notified within the dedup
+      window are suppressed, unless their severity is higher;
+    - pending alerts for the same (machine, condition) are folded into one,
+      keeping the latest and counting occurrences;
+    - a token bucket caps alerts sent per minute; the rest stay pending,
+      most severe first.
+
+    Memory is bounded: the inbox by ``max_queue``, pending alerts by
+    ``max_pending`` keys, and dedup state by what the rate limit lets
+    through in one window. Anything over a bound is dropped and counted.
+
+    Dedup and the rate limit are per process; under the preforked server
+    every worker has its own dispatcher (see app.server).
+    """
+
+    def __init__(self, max_queue: int = 10000, max_pending: int = 1000, dedup_seconds: float = 300.0,
+                 rate_per_minute: int = 60, batch_size: int = 50, batch_interval: float = 5.0,
+                 sink_timeout: float = 10.0):
+        self.max_queue = max_queue
+        self.max_pending = max_pending
+        self.dedup_seconds = dedup_seconds
+        self.rate_per_minute = rate_per_minute
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.sink_timeout = sink_timeout
+        self.sinks: List[AlertSink] = []
+
+        self._inbox: Deque[Alert] = deque()
+        self._pending: "OrderedDict[Tuple[int, str], Alert]" = OrderedDict()
+        self._last_sent: "OrderedDict[Tuple[int, str], Tuple[float, int]]" = OrderedDict()
+        self._tokens = float(rate_per_minute)
+        self._refilled = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def emit(self, alert: Alert) -> bool:
+        """Queue an alert without blocking; returns False if it was dropped"""
+        if len(self._inbox) >= self.max_queue:
+            ALERTS.labels("dropped").inc()
+            return False
+        self._inbox.append(alert)
+        ALERTS.labels("emitted").inc()
+
+        # Wake the dispatcher early once a full batch is waiting
+        if len(self._inbox) == self.batch_size and self._loop is not None:
+            if threading.get_ident() == self._loop_thread:
+                self._wakeup.set()
+            else:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def _collect(self, now: float) -> None:
+        """Move inbox alerts into pending, applying dedup and folding"""
+        while self._last_sent:
+            key, (sent_at, _) = next(iter(self._last_sent.items()))
+            if now - sent_at < self.dedup_seconds:
+                break
+            del self._last_sent[key]
+
+        while self._inbox:
+            alert = self._inbox.popleft()
+            key = (alert.machine_id, alert.condition)
+            rank = SEVERITY_RANK.get(alert.severity, 99)
+
+            last = self._last_sent.get(key)
+            if last is not None and rank >= last[1]:
+                ALERTS.labels("suppressed").inc()
+                continue
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                ALERTS.labels("suppressed").inc()
+                severity = alert.severity if rank < SEVERITY_RANK.get(pending.severity, 99) else pending.severity
+                self._pending[key] = alert._replace(severity=severity, count=pending.count + alert.count)
+            elif len(self._pending) >= self.max_pending:
+                ALERTS.labels("dropped").inc()
+            else:
+                self._pending[key] = alert
+
+    def _take(self, limit: int) -> List[Alert]:
+        """Remove up to ``limit`` pending alerts, most severe and oldest first"""
+        if limit <= 0 or not self._pending:
+            return []
+        order = sorted(
+            enumerate(self._pending.items()),
+            key=lambda item: (SEVERITY_RANK.get(item[1][1].severity, 99), item[0])
+        )
+        batch = []
+        for _, (key, alert) in order[:limit]:
+            del self._pending[key]
+            batch.append(alert)
+        return batch
+
+    async def _send(self, sink: AlertSink, batch: List[Alert]) -> None:
+        try:
+            await asyncio.wait_for(sink.send(batch), self.sink_timeout)
+            ALERTS.labels("sent").inc(len(batch))
+        except Exception as e:
+            ALERTS.labels("failed").inc(len(batch))
+            logger.error(f"Alert sink {sink.name} failed to send {len(batch)} alert(s): {e!r}")
+
+    async def flush(self) -> None:
+        """Send as many pending alerts as the rate limit allows"""
+        now = time.monotonic()
+        self._collect(now)
+
+        self._tokens = min(
+            float(self.rate_per_minute),
+            self._tokens + (now - self._refilled) * self.rate_per_minute / 60.0
+        )
+        self._refilled = now
+
+        while True:
+            batch = self._take(min(int(self._tokens), self.batch_size))
+            if not batch:
+                return
+            self._tokens -= len(batch)
+            for alert in batch:
+                key = (alert.machine_id, alert.condition)
+                self._last_sent[key] = (now, SEVERITY_RANK.get(alert.severity, 99))
+                self._last_sent.move_to_end(key)
+            await asyncio.gather(*(self._send(sink, batch) for sink in self.sinks))
+
+    async def run(self, sinks: List[AlertSink]) -> None:
+        """Dispatch alerts until cancelled"""
+        self.sinks = sinks
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.batch_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Alert dispatch failed: {e}")
+        finally:
+            self._loop = None
+            for sink in sinks:
+                await sink.close()
+
+    def pending_count(self) -> int:
+        """Alerts waiting in the inbox or pending"""
+        return len(self._inbox) + len(self._pending)
+
+# Dispatcher shared by all requests in this process
+alert_dispatcher = AlertDispatcher(
+    max_queue=settings.ALERT_QUEUE_SIZE,
+    max_pending=settings.ALERT_MAX_PENDING,
+    dedup_seconds=settings.ALERT_DEDUP_SECONDS,
+    rate_per_minute=settings.ALERT_RATE_PER_MINUTE,
+    batch_size=settings.ALERT_BATCH_SIZE,
+    batch_interval=settings.ALERT_BATCH_INTERVAL_SECONDS,
+)
+
+def emit_alert(machine_id: int, condition: str, severity: str, message: str,
+               value: Optional[float] = None) -> bool:
+    """Queue an alert for dispatch; never blocks"""
+    if not settings.ALERTS_ENABLED:
+        return False
+    return alert_dispatcher.emit(Alert(machine_id, condition, severity, message, value, datetime.utcnow()))
@@ -0,0 +1,212 @@
+import math
+import struct
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Serialized layout version, relative accuracy and bin counts per store
+_HEADER = struct.Struct("<BdIII")
+_FORMAT = 1
+
+# Values closer to zero than this are counted in the zero bin
+MIN_MAGNITUDE = 1e-9
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a relative error bound (DDSketch)
+
+    Values are counted in logarithmic bins: bin ``k`` holds magnitudes in
+    (gamma^(k-1), gamma^k] with ``gamma = (1 + alpha) / (1 - alpha)``, and
+    is reported as the point that is within ``alpha`` relative error of
+    every value in it. Any quantile estimate is therefore within ``alpha``
+    of the true value (e.g. 1% for alpha = 0.01), no matter how many
+    sketches were merged. Negative values use a mirrored set of bins.
+
+    Count, sum, sum of squares, minimum and maximum are tracked exactly, so
+    the mean and standard deviation are exact too.
+
+    Merging adds bin counts, so it is exact and order independent. Bins are
+    kept as sorted (key, count) arrays; a sensor that spans one decade needs
+    about 115 bins at alpha = 0.01.
+    """
+
+    __slots__ = ("alpha", "gamma", "_log_gamma", "positive", "negative", "zero",
+                 "count", "total", "total_sq", "minimum", "maximum")
+
+    def __init__(self, alpha: float = 0.01):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64))
+        self.negative = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64))
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, alpha: float = 0.01) -> "QuantileSketch":
+        """Build a sketch of an array of values, ignoring NaN"""
+        sketch = cls(alpha)
+        sketch.add(values)
+        return sketch
+
+    def _keys(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int32)
+
+    def add(self, values: np.ndarray) -> None:
+        """Add an array of values, ignoring NaN"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+        magnitudes = np.abs(values)
+        small = magnitudes < MIN_MAGNITUDE
+        self.zero += int(small.sum())
+        positive = values > 0
+        self.positive = _merge_bins([self.positive, _bins(self._keys(values[positive & ~small]))])
+        self.negative = _merge_bins([self.negative, _bins(self._keys(-values[~positive & ~small]))])
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add another sketch's values into this one"""
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge sketches with accuracy {other.alpha} into {self.alpha}")
+        self.positive = _merge_bins([self.positive, other.positive])
+        self.negative = _merge_bins([self.negative, other.negative])
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @classmethod
+    def merge_all(cls, sketches: Iterable["QuantileSketch"], alpha: float = 0.01) -> "QuantileSketch":
+        """Merge many sketches at once, concatenating their bins in one pass"""
+        sketches = list(sketches)
+        merged = cls(alpha)
+        for sketch in sketches:
+            if sketch.alpha != alpha:
+                raise ValueError(f"Cannot merge sketches with accuracy {sketch.alpha} into {alpha}")
+        if not sketches:
+            return merged
+        merged.positive = _merge_bins([sketch.positive for sketch in sketches])
+        merged.negative = _merge_bins([sketch.negative for sketch in sketches])
+        merged.zero = sum(sketch.zero for sketch in sketches)
+        merged.count = sum(sketch.count for sketch in sketches)
+        merged.total = math.fsum(sketch.total for sketch in sketches)
+        merged.total_sq = math.fsum(sketch.total_sq for sketch in sketches)
+        merged.minimum = min(sketch.minimum for sketch in sketches)
+        merged.maximum = max(sketch.maximum for sketch in sketches)
+        return merged
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """
+        Estimate quantiles, each within the relative accuracy of the true value
+
+        Args:
+            qs: Quantiles between 0 and 1
+
+        Returns:
+            Estimates in the order of qs, None for an empty sketch
+        """
+        if not self.count:
+            return [None for _ in qs]
+
+        # Bins from the most negative value up to the largest
+        negative_keys, negative_counts = self.negative
+        positive_keys, positive_counts = self.positive
+        values = np.concatenate([
+            -self._bin_values(negative_keys[::-1]),
+            [0.0],
+            self._bin_values(positive_keys),
+        ])
+        counts = np.concatenate([negative_counts[::-1], [self.zero], positive_counts])
+        cumulative = np.cumsum(counts)
+
+        estimates = []
+        for q in qs:
+            if not 0 <= q <= 1:
+                raise ValueError("Quantiles must be between 0 and 1")
+            rank = q * (self.count - 1)
+            index = int(np.searchsorted(cumulative, rank, side="right"))
+            estimate = float(values[min(index, len(values) - 1)])
+            estimates.append(min(max(estimate, self.minimum), self.maximum))
+        return estimates
+
+    def _bin_values(self, keys: np.ndarray) -> np.ndarray:
+        return 2.0 * np.power(self.gamma, keys.astype(np.float64)) / (self.gamma + 1.0)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """Sample standard deviation, as pandas computes it"""
+        if self.count < 2:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_bytes(self) -> bytes:
+        """Serialize the bins; count, sums and extremes are stored separately"""
+        positive_keys, positive_counts = self.positive
+        negative_keys, negative_counts = self.negative
+        return b"".join([
+            _HEADER.pack(_FORMAT, self.alpha, self.zero, len(positive_keys), len(negative_keys)),
+            positive_keys.astype("<i4").tobytes(), positive_counts.astype("<i8").tobytes(),
+            negative_keys.astype("<i4").tobytes(), negative_counts.astype("<i8").tobytes(),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes, count: int, total: float, total_sq: float,
+                   minimum: float, maximum: float) -> "QuantileSketch":
+        """Rebuild a sketch from its serialized bins and summary values"""
+        version, alpha, zero, positive_bins, negative_bins = _HEADER.unpack_from(data)
+        if version != _FORMAT:
+            raise ValueError(f"Unsupported sketch format {version}")
+        sketch = cls(alpha)
+        offset = _HEADER.size
+        stores = []
+        for bins in (positive_bins, negative_bins):
+            # Read-only views of the buffer; merging always builds new arrays
+            keys = np.frombuffer(data, dtype="<i4", count=bins, offset=offset)
+            offset += 4 * bins
+            counts = np.frombuffer(data, dtype="<i8", count=bins, offset=offset)
+            offset += 8 * bins
+            stores.append((keys, counts))
+        sketch.positive, sketch.negative = stores
+        sketch.zero = zero
+        sketch.count = count
+        sketch.total = total
+        sketch.total_sq = total_sq
+        sketch.minimum = minimum
+        sketch.maximum = maximum
+        return sketch
+
+def _bins(keys: np.ndarray):
+    keys, counts = np.unique(keys, return_counts=True)
+    return keys.astype(np.int32), counts.astype(np.int64)
+
+def _merge_bins(stores):
+    """Add up (keys, counts) stores into one sorted store"""
+    stores = [store for store in stores if len(store[0])]
+    if not stores:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+    if len(stores) == 1:
+        return stores[0]
+    keys = np.concatenate([store[0] for store in stores])
+    counts = np.concatenate([store[1] for store in stores])
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique.astype(np.int32), np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
@@ -0,0 +1,211 @@
+import logging
+import multiprocessing
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml.features import SENSOR_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Status codes stored per machine; 0 means not known to this state
+STATUS_CODES = {"operational": 1, "warning": 2, "critical": 3, "maintenance": 4}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Statuses derived from readings, by health level; any other status was set by people
+DERIVED_STATUSES = ("operational", "warning", "critical")
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Attempts at a lock-free read before falling back to the writer lock
+_READ_RETRIES = 100
+
+class FleetState:
+    """Latest reading and status per machine, readable by every worker
+
+    Arrays are indexed directly by machine ID, up to ``capacity``; machines
+    with larger IDs are not tracked. In a single process the arrays are plain
+    memory. The preforked server calls ``allocate(shared=True)`` before
+    forking, so every worker maps the same shared memory segment.
+
+    Writers serialize on a lock. Readers take no lock: each slot has a
+    sequence number that is odd while a write is in progress, and a read is
+    retried if the number was odd or changed while it copied the slot.
+
+    The lock holder's PID is kept in the header. A worker killed while
+    writing would leave the lock held for good, so the server calls
+    ``recover_lock`` with the PID of every worker it reaps; writers never
+    write without the lock.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self.allocate(capacity)
+
+    def allocate(self, capacity: Optional[int] = None, shared: bool = False) -> None:
+        """(Re)create empty arrays, in shared memory if requested"""
+        self.close()
+        self.capacity = capacity or self.capacity
+        sensors = len(SENSOR_COLUMNS)
+
+        # Header (registry version, lock holder PID), then per-slot arrays, 8-byte aligned
+        layout = [
+            ("_header", np.int64, (4,)),
+            ("_sequence", np.int64, (self.capacity,)),
+            ("_timestamps", np.float64, (self.capacity,)),
+            ("_values", np.float64, (self.capacity, sensors)),
+            ("_status", np.int8, (self.capacity,)),
+        ]
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in layout)
+
+        if shared:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            buffer = self._shm.buf
+            self._lock = multiprocessing.Lock()
+        else:
+            buffer = bytearray(size)
+            self._lock = threading.Lock()
+
+        offset = 0
+        for name, dtype, shape in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            array.fill(0)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    def close(self, unlink: bool = False) -> None:
+        """Release the shared memory segment, unlinking it from the owning process"""
+        if self._shm is None:
+            return
+        # Views must be dropped before the mapping can be closed
+        for name in ("_header", "_sequence", "_timestamps", "_values", "_status"):
+            setattr(self, name, None)
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
+
+    @property
+    def shared(self) -> bool:
+        return self._shm is not None
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the writer lock, recording this process as its holder"""
+        with self._lock:
+            self._header[1] = os.getpid()
+            try:
+                yield
+            finally:
+                self._header[1] = 0
+
+    def recover_lock(self, pid: int) -> bool:
+        """
+        Release the writer lock if a process that exited was holding it
+
+        Called by the parent for each worker it reaps. A slot the worker was
+        writing keeps whatever part of the reading was written, and its
+        sequence number is made even so readers accept it again.
+
+        Args:
+            pid: Process that exited
+
+        Returns:
+            Whether the process held the lock
+        """
+        if not self.shared or int(self._header[1]) != pid:
+            return False
+        torn = np.flatnonzero(self._sequence % 2)
+        self._sequence[torn] += 1
+        self._header[1] = 0
+        self._lock.release()
+        logger.warning(f"Released the fleet state lock held by exited worker {pid} ({len(torn)} slots mid-write)")
+        return True
+
+    def _slot(self, machine_id: int) -> Optional[int]:
+        return machine_id if 0 <= machine_id < self.capacity else None
+
+    def record_reading(self, machine_id: int, timestamp: datetime, values: Sequence[Optional[float]]) -> None:
+        """Store a reading if it is newer than the machine's latest one"""
+        slot = self._slot(machine_id)
+        if slot is None:
+            return
+        seconds = (timestamp - _EPOCH).total_seconds()
+        row = np.array(values, dtype=np.float64)
+        with self._write_lock():
+            if seconds < self._timestamps[slot]:
+                return
+            # Odd while writing
+            self._sequence[slot] += 1
+            self._values[slot] = row
+            self._timestamps[slot] = seconds
+            self._sequence[slot] += 1
+
+    def latest_reading(self, machine_id: int) -> Optional[Dict]:
+        """Latest stored reading of a machine, or None"""
+        slot = self._slot(machine_id)
+        if slot is None:
+            return None
+        for _ in range(_READ_RETRIES):
+            before = self._sequence[slot]
+            if before % 2:
+                continue
+            values = self._values[slot].copy()
+            seconds = float(self._timestamps[slot])
+            if self._sequence[slot] == before:
+                break
+        else:
+            with self._write_lock():
+                values = self._values[slot].copy()
+                seconds = float(self._timestamps[slot])
+
+        if not seconds:
+            return None
+        reading = {column: (None if np.isnan(value) else float(value)) for column, value in zip(SENSOR_COLUMNS, values)}
+        return {"timestamp": datetime.utcfromtimestamp(seconds).isoformat(), **reading}
+
+    def set_status(self, machine_id: int, status: Optional[str]) -> None:
+        """Record a machine's status, or forget it with None"""
+        slot = self._slot(machine_id)
+        if slot is not None:
+            # Single-byte stores need no sequence number
+            self._status[slot] = STATUS_CODES.get(status, 0) if status else 0
+
+    def get_status(self, machine_id: int) -> Optional[str]:
+        slot = self._slot(machine_id)
+        return STATUS_NAMES.get(int(self._status[slot])) if slot is not None else None
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of machines in each known status"""
+        counts = np.bincount(self._status, minlength=len(STATUS_CODES) + 1)
+        return {name: int(counts[code]) for code, name in STATUS_NAMES.items()}
+
+    @property
+    def registry_version(self) -> int:
+        """Fleet-wide count of machine writes, across all workers"""
+        return int(self._header[0])
+
+    def bump_registry_version(self) -> int:
+        """Record a machine write and return the new fleet-wide version"""
+        with self._write_lock():
+            self._header[0] += 1
+            return int(self._header[0])
+
+    def load_statuses(self, db) -> None:
+        """Fill the status array from the machines table"""
+        from sqlalchemy import select
+
+        from app.models.machine import Machine
+
+        for machine_id, status in db.execute(select(Machine.id, Machine.status)):
+            self.set_status(machine_id, status or "operational")
+
+# Fleet state shared by all requests, and all workers under app.server
+fleet_state = FleetState(settings.FLEET_STATE_CAPACITY)
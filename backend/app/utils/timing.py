@@ -0,0 +1,156 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+slow_query_logger = logging.getLogger("app.db.slow_query")
+
+class RequestTimings:
+    """Time spent per phase while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.query_count = 0
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Format the breakdown as a Server-Timing header value"""
+        entries = []
+        for name, seconds in self.durations.items():
+            entry = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                entry += f';desc="{self.query_count} queries"'
+            entries.append(entry)
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the request being handled, if any"""
+    return _current_timings.get()
+
+@contextmanager
+def span(name: str):
+    """Add the time spent in the block to the current request's breakdown"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+class ServerTimingMiddleware:
+    """ASGI middleware that collects request timings and sends them as Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+
+def _endpoint_finished() -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.endpoint_finished = time.perf_counter()
+
+class TimedRoute(APIRoute):
+    """APIRoute that times the endpoint function and the work around it
+
+    The "endpoint" span covers the endpoint function itself. The "serialize"
+    span starts when it returns and covers response validation and
+    serialization.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if getattr(call, "is_timed", False):
+            return self._timed_handler(super().get_route_handler())
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                with span("endpoint"):
+                    result = await call(*args, **kwargs)
+                _endpoint_finished()
+                return result
+        else:
+            @functools.wraps(call)
+            def timed_call(*args, **kwargs):
+                with span("endpoint"):
+                    result = call(*args, **kwargs)
+                _endpoint_finished()
+                return result
+        timed_call.is_timed = True
+        self.dependant.call = timed_call
+        return self._timed_handler(super().get_route_handler())
+
+    def _timed_handler(self, handler):
+        async def timed_handler(request):
+            timings = _current_timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.endpoint_finished = None
+            try:
+                return await handler(request)
+            finally:
+                # Nothing to serialize if the endpoint raised
+                if timings.endpoint_finished is not None:
+                    timings.add("serialize", time.perf_counter() - timings.endpoint_finished)
+
+        return timed_handler
+
+def _format_parameters(parameters, executemany: bool) -> str:
+    """Shorten statement parameters for the slow query log"""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{parameters[0]!r} ... ({len(parameters)} parameter sets)"
+    text = repr(parameters)
+    return text if len(text) <= 500 else text[:500] + "..."
+
+def record_query(statement: str, parameters, executemany: bool, duration: float) -> None:
+    """
+    Add a statement to the current request's breakdown and log it if slow
+
+    Called by the query listener of app.utils.metrics.instrument_engine, so
+    each statement is timed once for both.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add("db", duration)
+        timings.query_count += 1
+
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_query_logger.warning(
+            f"Slow query ({duration * 1000:.1f} ms): {statement} "
+            f"parameters={_format_parameters(parameters, executemany)}"
+        )
@@ -0,0 +1,239 @@
+"""
+End-to-end API benchmarks against a seeded synthetic fleet
+
+Seeds a temporary SQLite database with N machines x M readings plus
+maintenance history, then drives the FastAPI app in-process through
+TestClient: single and batch ingest, history reads, stats, every prediction
+endpoint, and the CSV sensor data service. Results are written as JSON with
+the commit they were measured at, so runs can be compared with
+tests/benchmarks/compare.py.
+
+Usage (from backend/):
+    python -m tests.benchmarks.bench_api --machines 50 --readings 5000 --json results.json
+    python -m tests.benchmarks.bench_api --scenarios history stats --iterations 500
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], errors: int, elapsed: float, rows_per_call: int = 1) -> dict:
+    """Latency percentiles in milliseconds and throughput for one scenario"""
+    values = sorted(latency * 1000 for latency in latencies)
+    if not values:
+        return {"iterations": 0, "errors": errors}
+    return {
+        "iterations": len(values),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(values), 3),
+        "p50_ms": round(_percentile(values, 50), 3),
+        "p95_ms": round(_percentile(values, 95), 3),
+        "p99_ms": round(_percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+        "ops_per_second": round(len(values) / elapsed, 1),
+        "rows_per_second": round(len(values) * rows_per_call / elapsed, 1),
+    }
+
+def run_scenario(call: Callable[[], bool], iterations: int, warmup: int, rows_per_call: int = 1) -> dict:
+    """Time a scenario call repeatedly; the call returns False on a failed request"""
+    for _ in range(warmup):
+        call()
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        ok = call()
+        latencies.append(time.perf_counter() - call_started)
+        if not ok:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - started, rows_per_call)
+
+def _reading(machine_id: int, timestamp: datetime) -> dict:
+    return {
+        "machine_id": machine_id,
+        "timestamp": timestamp.isoformat(),
+        "temperature": round(random.gauss(70, 5), 2),
+        "vibration": round(abs(random.gauss(2, 0.3)), 3),
+        "pressure": round(random.gauss(1.0, 0.05), 3),
+        "rpm": round(random.gauss(2500, 50), 1),
+        "voltage": round(random.gauss(230, 2), 1),
+        "current": round(random.gauss(12, 0.5), 2),
+        "noise_level": round(random.gauss(72, 3), 1),
+    }
+
+def api_scenarios(client, machines: int, batch_size: int) -> Dict[str, tuple]:
+    """Scenario name to (call, rows per call) for the HTTP endpoints"""
+    def machine_id() -> int:
+        return random.randint(1, machines)
+
+    def get(path: str, **params) -> Callable[[], bool]:
+        def call():
+            return client.get(path.format(machine_id=machine_id()), params=params).status_code == 200
+        return call
+
+    def ingest_single():
+        response = client.post("/api/sensor-data/", json=_reading(machine_id(), datetime.utcnow()))
+        return response.status_code == 201
+
+    def ingest_batch():
+        target = machine_id()
+        now = datetime.utcnow()
+        readings = [_reading(target, now - timedelta(milliseconds=i)) for i in range(batch_size)]
+        response = client.post("/api/sensor-data/batch", json={"machine_id": target, "readings": readings})
+        return response.status_code == 201
+
+    def ingest_columnar():
+        target = machine_id()
+        now = datetime.utcnow()
+        readings = [_reading(target, now - timedelta(milliseconds=i)) for i in range(batch_size)]
+        columns = {field: [reading[field] for reading in readings] for field in readings[0] if field != "machine_id"}
+        response = client.post("/api/sensor-data/batch/columnar", json={"machine_id": target, **columns})
+        return response.status_code == 201
+
+    return {
+        "ingest_single": (ingest_single, 1),
+        "ingest_batch": (ingest_batch, batch_size),
+        "ingest_columnar": (ingest_columnar, batch_size),
+        "history": (get("/api/sensor-data/{machine_id}", limit=1000), 1),
+        "history_columnar": (get("/api/sensor-data/{machine_id}", limit=1000, format="columnar"), 1),
+        "history_arrow": (get("/api/sensor-data/{machine_id}", limit=1000, format="arrow"), 1),
+        "stats": (get("/api/sensor-data/{machine_id}/stats", days=7), 1),
+        "prediction_failure": (get("/api/predictions/{machine_id}"), 1),
+        "prediction_anomalies": (get("/api/predictions/{machine_id}/anomalies"), 1),
+        "prediction_health": (get("/api/predictions/{machine_id}/health"), 1),
+        "maintenance_schedule": (get("/api/maintenance/{machine_id}/schedule"), 1),
+        "fleet_schedule": (get("/api/maintenance/fleet/schedule", limit=50), 1),
+    }
+
+def seed_csv_files(data_dir, machines: int, rows: int, seed: int) -> None:
+    """Write per-machine CSV history in the layout the CSV service reads"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now().floor("s")
+    for machine_id in range(1, machines + 1):
+        pd.DataFrame({
+            "machine_id": machine_id,
+            "timestamp": pd.date_range(end=end, periods=rows, freq="1min").strftime("%Y-%m-%dT%H:%M:%S"),
+            "temperature": rng.normal(70, 5, rows).round(2),
+            "vibration": np.abs(rng.normal(2, 0.3, rows)).round(3),
+            "pressure": rng.normal(1.0, 0.05, rows).round(3),
+            "rpm": rng.normal(2500, 50, rows).round(1),
+            "anomaly_detected": rng.random(rows) < 0.02,
+        }).to_csv(data_dir / f"{machine_id}_sensor_data.csv", index=False)
+
+def csv_scenarios(sensor_data, machines: int) -> Dict[str, tuple]:
+    """Scenario name to (call, rows per call) for the CSV sensor data service"""
+    def machine_id() -> int:
+        return random.randint(1, machines)
+
+    def store():
+        # Appends go to separate files so the seeded history keeps one column layout
+        reading = _reading(machines + machine_id(), datetime.utcnow())
+        sensor_data.store_data(sensor_data.process_sensor_data(reading))
+        return True
+
+    return {
+        "csv_store": (store, 1),
+        "csv_history": (lambda: not sensor_data.get_historical_data(str(machine_id()), days=30).empty, 1),
+        "csv_aggregate": (lambda: not sensor_data.aggregate_sensor_data(str(machine_id()), "H").empty, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=2000, help="Seeded readings per machine")
+    parser.add_argument("--maintenance", type=int, default=6, help="Seeded maintenance records per machine")
+    parser.add_argument("--csv-rows", type=int, default=2000, help="Seeded CSV rows per machine")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls per scenario")
+    parser.add_argument("--batch-size", type=int, default=100, help="Readings per batch ingest request")
+    parser.add_argument("--profile", default="default", help="Storage profile of the app's engine")
+    parser.add_argument("--scenarios", nargs="+", help="Only run these scenarios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    commit = _git_commit()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Settings and the ./data directories are resolved when the app is
+        # imported, so point them at the scratch directory first
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+        os.environ["STORAGE_PROFILE"] = args.profile
+        os.environ["SENSOR_RETENTION_ENABLED"] = "false"
+        os.environ.setdefault("SECRET_KEY", "benchmark")
+        os.chdir(temp_dir)
+
+        from fastapi.testclient import TestClient
+
+        from app.db.database import Base, engine
+        from app.main import app
+        from app.services import sensor_data
+        from tests.benchmarks.seed import seed_fleet
+
+        Base.metadata.create_all(bind=engine)
+        started = time.perf_counter()
+        seeded = seed_fleet(engine, args.machines, args.readings, args.maintenance, seed=args.seed)
+        seed_csv_files(sensor_data.DATA_DIR, args.machines, args.csv_rows, args.seed)
+        seeded["seconds"] = round(time.perf_counter() - started, 3)
+        print(f"Seeded {seeded['sensor_readings']} readings for {seeded['machines']} machines "
+              f"in {seeded['seconds']}s")
+
+        results = {}
+        with TestClient(app) as client:
+            scenarios = api_scenarios(client, args.machines, args.batch_size)
+            scenarios.update(csv_scenarios(sensor_data, args.machines))
+            print(f"{'scenario':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'errors':>8}")
+            for name, (call, rows_per_call) in scenarios.items():
+                if args.scenarios and name not in args.scenarios:
+                    continue
+                results[name] = run_scenario(call, args.iterations, args.warmup, rows_per_call)
+                result = results[name]
+                print(f"{name:<22}{result.get('p50_ms', '-'):>10}{result.get('p95_ms', '-'):>10}"
+                      f"{result.get('p99_ms', '-'):>10}{result.get('ops_per_second', '-'):>10}"
+                      f"{result['errors']:>8}")
+
+        engine.dispose()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": vars(args),
+        },
+        "seed": seeded,
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
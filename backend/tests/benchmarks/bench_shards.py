@@ -0,0 +1,115 @@
+"""
+Sensor data write throughput by number of shards
+
+Writer threads insert batches of readings for random machines, each batch
+committed on its machine's shard. Every run gets fresh temporary SQLite
+databases (the main database and one per shard), so the figures show how
+far spreading the write lock over more databases raises throughput.
+
+Usage (from backend/):
+    python -m tests.benchmarks.bench_shards --shards 1 2 4 --seconds 10 --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db.database import Base, create_db_engine
+from app.db.profiles import STORAGE_PROFILES
+from app.db.shards import ShardRouter
+from app.models.machine import Machine
+from app.models.maintenance import Maintenance  # noqa: F401 (registers the Machine relationship)
+from app.models.sensor import SensorData
+from tests.benchmarks.bench_storage_profiles import _reading
+
+def run_shards(temp_dir: str, shards: int, profile: str, seconds: float, writers: int,
+               machines: int, batch_size: int) -> dict:
+    """Run the write workload against a number of shards and return throughput figures"""
+    run_dir = os.path.join(temp_dir, f"{shards}-shards")
+    os.makedirs(run_dir)
+    main_engine = create_db_engine(f"sqlite:///{os.path.join(run_dir, 'main.db')}", profile)
+    urls = [f"sqlite:///{os.path.join(run_dir, f'shard{shard}.db')}" for shard in range(shards)]
+    router = ShardRouter(main_engine, urls)
+    Base.metadata.create_all(bind=main_engine, tables=router.main_tables())
+    router.create_schema()
+
+    with main_engine.begin() as connection:
+        connection.execute(insert(Machine), [
+            {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Bench"}
+            for machine_id in range(1, machines + 1)
+        ])
+
+    counts = {"write_batches": 0, "rows_written": 0, "write_errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            machine_id = random.randint(1, machines)
+            now = datetime.utcnow()
+            rows = [_reading(machine_id, now - timedelta(seconds=i)) for i in range(batch_size)]
+            try:
+                with router.engines[router.shard_of(machine_id)].begin() as connection:
+                    connection.execute(insert(SensorData), rows)
+                with lock:
+                    counts["write_batches"] += 1
+                    counts["rows_written"] += batch_size
+            except Exception:
+                with lock:
+                    counts["write_errors"] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    router.dispose()
+    main_engine.dispose()
+
+    return {
+        "shards": shards,
+        "profile": profile,
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(counts["write_batches"] / elapsed, 1),
+        "rows_written_per_second": round(counts["rows_written"] / elapsed, 1),
+        "write_errors": counts["write_errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50, help="Readings per write transaction")
+    parser.add_argument("--profile", default="production", choices=list(STORAGE_PROFILES), help="Storage profile of every database")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = [
+            run_shards(temp_dir, shards, args.profile, args.seconds, args.writers, args.machines, args.batch_size)
+            for shards in args.shards
+        ]
+
+    print(f"{'shards':<8}{'writes/s':>10}{'rows/s':>12}{'errors':>8}")
+    for result in results:
+        print(f"{result['shards']:<8}{result['writes_per_second']:>10}"
+              f"{result['rows_written_per_second']:>12}{result['write_errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
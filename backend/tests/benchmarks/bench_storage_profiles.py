@@ -0,0 +1,140 @@
+"""
+Mixed read/write throughput for each storage profile
+
+Writer threads insert batches of sensor readings while reader threads run the
+recent-history query used by the read endpoints. Each profile gets a fresh
+temporary SQLite database; pass --postgres-url to also measure PostgreSQL.
+
+Usage (from backend/):
+    python -m tests.benchmarks.bench_storage_profiles --seconds 10 --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.db.database import Base, create_db_engine
+from app.db.profiles import STORAGE_PROFILES
+from app.models.machine import Machine
+from app.models.maintenance import Maintenance  # noqa: F401 (registers the Machine relationship)
+from app.models.sensor import SensorData
+
+def _reading(machine_id: int, timestamp: datetime) -> dict:
+    return {
+        "machine_id": machine_id,
+        "timestamp": timestamp,
+        "temperature": random.gauss(70, 5),
+        "vibration": random.gauss(2, 0.3),
+        "pressure": random.gauss(1.0, 0.05),
+        "rpm": random.gauss(2500, 50),
+    }
+
+def run_profile(url: str, profile: str, seconds: float, writers: int, readers: int,
+                machines: int, batch_size: int) -> dict:
+    """Run the mixed workload against one engine and return throughput figures"""
+    engine = create_db_engine(url, profile)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        connection.execute(insert(Machine), [
+            {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Bench"}
+            for machine_id in range(1, machines + 1)
+        ])
+
+    counts = {"write_batches": 0, "rows_written": 0, "reads": 0, "write_errors": 0, "read_errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            machine_id = random.randint(1, machines)
+            now = datetime.utcnow()
+            rows = [_reading(machine_id, now - timedelta(seconds=i)) for i in range(batch_size)]
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(SensorData), rows)
+                with lock:
+                    counts["write_batches"] += 1
+                    counts["rows_written"] += batch_size
+            except Exception:
+                with lock:
+                    counts["write_errors"] += 1
+
+    def reader():
+        while not stop.is_set():
+            machine_id = random.randint(1, machines)
+            query = select(SensorData).where(SensorData.machine_id == machine_id)
+            query = query.order_by(SensorData.timestamp.desc()).limit(100)
+            try:
+                with engine.connect() as connection:
+                    connection.execute(query).all()
+                with lock:
+                    counts["reads"] += 1
+            except Exception:
+                with lock:
+                    counts["read_errors"] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    return {
+        "profile": profile,
+        "dialect": url.split(":", 1)[0],
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(counts["write_batches"] / elapsed, 1),
+        "rows_written_per_second": round(counts["rows_written"] / elapsed, 1),
+        "reads_per_second": round(counts["reads"] / elapsed, 1),
+        "write_errors": counts["write_errors"],
+        "read_errors": counts["read_errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--machines", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=50, help="Readings per write transaction")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    parser.add_argument("--postgres-url", help="Also benchmark a scratch PostgreSQL database (tables are dropped)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for profile in args.profiles:
+            url = f"sqlite:///{os.path.join(temp_dir, profile + '.db')}"
+            results.append(run_profile(url, profile, args.seconds, args.writers, args.readers,
+                                       args.machines, args.batch_size))
+            if args.postgres_url:
+                results.append(run_profile(args.postgres_url, profile, args.seconds, args.writers,
+                                           args.readers, args.machines, args.batch_size))
+
+    print(f"{'profile':<12}{'dialect':<12}{'writes/s':>10}{'rows/s':>12}{'reads/s':>10}{'errors':>8}")
+    for result in results:
+        errors = result["write_errors"] + result["read_errors"]
+        print(f"{result['profile']:<12}{result['dialect']:<12}{result['writes_per_second']:>10}"
+              f"{result['rows_written_per_second']:>12}{result['reads_per_second']:>10}{errors:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare two bench_api result files
+
+Prints each scenario's p50/p95 latency and throughput side by side and flags
+scenarios whose p95 latency grew by more than the threshold.
+
+Usage (from backend/):
+    python -m tests.benchmarks.compare baseline.json results.json --threshold 10 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Rows of (scenario, baseline, current, p95 change %, regressed) for shared scenarios"""
+    rows = []
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None or "p95_ms" not in before or "p95_ms" not in after:
+            continue
+        change = _change(before["p95_ms"], after["p95_ms"])
+        regressed = change > threshold or after["errors"] > before["errors"]
+        rows.append((name, before, after, change, regressed))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Results of the reference commit")
+    parser.add_argument("current", help="Results to compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 latency increase in percent")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"baseline {baseline['meta']['commit']} vs current {current['meta']['commit']}")
+    print(f"{'scenario':<22}{'p50 ms':>18}{'p95 ms':>18}{'p95 %':>9}{'ops/s':>18}")
+    rows = compare(baseline, current, args.threshold)
+    for name, before, after, change, regressed in rows:
+        print(f"{name:<22}"
+              f"{before['p50_ms']:>9} {after['p50_ms']:>8}"
+              f"{before['p95_ms']:>9} {after['p95_ms']:>8}"
+              f"{change:>+8.1f}%"
+              f"{before['ops_per_second']:>9} {after['ops_per_second']:>8}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    if args.fail_on_regression and any(row[-1] for row in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
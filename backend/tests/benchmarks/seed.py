@@ -0,0 +1,105 @@
+"""
+Synthetic fleet data for benchmarks
+
+Generates N machines x M readings plus maintenance history with NumPy and
+bulk-inserts them through Core executemany, so seeding a few million rows
+takes seconds rather than minutes.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.models.machine import Machine
+from app.models.maintenance import Maintenance
+from app.models.sensor import SensorData
+
+MACHINE_TYPES = ["CNC", "Pump", "Compressor", "Conveyor", "Press"]
+LOCATIONS = ["Factory Floor A", "Factory Floor B", "Warehouse", "Assembly Line 1", "Assembly Line 2"]
+MAINTENANCE_TYPES = ["preventive", "corrective", "predictive"]
+
+# Rows per executemany call
+INSERT_BATCH_ROWS = 20000
+
+def _insert_batched(connection, table, columns: dict, batch_rows: int = INSERT_BATCH_ROWS) -> None:
+    """Insert column arrays in batches of parameter sets"""
+    names = list(columns)
+    total = len(columns[names[0]])
+    for start in range(0, total, batch_rows):
+        stop = min(start + batch_rows, total)
+        values = [columns[name][start:stop] for name in names]
+        connection.execute(insert(table), [dict(zip(names, row)) for row in zip(*values)])
+
+def seed_fleet(engine, machines: int = 20, readings_per_machine: int = 2000,
+               maintenance_per_machine: int = 6, interval_seconds: int = 60,
+               seed: int = 42, end: datetime = None) -> dict:
+    """
+    Bulk-generate a fleet with sensor history and maintenance records
+
+    Args:
+        engine: Engine of an empty database with the schema created
+        machines: Number of machines
+        readings_per_machine: Sensor readings per machine, evenly spaced
+        maintenance_per_machine: Maintenance records per machine
+        interval_seconds: Spacing between readings
+        seed: Random seed, so runs are reproducible
+        end: Timestamp of the newest reading (defaults to now)
+
+    Returns:
+        Counts of the generated rows
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.utcnow()
+    machine_ids = np.arange(1, machines + 1)
+
+    machine_rows = {
+        "id": machine_ids.tolist(),
+        "name": [f"Machine {machine_id:05d}" for machine_id in machine_ids],
+        "type": [MACHINE_TYPES[i % len(MACHINE_TYPES)] for i in range(machines)],
+        "location": [LOCATIONS[i % len(LOCATIONS)] for i in range(machines)],
+        "installation_date": [end - timedelta(days=int(days)) for days in rng.integers(365, 3650, machines)],
+        "status": rng.choice(["operational", "operational", "operational", "warning", "critical"], machines).tolist(),
+    }
+
+    # Readings: baseline per machine plus noise and a slow upward drift
+    count = machines * readings_per_machine
+    ids = np.repeat(machine_ids, readings_per_machine)
+    offsets = np.tile(np.arange(readings_per_machine)[::-1] * interval_seconds, machines)
+    drift = np.tile(np.linspace(0.0, 1.0, readings_per_machine), machines)
+    base_temperature = np.repeat(rng.normal(65, 5, machines), readings_per_machine)
+    base_vibration = np.repeat(rng.normal(2.0, 0.3, machines), readings_per_machine)
+
+    sensor_rows = {
+        "machine_id": ids.tolist(),
+        "timestamp": [end - timedelta(seconds=int(offset)) for offset in offsets],
+        "temperature": (base_temperature + 5 * drift + rng.normal(0, 1.5, count)).round(2).tolist(),
+        "vibration": np.abs(base_vibration + drift + rng.normal(0, 0.2, count)).round(3).tolist(),
+        "pressure": rng.normal(1.02, 0.03, count).round(3).tolist(),
+        "rpm": rng.normal(2450, 40, count).round(1).tolist(),
+        "voltage": rng.normal(230, 2, count).round(1).tolist(),
+        "current": rng.normal(12, 0.5, count).round(2).tolist(),
+        "noise_level": rng.normal(72, 3, count).round(1).tolist(),
+    }
+
+    maintenance_count = machines * maintenance_per_machine
+    maintenance_days = rng.integers(1, 720, maintenance_count)
+    maintenance_rows = {
+        "machine_id": np.repeat(machine_ids, maintenance_per_machine).tolist(),
+        "date": [date.today() - timedelta(days=int(days)) for days in maintenance_days],
+        "type": rng.choice(MAINTENANCE_TYPES, maintenance_count).tolist(),
+        "description": ["Synthetic maintenance record"] * maintenance_count,
+        "technician": ["Benchmark"] * maintenance_count,
+        "cost": rng.uniform(100, 5000, maintenance_count).round(2).tolist(),
+        "duration_hours": rng.uniform(0.5, 8, maintenance_count).round(1).tolist(),
+    }
+
+    with engine.begin() as connection:
+        _insert_batched(connection, Machine.__table__, machine_rows)
+        _insert_batched(connection, SensorData.__table__, sensor_rows)
+        _insert_batched(connection, Maintenance.__table__, maintenance_rows)
+
+    return {
+        "machines": machines,
+        "sensor_readings": count,
+        "maintenance_records": maintenance_count,
+    }
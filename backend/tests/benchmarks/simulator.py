@@ -0,0 +1,428 @@
+"""
+Sensor stream simulator and ingest load generator
+
+Simulates a fleet whose readings follow per-machine-type profiles: a slow
+random-walk drift around the type's baseline, Gaussian noise, short
+vibration/noise bursts, and degradation that builds up before failures drawn
+from the type's mean time between failures. After a failure the machine is
+repaired and its drift reset.
+
+The stream is replayed against a running API at a target rate (readings per
+second) with a fixed number of concurrent connections, in one of three modes:
+
+    single  POST /api/sensor-data/ per reading
+    batch   POST /api/sensor-data/batch with --batch-size readings per machine
+    stream  POST /api/sensor-data/import with --stream-rows readings per CSV upload,
+            then poll the import job until it finishes
+
+Simulated time runs --sample-interval seconds per tick, usually much faster
+than the wall clock, so the simulation starts far enough in the past to
+end about now, and generation waits rather than send readings from the
+future.
+
+Latency is measured from when a request was scheduled, so queueing behind a
+slow server is included rather than hidden. In stream mode it lasts until
+the import job has finished, and only rows the job inserted count as
+accepted. Failures are written to a ground
+truth CSV, and --dump writes the generated readings, so the same data can be
+used to evaluate the model.
+
+Usage (from backend/):
+    python -m tests.benchmarks.simulator --url http://localhost:8000 --machines 50 \\
+        --rate 500 --concurrency 16 --mode batch --duration 60 --ground-truth failures.csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+SENSORS = ["temperature", "vibration", "pressure", "rpm", "voltage", "current", "noise_level"]
+
+# Seconds between polls of an import job in stream mode
+IMPORT_POLL_INTERVAL = 0.1
+
+# Per-type sensor behavior, in SENSORS order. failure_shift is how far each
+# sensor has moved from its baseline when the machine fails.
+MACHINE_PROFILES = {
+    "CNC": {
+        "baseline": [65.0, 2.0, 1.0, 3000.0, 230.0, 12.0, 75.0],
+        "noise": [1.5, 0.2, 0.03, 40.0, 2.0, 0.5, 2.5],
+        "failure_shift": [18.0, 4.0, 0.0, -250.0, 0.0, 3.0, 12.0],
+        "mtbf_hours": 500.0,
+    },
+    "Pump": {
+        "baseline": [55.0, 1.5, 4.0, 1750.0, 400.0, 20.0, 70.0],
+        "noise": [1.0, 0.15, 0.1, 25.0, 3.0, 0.8, 2.0],
+        "failure_shift": [12.0, 3.0, -1.5, -150.0, 0.0, 4.0, 8.0],
+        "mtbf_hours": 800.0,
+    },
+    "Compressor": {
+        "baseline": [80.0, 2.5, 8.0, 3600.0, 400.0, 30.0, 85.0],
+        "noise": [2.0, 0.25, 0.2, 50.0, 3.0, 1.0, 3.0],
+        "failure_shift": [25.0, 3.5, -2.0, -300.0, 0.0, 6.0, 10.0],
+        "mtbf_hours": 400.0,
+    },
+    "Conveyor": {
+        "baseline": [40.0, 1.0, 1.0, 1200.0, 230.0, 8.0, 65.0],
+        "noise": [1.0, 0.1, 0.02, 20.0, 2.0, 0.4, 2.0],
+        "failure_shift": [10.0, 2.5, 0.0, -200.0, 0.0, 2.5, 6.0],
+        "mtbf_hours": 1200.0,
+    },
+    "Press": {
+        "baseline": [60.0, 3.0, 12.0, 900.0, 400.0, 25.0, 90.0],
+        "noise": [1.5, 0.4, 0.3, 15.0, 3.0, 1.0, 4.0],
+        "failure_shift": [15.0, 5.0, -3.0, -100.0, 0.0, 5.0, 10.0],
+        "mtbf_hours": 600.0,
+    },
+}
+
+class FleetSimulator:
+    """Generates one reading per machine per tick, for the whole fleet at once"""
+
+    def __init__(self, machine_ids: List[int], machine_types: List[str], start: datetime,
+                 sample_interval: float = 60.0, degradation_hours: float = 48.0,
+                 burst_probability: float = 0.002, seed: int = 42):
+        self.rng = np.random.default_rng(seed)
+        self.machine_ids = np.asarray(machine_ids)
+        self.machine_types = list(machine_types)
+        self.start = start
+        self.sample_interval = sample_interval
+        self.degradation_seconds = degradation_hours * 3600
+        self.burst_probability = burst_probability
+
+        profiles = [MACHINE_PROFILES[machine_type] for machine_type in self.machine_types]
+        self.baseline = np.array([profile["baseline"] for profile in profiles])
+        self.noise = np.array([profile["noise"] for profile in profiles])
+        self.failure_shift = np.array([profile["failure_shift"] for profile in profiles])
+        self.mtbf_seconds = np.array([profile["mtbf_hours"] * 3600 for profile in profiles])
+
+        count = len(self.machine_ids)
+        self.elapsed = 0.0
+        self.drift = np.zeros((count, len(SENSORS)))
+        self.burst_remaining = np.zeros(count, dtype=int)
+        self.next_failure = self.rng.exponential(self.mtbf_seconds)
+        self.failures: List[dict] = []
+
+        self._burst_sensors = np.isin(SENSORS, ["vibration", "noise_level"])
+
+    @property
+    def next_timestamp(self) -> datetime:
+        """Timestamp of the readings the next tick produces"""
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def tick(self):
+        """
+        Advance one sample interval
+
+        Returns:
+            Tuple of the reading timestamp and a (machines, sensors) array
+        """
+        count = len(self.machine_ids)
+        timestamp = self.next_timestamp
+
+        # Degradation ramps up over the window before each failure
+        remaining = self.next_failure - self.elapsed
+        progress = np.clip(1.0 - remaining / self.degradation_seconds, 0.0, 1.0)[:, None]
+
+        # Mean-reverting drift around the baseline
+        self.drift = 0.995 * self.drift + self.rng.normal(0.0, 0.05, self.drift.shape) * self.noise
+
+        starting = (self.burst_remaining == 0) & (self.rng.random(count) < self.burst_probability)
+        self.burst_remaining[starting] = self.rng.integers(3, 20, starting.sum())
+        bursting = (self.burst_remaining > 0)[:, None] & self._burst_sensors
+
+        values = (
+            self.baseline
+            + self.drift
+            + self.failure_shift * progress ** 2
+            + self.rng.normal(0.0, 1.0, self.drift.shape) * self.noise * (1.0 + progress)
+        )
+        values = np.where(bursting, values * 1.8, values)
+        values = np.maximum(values, 0.0)
+        self.burst_remaining = np.maximum(self.burst_remaining - 1, 0)
+
+        # Record failures, then repair: reset drift and draw the next failure
+        failed = np.flatnonzero(self.elapsed >= self.next_failure)
+        for index in failed:
+            failure_time = self.start + timedelta(seconds=float(self.next_failure[index]))
+            self.failures.append({
+                "machine_id": int(self.machine_ids[index]),
+                "machine_type": self.machine_types[index],
+                "degradation_start": (failure_time - timedelta(seconds=self.degradation_seconds)).isoformat(),
+                "failure_time": failure_time.isoformat(),
+            })
+        if len(failed):
+            self.drift[failed] = 0.0
+            self.next_failure[failed] = self.elapsed + self.rng.exponential(self.mtbf_seconds[failed])
+
+        self.elapsed += self.sample_interval
+        return timestamp, values
+
+def _readings(machine_ids, timestamp: datetime, values) -> List[dict]:
+    stamp = timestamp.isoformat()
+    return [
+        {"machine_id": int(machine_id), "timestamp": stamp,
+         **{sensor: round(float(value), 4) for sensor, value in zip(SENSORS, row)}}
+        for machine_id, row in zip(machine_ids, values)
+    ]
+
+def _csv_bytes(readings: List[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["machine_id", "timestamp"] + SENSORS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(readings)
+    return buffer.getvalue().encode()
+
+class LoadStats:
+    """Latencies and outcomes of the requests sent"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.service_times: List[float] = []
+        self.status_codes: Dict[str, int] = {}
+        self.requests = 0
+        self.errors = 0
+        self.readings_sent = 0
+
+    def record(self, scheduled: float, sent: float, status: str, ok: bool, readings: int) -> None:
+        finished = time.perf_counter()
+        self.latencies.append(finished - scheduled)
+        self.service_times.append(finished - sent)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        self.requests += 1
+        if ok:
+            self.readings_sent += readings
+        else:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> dict:
+        def percentiles(values):
+            if not values:
+                return {}
+            p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+            return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2),
+                    "max_ms": round(max(values) * 1000, 2)}
+
+        return {
+            "seconds": round(elapsed, 2),
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "readings_accepted": self.readings_sent,
+            "readings_per_second": round(self.readings_sent / elapsed, 1) if elapsed else 0.0,
+            "requests_per_second": round(self.requests / elapsed, 1) if elapsed else 0.0,
+            "latency": percentiles(self.latencies),
+            "service_time": percentiles(self.service_times),
+            "status_codes": self.status_codes,
+        }
+
+async def _producer(simulator: FleetSimulator, queue: asyncio.Queue, mode: str, rate: float,
+                    duration: float, batch_size: int, stream_rows: int, dump_writer=None) -> None:
+    """Generate readings at the target rate and queue them as requests"""
+    started = time.perf_counter()
+    generated = 0
+    batches: Dict[int, List[dict]] = {}
+    stream_buffer: List[dict] = []
+
+    while time.perf_counter() - started < duration:
+        # Never send readings from the future; wait for the wall clock to catch up
+        ahead_of_clock = (simulator.next_timestamp - datetime.utcnow()).total_seconds()
+        if ahead_of_clock > 0:
+            await asyncio.sleep(min(ahead_of_clock, duration - (time.perf_counter() - started)))
+            continue
+
+        timestamp, values = simulator.tick()
+        readings = _readings(simulator.machine_ids, timestamp, values)
+        if dump_writer is not None:
+            dump_writer.writerows(readings)
+
+        if mode == "single":
+            for reading in readings:
+                await queue.put((time.perf_counter(), "single", reading, 1))
+        elif mode == "batch":
+            for reading in readings:
+                batches.setdefault(reading["machine_id"], []).append(reading)
+            if len(batches[readings[0]["machine_id"]]) >= batch_size:
+                for machine_id, machine_readings in batches.items():
+                    payload = {"machine_id": machine_id, "readings": machine_readings}
+                    await queue.put((time.perf_counter(), "batch", payload, len(machine_readings)))
+                batches = {}
+        else:
+            stream_buffer.extend(readings)
+            while len(stream_buffer) >= stream_rows:
+                chunk, stream_buffer = stream_buffer[:stream_rows], stream_buffer[stream_rows:]
+                await queue.put((time.perf_counter(), "stream", _csv_bytes(chunk), len(chunk)))
+
+        # Pace generation so readings are produced at the target rate
+        generated += len(readings)
+        ahead = generated / rate - (time.perf_counter() - started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+async def _wait_for_import(client: httpx.AsyncClient, job: dict) -> dict:
+    """Poll an import job until it completes or fails"""
+    while job["status"] not in ("completed", "failed"):
+        await asyncio.sleep(IMPORT_POLL_INTERVAL)
+        response = await client.get(f"/api/sensor-data/import/{job['id']}")
+        response.raise_for_status()
+        job = response.json()
+    return job
+
+async def _worker(client: httpx.AsyncClient, queue: asyncio.Queue, stats: LoadStats) -> None:
+    while True:
+        item = await queue.get()
+        if item is None:
+            queue.task_done()
+            return
+        scheduled, kind, payload, readings = item
+        sent = time.perf_counter()
+        try:
+            if kind == "single":
+                response = await client.post("/api/sensor-data/", json=payload)
+            elif kind == "batch":
+                response = await client.post("/api/sensor-data/batch", json=payload)
+            else:
+                response = await client.post(
+                    "/api/sensor-data/import",
+                    files={"file": ("stream.csv", payload, "text/csv")},
+                    params={"format": "csv"}
+                )
+            if kind == "stream" and response.is_success:
+                # Accepted only means spooled; readings count once the job has inserted them
+                job = await _wait_for_import(client, response.json())
+                stats.record(scheduled, sent, f"import {job['status']}", job["status"] == "completed", job["rows_inserted"])
+            else:
+                stats.record(scheduled, sent, str(response.status_code), response.is_success, readings)
+        except httpx.HTTPError as e:
+            stats.record(scheduled, sent, type(e).__name__, False, readings)
+        queue.task_done()
+
+async def run_load(url: str, simulator: FleetSimulator, mode: str, rate: float, concurrency: int,
+                   duration: float, batch_size: int = 100, stream_rows: int = 5000,
+                   timeout: float = 30.0, dump_writer=None) -> dict:
+    """
+    Replay the simulated stream against a running API
+
+    Args:
+        url: Base URL of the API
+        simulator: Fleet simulator producing the readings
+        mode: 'single', 'batch' or 'stream'
+        rate: Target readings per second
+        concurrency: Number of concurrent requests
+        duration: Seconds to generate load for
+        batch_size: Readings per machine per batch request
+        stream_rows: Readings per CSV upload in stream mode
+        timeout: Per-request timeout in seconds
+        dump_writer: Optional csv.DictWriter receiving every generated reading
+
+    Returns:
+        Throughput, error rate and latency percentiles
+    """
+    stats = LoadStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        workers = [asyncio.create_task(_worker(client, queue, stats)) for _ in range(concurrency)]
+        started = time.perf_counter()
+        await _producer(simulator, queue, mode, rate, duration, batch_size, stream_rows, dump_writer)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    report = stats.report(elapsed)
+    report["mode"] = mode
+    report["target_readings_per_second"] = rate
+    report["concurrency"] = concurrency
+    report["failures_simulated"] = len(simulator.failures)
+    return report
+
+def _discover_machines(url: str, limit: int) -> Optional[List[tuple]]:
+    """Machine IDs and types from the API, or None if it cannot be listed"""
+    try:
+        response = httpx.get(f"{url}/api/machines/", params={"limit": limit}, timeout=10.0)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    return [
+        (machine["id"], machine["type"] if machine.get("type") in MACHINE_PROFILES else "CNC")
+        for machine in response.json()
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("--mode", choices=["single", "batch", "stream"], default="batch")
+    parser.add_argument("--machines", type=int, default=20)
+    parser.add_argument("--discover", action="store_true", help="Use the machines listed by the API")
+    parser.add_argument("--rate", type=float, default=200.0, help="Target readings per second")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument("--batch-size", type=int, default=100, help="Readings per batch request")
+    parser.add_argument("--stream-rows", type=int, default=5000, help="Readings per CSV upload")
+    parser.add_argument("--sample-interval", type=float, default=60.0, help="Simulated seconds between readings")
+    parser.add_argument("--degradation-hours", type=float, default=48.0,
+                        help="Simulated hours of degradation before a failure")
+    parser.add_argument("--burst-probability", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ground-truth", help="Write simulated failures to this CSV file")
+    parser.add_argument("--dump", help="Write every generated reading to this CSV file")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    machines = _discover_machines(args.url, args.machines) if args.discover else None
+    if not machines:
+        # Same type assignment as tests/benchmarks/seed.py
+        machine_types = list(MACHINE_PROFILES)
+        machines = [(i + 1, machine_types[i % len(machine_types)]) for i in range(args.machines)]
+
+    # Start far enough back for the simulated span at the target rate to end now
+    ticks = math.ceil(args.rate * args.duration / len(machines))
+    simulator = FleetSimulator(
+        [machine_id for machine_id, _ in machines],
+        [machine_type for _, machine_type in machines],
+        start=datetime.utcnow() - timedelta(seconds=ticks * args.sample_interval),
+        sample_interval=args.sample_interval,
+        degradation_hours=args.degradation_hours,
+        burst_probability=args.burst_probability,
+        seed=args.seed,
+    )
+
+    dump_file = open(args.dump, "w", newline="") if args.dump else None
+    try:
+        dump_writer = None
+        if dump_file is not None:
+            dump_writer = csv.DictWriter(dump_file, fieldnames=["machine_id", "timestamp"] + SENSORS)
+            dump_writer.writeheader()
+        report = asyncio.run(run_load(
+            args.url, simulator, args.mode, args.rate, args.concurrency, args.duration,
+            args.batch_size, args.stream_rows, dump_writer=dump_writer
+        ))
+    finally:
+        if dump_file is not None:
+            dump_file.close()
+
+    if args.ground_truth:
+        with open(args.ground_truth, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["machine_id", "machine_type", "degradation_start", "failure_time"])
+            writer.writeheader()
+            writer.writerows(simulator.failures)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
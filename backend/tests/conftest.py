@@ -0,0 +1,36 @@
+"""
+Shared test setup
+
+Settings and the ./data directories are resolved when the app is imported,
+so the environment points the app at a scratch directory and SQLite
+database before any test module imports it.
+
+Usage (from backend/):
+    python -m pytest tests
+"""
+import os
+import tempfile
+
+import pytest
+
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="predictive-maintenance-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_SCRATCH_DIR, 'test.db')}"
+os.environ["SHARD_URLS"] = "[]"
+os.environ["SENSOR_RETENTION_ENABLED"] = "false"
+os.environ["ALERTS_ENABLED"] = "false"
+os.environ.setdefault("SECRET_KEY", "test")
+os.chdir(_SCRATCH_DIR)
+
+@pytest.fixture
+def db():
+    """Session on freshly created tables, dropped again after the test"""
+    from app.db.database import Base, SessionLocal, engine
+    from app.models import import_job, machine, maintenance, prediction, sensor, sensor_rollup, sensor_sketch  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.api import dependencies
+from app.api.dependencies import ConcurrencyLimiter, TokenBucketLimiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manually advanced monotonic clock, in seconds"""
+    now = [1000.0]
+    monkeypatch.setattr(dependencies.time, "monotonic", lambda: now[0])
+    return now
+
+def test_burst_is_admitted_then_rate_limited(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20)
+    assert limiter.acquire(1, 15) == 0
+    assert limiter.acquire(1, 5) == 0
+    # Empty bucket: 5 tokens at 10 per second
+    assert limiter.acquire(1, 5) == pytest.approx(0.5)
+
+def test_bucket_refills_over_time_up_to_the_burst(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20)
+    assert limiter.acquire(1, 20) == 0
+    clock[0] += 1.0
+    assert limiter.acquire(1, 10) == 0
+    assert limiter.acquire(1, 1) > 0
+
+    clock[0] += 3600.0
+    assert limiter.acquire(1, 20) == 0
+    assert limiter.acquire(1, 1) > 0
+
+def test_refused_request_takes_no_tokens(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20)
+    assert limiter.acquire(1, 18) == 0
+    assert limiter.acquire(1, 5) > 0
+    assert limiter.acquire(1, 2) == 0
+
+def test_cost_above_burst_is_charged_in_full(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20)
+    assert limiter.acquire(1, 1000) == 0
+    # 980 tokens of debt, then 20 to fill the bucket for the next large batch
+    assert limiter.acquire(1, 1000) == pytest.approx(100.0)
+    assert limiter.acquire(1, 1) == pytest.approx(98.1)
+
+    clock[0] += 98.2
+    assert limiter.acquire(1, 1) == 0
+
+def test_keys_have_separate_buckets(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20)
+    assert limiter.acquire(1, 20) == 0
+    assert limiter.acquire(2, 20) == 0
+    assert limiter.acquire(1, 1) > 0
+
+def test_least_recently_used_keys_are_evicted(clock):
+    limiter = TokenBucketLimiter(rate=10, burst=20, max_keys=2)
+    assert limiter.acquire(1, 20) == 0
+    limiter.acquire(2, 1)
+    limiter.acquire(3, 1)
+    # Key 1 was evicted and starts again with a full bucket
+    assert limiter.acquire(1, 20) == 0
+
+def test_concurrency_limiter_counts_holders_and_queues():
+    async def scenario():
+        limiter = ConcurrencyLimiter(limit=2, queue_size=1, timeout=0.05)
+        assert await limiter.acquire() is None
+        assert await limiter.acquire() is None
+        assert limiter.active == 2
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        assert await limiter.acquire() == "queue_full"
+
+        limiter.release()
+        assert await waiter is None
+        assert (limiter.active, limiter.waiting) == (2, 0)
+        assert await limiter.acquire() == "queue_timeout"
+        limiter.release()
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.coalesce import SingleFlight
+
+def test_concurrent_identical_calls_share_one_computation():
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", compute, 21) for _ in range(5)])
+        assert flight.in_flight() == 0
+        return results
+
+    assert asyncio.run(scenario()) == [42] * 5
+    assert calls == [21]
+
+def test_different_keys_run_separately():
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def scenario():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("a", compute, 1), flight.do("b", compute, 2))
+
+    assert asyncio.run(scenario()) == [1, 2]
+    assert sorted(calls) == [1, 2]
+
+def test_results_are_not_cached():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight("test")
+        return [await flight.do("key", compute), await flight.do("key", compute)]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+def test_exception_reaches_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*[flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_cancelled_caller_does_not_cancel_the_work():
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        first = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
+
+def test_blocking_work_runs_once_in_the_threadpool():
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        release.wait(5)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        tasks = [asyncio.ensure_future(flight.do_blocking("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == ["done"] * 3
+    assert len(calls) == 1
+    assert calls[0] != threading.main_thread().name
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from app.services.correlation import anomaly_mask, correlation_matrix, top_pairs
+
+def test_correlation_matrix_matches_pandas():
+    rng = np.random.default_rng(1)
+    base = rng.normal(0, 1, 200)
+    grid = np.vstack([
+        base + rng.normal(0, 0.1, 200),
+        -base + rng.normal(0, 0.5, 200),
+        rng.normal(0, 1, 200),
+        base,
+        rng.normal(0, 1, 200),
+    ])
+    # Machines miss different cells
+    grid[rng.random(grid.shape) < 0.2] = np.nan
+
+    # Small blocks exercise the blockwise computation
+    correlation, overlap = correlation_matrix(grid, min_overlap=10, block_rows=2)
+    expected = pd.DataFrame(grid.T).corr(min_periods=10).to_numpy()
+    np.testing.assert_allclose(correlation, expected, atol=1e-9)
+
+    present = ~np.isnan(grid)
+    np.testing.assert_array_equal(overlap, present.astype(int) @ present.T.astype(int))
+
+def test_too_little_overlap_or_no_variance_gives_nan():
+    grid = np.array([
+        [1.0, 2.0, 3.0, np.nan, np.nan, np.nan],
+        [np.nan, np.nan, 3.0, 4.0, 5.0, 6.0],
+        [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        [5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
+    ])
+    correlation, overlap = correlation_matrix(grid, min_overlap=3)
+    assert overlap[0, 1] == 1 and np.isnan(correlation[0, 1])
+    assert correlation[0, 2] == 1.0
+    assert np.isnan(correlation[2, 3])
+
+def test_top_pairs_by_absolute_correlation():
+    correlation = np.array([
+        [1.0, 0.2, -0.9],
+        [0.2, 1.0, np.nan],
+        [-0.9, np.nan, 1.0],
+    ])
+    pairs = top_pairs(correlation, [10, 20, 30], limit=5)
+    assert pairs == [
+        {"machine_a": 10, "machine_b": 30, "correlation": -0.9},
+        {"machine_a": 10, "machine_b": 20, "correlation": 0.2},
+    ]
+
+def test_anomaly_mask_flags_outliers_of_a_mostly_flat_signal():
+    grid = np.array([
+        [5, 5, 5, 5, 5, 5, 500],
+        [5, 5, 5, 5, 5, 5, 5],
+        [1, 2, 1, 2, 1, 2, np.nan],
+        [np.nan] * 7,
+    ], dtype=np.float64)
+    mask = anomaly_mask(grid, 3.5)
+    assert mask[0].tolist() == [False] * 6 + [True]
+    assert not mask[1:].any()
+
+def test_anomaly_mask_uses_the_mad_when_there_is_spread():
+    values = np.random.default_rng(1).normal(70, 1, 500)
+    values[[10, 20]] = [90, 40]
+    assert np.flatnonzero(anomaly_mask(values[None], 5.0)[0]).tolist() == [10, 20]
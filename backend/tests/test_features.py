@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.api.endpoints import sensors
+from app.ml.features import SENSOR_COLUMNS, FeatureState, IncrementalFeatureEngine, compute_features, latest_features
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+
+WINDOWS = (5, 20)
+
+def test_incremental_state_matches_batch_features():
+    values = np.random.default_rng(1).normal(70, 5, (57, len(SENSOR_COLUMNS)))
+    state = FeatureState(WINDOWS)
+    for start in range(0, len(values), 8):
+        state.update(values[start:start + 8])
+
+    expected = compute_features(values, WINDOWS)[-1]
+    np.testing.assert_allclose(state.features(), expected)
+    np.testing.assert_allclose(latest_features(values[None], WINDOWS)[0], expected)
+
+def test_features_need_a_full_window():
+    state = FeatureState(WINDOWS)
+    state.update(np.ones((19, len(SENSOR_COLUMNS))))
+    assert state.features() is None
+    state.update(np.ones(len(SENSOR_COLUMNS)))
+    assert state.features() is not None
+
+def test_prime_replaces_partial_state():
+    engine = IncrementalFeatureEngine(WINDOWS)
+    engine.update_values(1, np.ones((3, len(SENSOR_COLUMNS))))
+    assert engine.latest(1) is None
+
+    readings = [dict.fromkeys(SENSOR_COLUMNS, float(index)) for index in range(20)]
+    engine.prime(1, readings)
+    features = engine.latest(1)
+    assert features["temperature_mean_20"] == pytest.approx(9.5)
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(sensors, "feature_engine", IncrementalFeatureEngine(WINDOWS))
+    db.execute(insert(Machine), [{"id": 1, "name": "Machine 1", "type": "CNC", "location": "Test"}])
+    start = datetime(2025, 1, 1)
+    db.execute(insert(SensorData), [
+        {"machine_id": 1, "timestamp": start + timedelta(seconds=index), **dict.fromkeys(SENSOR_COLUMNS, float(index))}
+        for index in range(100)
+    ])
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensor-data")
+    return TestClient(app)
+
+def test_features_endpoint_primes_from_history_after_a_restart(client):
+    # One reading ingested since the restart leaves the windows far from full
+    sensors.feature_engine.update_values(1, np.full((1, len(SENSOR_COLUMNS)), 99.0))
+
+    response = client.get("/sensor-data/1/features")
+    assert response.status_code == 200
+    assert response.json()["features"]["temperature_mean_20"] == pytest.approx(89.5)
+
+def test_features_come_from_history_with_several_workers(client, monkeypatch):
+    monkeypatch.setattr(sensors.settings, "WORKERS", 2)
+    # Full windows, but of the readings only this worker received
+    sensors.feature_engine.update_values(1, np.full((20, len(SENSOR_COLUMNS)), 99.0))
+
+    response = client.get("/sensor-data/1/features")
+    assert response.json()["features"]["temperature_mean_20"] == pytest.approx(89.5)
@@ -0,0 +1,80 @@
+import math
+import time
+
+from app.ml.features import SENSOR_COLUMNS
+from app.services.line_protocol import parse_lines
+
+def _reading(points, index: int) -> dict:
+    return dict(zip(SENSOR_COLUMNS, points.values[index]))
+
+def test_parses_fields_tags_and_timestamp():
+    points = parse_lines(
+        b"sensors,site=a,machine_id=17 temperature=75.4,vibration=2.1,pressure=1.05,rpm=2500i 1713097845000000000\n"
+    )
+    assert points.errors == 0
+    assert points.machine_ids == [17]
+    assert points.timestamps == [1713097845000000000]
+    reading = _reading(points, 0)
+    assert reading["temperature"] == 75.4
+    assert reading["rpm"] == 2500.0
+    assert math.isnan(reading["voltage"])
+
+def test_timestamp_precision():
+    points = parse_lines(b"sensors,machine_id=1 temperature=1 1713097845\n", precision="s")
+    assert points.timestamps == [1713097845 * 10 ** 9]
+
+def test_missing_timestamp_uses_time_of_receipt():
+    before = time.time_ns()
+    # Without a timestamp, and with an empty one after a trailing space
+    points = parse_lines(b"sensors,machine_id=1 temperature=1\nsensors,machine_id=2 temperature=1 \n")
+    after = time.time_ns()
+    assert points.errors == 0
+    assert all(before <= timestamp <= after for timestamp in points.timestamps)
+
+def test_skips_blank_lines_comments_and_carriage_returns():
+    points = parse_lines(b"# comment\r\n\r\nsensors,machine_id=3 temperature=70,rpm=10u 1\r\n\n")
+    assert points.errors == 0
+    assert points.machine_ids == [3]
+    assert _reading(points, 0)["rpm"] == 10.0
+
+def test_machine_tag_and_measurement_filter():
+    data = b"sensors,gateway=9,id=4 temperature=1 1\nother,id=5 temperature=1 1\n"
+    points = parse_lines(data, machine_tag=b"id", measurement=b"sensors")
+    assert points.machine_ids == [4]
+    # Other measurements are skipped, not counted as errors
+    assert points.errors == 0
+
+def test_unknown_fields_are_ignored():
+    points = parse_lines(b"sensors,machine_id=1 temperature=1,humidity=40 1\n")
+    assert points.errors == 0
+    assert sum(not math.isnan(value) for value in points.values[0]) == 1
+
+def test_counts_rejected_lines():
+    data = b"\n".join([
+        b"sensors temperature=1 1",  # No machine tag
+        b"sensors,machine_id=x temperature=1 1",  # Non-numeric machine ID
+        b"sensors,machine_id=1 temperature=hot 1",  # Non-numeric sensor field
+        b'sensors,machine_id=1 temperature="1" 1',  # Quoted string
+        b"sensors,machine_id=1 temperature=1 1 extra",  # Too many parts
+        b"sensors,machine_id=1 temperature=1 soon",  # Non-numeric timestamp
+        b"sensors,machine_id=2 temperature=1 1",
+    ])
+    points = parse_lines(data)
+    assert points.errors == 6
+    assert points.machine_ids == [2]
+
+def test_rejects_values_outside_the_int64_range():
+    data = b"\n".join([
+        b"sensors,machine_id=1 temperature=1 99999999999999999999",  # After 2262
+        b"sensors,machine_id=1 temperature=1 -9223372036854775808",  # NaT
+        b"sensors,machine_id=99999999999999999999 temperature=1 1",
+        b"sensors,machine_id=2 temperature=1 1",
+    ])
+    points = parse_lines(data)
+    assert points.errors == 3
+    assert points.machine_ids == [2]
+
+def test_range_check_applies_after_precision_scaling():
+    points = parse_lines(b"sensors,machine_id=1 temperature=1 9999999999\nsensors,machine_id=2 temperature=1 9223372036\n", precision="s")
+    assert points.errors == 1
+    assert points.timestamps == [9223372036 * 10 ** 9]
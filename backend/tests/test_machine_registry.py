@@ -0,0 +1,23 @@
+from sqlalchemy import insert
+
+from app.db import machine_registry as registry_module
+from app.db.machine_registry import MachineRegistry
+from app.models.machine import Machine
+
+def test_cached_misses_are_bounded_least_recently_used_first(db, monkeypatch):
+    monkeypatch.setattr(registry_module, "MAX_CACHED_MISSES", 2)
+    registry = MachineRegistry()
+    for machine_id in (101, 102):
+        assert registry.get(db, machine_id) is None
+    assert registry.get(db, 101) is None  # Cached, and now the most recently used
+    assert registry.get(db, 103) is None
+    assert list(registry._missing) == [101, 103]
+    assert registry.misses == 3
+
+def test_cached_miss_is_dropped_when_the_machine_is_created(db):
+    registry = MachineRegistry()
+    assert registry.get(db, 1) is None
+    db.execute(insert(Machine), [{"id": 1, "name": "Machine 1", "type": "CNC", "location": "Test"}])
+    db.commit()
+    registry.invalidate(1)
+    assert registry.get(db, 1).type == "CNC"
@@ -0,0 +1,37 @@
+import urllib.request
+
+import pytest
+
+from app.utils import metrics
+from app.utils.metrics import Counter, Histogram, Registry
+
+@pytest.fixture
+def worker_label():
+    metrics.set_constant_labels(worker=3)
+    yield
+    metrics.set_constant_labels()
+
+def test_samples_carry_the_worker_label(worker_label):
+    registry = Registry()
+    counter = Counter("things_total", "Things", ["kind"], registry=registry)
+    histogram = Histogram("latency_seconds", "Latency", buckets=(1.0,), registry=registry)
+    counter.labels("a").inc(2)
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert 'things_total{kind="a",worker="3"} 2' in lines
+    assert 'latency_seconds_bucket{worker="3",le="1"} 1' in lines
+    assert 'latency_seconds_count{worker="3"} 1' in lines
+
+def test_metrics_server_serves_this_process(worker_label):
+    server = metrics.start_metrics_server("127.0.0.1", 0)
+    try:
+        metrics.PREDICTIONS_SCORED.inc(0)
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            body = response.read().decode()
+        assert 'predictions_scored_total{worker="3"}' in body
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.utils import notification
+from app.utils.notification import Alert, AlertDispatcher, MemorySink
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manually advanced monotonic clock, in seconds"""
+    now = [1000.0]
+    monkeypatch.setattr(notification.time, "monotonic", lambda: now[0])
+    return now
+
+def _dispatcher(**options) -> AlertDispatcher:
+    dispatcher = AlertDispatcher(**options)
+    dispatcher.sinks = [MemorySink()]
+    return dispatcher
+
+def _alert(machine_id: int, severity: str = "warning", condition: str = "temperature_high") -> Alert:
+    return Alert(machine_id, condition, severity, f"machine {machine_id}", 95.0, datetime(2025, 1, 1))
+
+def _sent(dispatcher: AlertDispatcher):
+    return [(alert.machine_id, alert.severity, alert.count) for batch in dispatcher.sinks[0].batches for alert in batch]
+
+def test_repeats_are_folded_then_suppressed_within_the_dedup_window(clock):
+    dispatcher = _dispatcher(dedup_seconds=60)
+    for _ in range(3):
+        dispatcher.emit(_alert(1))
+    asyncio.run(dispatcher.flush())
+    assert _sent(dispatcher) == [(1, "warning", 3)]
+
+    clock[0] += 30
+    dispatcher.emit(_alert(1))
+    asyncio.run(dispatcher.flush())
+    assert len(_sent(dispatcher)) == 1
+
+    # Escalation gets through, and the window ends
+    dispatcher.emit(_alert(1, "critical"))
+    asyncio.run(dispatcher.flush())
+    clock[0] += 61
+    dispatcher.emit(_alert(1))
+    asyncio.run(dispatcher.flush())
+    assert _sent(dispatcher)[1:] == [(1, "critical", 1), (1, "warning", 1)]
+
+def test_rate_limit_holds_back_the_least_severe(clock):
+    dispatcher = _dispatcher(rate_per_minute=2)
+    dispatcher.emit(_alert(1))
+    dispatcher.emit(_alert(2))
+    dispatcher.emit(_alert(3, "critical"))
+    asyncio.run(dispatcher.flush())
+    assert _sent(dispatcher) == [(3, "critical", 1), (1, "warning", 1)]
+    assert dispatcher.pending_count() == 1
+
+    clock[0] += 30
+    asyncio.run(dispatcher.flush())
+    assert _sent(dispatcher)[-1] == (2, "warning", 1)
+    assert dispatcher.pending_count() == 0
+
+def test_full_inbox_drops_without_blocking():
+    dispatcher = _dispatcher(max_queue=2)
+    assert dispatcher.emit(_alert(1))
+    assert dispatcher.emit(_alert(2))
+    assert not dispatcher.emit(_alert(3))
+    assert dispatcher.pending_count() == 2
+
+def test_failing_sink_does_not_stop_the_others():
+    class FailingSink(MemorySink):
+        name = "failing"
+
+        async def send(self, alerts):
+            raise ConnectionError("unreachable")
+
+    dispatcher = _dispatcher()
+    dispatcher.sinks.append(FailingSink())
+    dispatcher.emit(_alert(1))
+    asyncio.run(dispatcher.flush())
+    assert _sent(dispatcher) == [(1, "warning", 1)]
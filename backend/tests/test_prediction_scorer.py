@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import func, insert, select, text
+
+from app.db.crud import predictions as predictions_crud
+from app.ml.features import SENSOR_COLUMNS
+from app.models.machine import Machine
+from app.models.prediction import Prediction
+from app.models.sensor import SensorData
+from app.services import prediction_scorer
+
+class FakeModel:
+    """Scores each machine by the mean temperature of the readings it is given"""
+    version = "test"
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_failure_batch(self, sensor_data: pd.DataFrame) -> pd.DataFrame:
+        self.calls.append(sensor_data)
+        means = sensor_data.groupby('machine_id')['temperature'].mean() / 100
+        return pd.DataFrame({
+            "machine_id": means.index,
+            "failure_probability": means.values,
+            "is_failure_predicted": means.values > 0.5,
+            "prediction_confidence": abs(0.5 - means.values) * 2,
+        })
+
+def _add_readings(db, machine_id: int, timestamps, temperature: float) -> None:
+    db.execute(insert(SensorData), [
+        {"machine_id": machine_id, "timestamp": timestamp, **dict.fromkeys(SENSOR_COLUMNS, temperature)}
+        for timestamp in timestamps
+    ])
+    db.commit()
+
+def test_scores_only_machines_with_new_recent_readings(db):
+    db.execute(insert(Machine), [
+        {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Test"}
+        for machine_id in (1, 2, 3, 4)
+    ])
+    now = datetime.utcnow()
+    _add_readings(db, 1, [now - timedelta(minutes=minute) for minute in range(150)], 80.0)
+    _add_readings(db, 2, [now - timedelta(minutes=5)], 20.0)
+    # Machine 3 is idle beyond the lookback, machine 4 has no readings
+    _add_readings(db, 3, [now - timedelta(days=30)], 50.0)
+
+    model = FakeModel()
+    assert prediction_scorer.score_all(db, model, batch_machines=3) == 2
+    # One model call per batch with new readings, limited to the recent history
+    assert len(model.calls) == 1
+    assert model.calls[0].groupby('machine_id').size().to_dict() == {1: prediction_scorer.HISTORY_ROWS, 2: 1}
+
+    latest = predictions_crud.get_latest_prediction(db, 1)
+    assert (latest.as_of, latest.is_failure_predicted, latest.model_version) == (now, True, "test")
+    assert predictions_crud.get_scored_as_of(db, [1, 2, 3, 4]) == {1: now, 2: now - timedelta(minutes=5)}
+
+    # Nothing new, nothing scored
+    assert prediction_scorer.score_all(db, model) == 0
+
+    _add_readings(db, 2, [now + timedelta(seconds=1)], 90.0)
+    assert prediction_scorer.score_all(db, model) == 1
+    assert len(db.execute(select(Prediction).where(Prediction.machine_id == 2)).all()) == 2
+
+def test_scored_as_of_seeks_the_machine_index(db):
+    lookup = select(func.max(Prediction.as_of)).where(Prediction.machine_id == 1)
+    compiled = lookup.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = " ".join(str(row) for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all())
+    assert "ix_predictions_machine_as_of" in plan
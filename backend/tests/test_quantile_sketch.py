@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.utils.quantile_sketch import QuantileSketch
+
+ALPHA = 0.01
+QUANTILES = [0.0, 0.01, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+def _assert_within_accuracy(sketch: QuantileSketch, values: np.ndarray) -> None:
+    # The sketch reports the value at rank floor(q * (n - 1)), like method="lower"
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(estimate - exact) <= ALPHA * abs(exact) + 1e-9, q
+
+def test_quantiles_within_relative_accuracy():
+    values = np.random.default_rng(1).lognormal(3, 1, 50000)
+    _assert_within_accuracy(QuantileSketch.from_values(values, ALPHA), values)
+
+def test_quantiles_of_negative_and_zero_values():
+    values = np.concatenate([np.random.default_rng(2).normal(0, 10, 20000), np.zeros(500)])
+    _assert_within_accuracy(QuantileSketch.from_values(values, ALPHA), values)
+
+def test_summary_statistics_are_exact():
+    values = np.random.default_rng(3).normal(70, 5, 1000)
+    sketch = QuantileSketch.from_values(np.append(values, np.nan), ALPHA)
+    assert sketch.count == 1000
+    assert sketch.minimum == values.min()
+    assert sketch.maximum == values.max()
+    assert sketch.mean == pytest.approx(values.mean())
+    assert sketch.std == pytest.approx(values.std(ddof=1))
+
+def test_empty_sketch():
+    sketch = QuantileSketch(ALPHA)
+    assert sketch.quantiles([0.5]) == [None]
+    assert sketch.mean is None
+    assert sketch.std is None
+
+def test_merging_matches_a_single_sketch():
+    values = np.random.default_rng(4).gamma(2.0, 10.0, 30000)
+    whole = QuantileSketch.from_values(values, ALPHA)
+    parts = [QuantileSketch.from_values(part, ALPHA) for part in np.array_split(values, 3)]
+
+    merged = QuantileSketch(ALPHA)
+    for part in parts:
+        merged.merge(part)
+    merged_all = QuantileSketch.merge_all(parts, ALPHA)
+
+    for sketch in (merged, merged_all):
+        assert sketch.quantiles(QUANTILES) == whole.quantiles(QUANTILES)
+        assert sketch.count == whole.count
+        assert sketch.minimum == whole.minimum
+        assert sketch.maximum == whole.maximum
+        assert sketch.mean == pytest.approx(whole.mean)
+
+def test_merging_different_accuracies_fails():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+    with pytest.raises(ValueError):
+        QuantileSketch.merge_all([QuantileSketch(0.02)], 0.01)
+
+def test_serialization_round_trip():
+    values = np.random.default_rng(5).normal(0, 100, 5000)
+    sketch = QuantileSketch.from_values(values, ALPHA)
+    restored = QuantileSketch.from_bytes(
+        sketch.to_bytes(), sketch.count, sketch.total, sketch.total_sq, sketch.minimum, sketch.maximum
+    )
+    assert restored.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)
+
+    # Restored bins are read-only views; merging must still work
+    restored.merge(sketch)
+    assert restored.count == 2 * sketch.count
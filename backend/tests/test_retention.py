@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+from app.models.sensor_rollup import SensorDataRollup
+from app.services import retention
+
+CUTOFF = datetime(2025, 1, 1, 2)
+
+@pytest.fixture
+def csv_dir(tmp_path, monkeypatch):
+    """CSV store with 4 hours of one reading per minute, the first 2 hours expired"""
+    monkeypatch.setattr(retention.settings, "SENSOR_DATA_DIR", str(tmp_path))
+    start = datetime(2025, 1, 1)
+    pd.DataFrame({
+        "machine_id": 1,
+        "timestamp": [start + timedelta(minutes=minute) for minute in range(240)],
+        "temperature": [float(minute) for minute in range(240)],
+    }).to_csv(tmp_path / "1_sensor_data.csv", index=False)
+    return tmp_path
+
+def test_fold_merges_chunks_into_hourly_rollups(db):
+    db.execute(insert(Machine), [{"id": 1, "name": "Machine 1", "type": "CNC", "location": "Test"}])
+    start = datetime(2025, 1, 1)
+    db.execute(insert(SensorData), [
+        {"machine_id": 1, "timestamp": start + timedelta(minutes=minute),
+         "temperature": float(minute), "vibration": 2.0, "pressure": 1.0, "rpm": 2500.0}
+        for minute in range(180)
+    ])
+    db.commit()
+
+    # Chunks of 50 split both expired hours
+    assert [retention.fold_expired_chunk(db, CUTOFF, 50) for _ in range(4)] == [50, 50, 20, 0]
+    assert db.execute(select(func.count()).select_from(SensorData)).scalar() == 60
+
+    rollups = {
+        (rollup.bucket_start.hour, rollup.sensor): rollup
+        for rollup in db.query(SensorDataRollup).filter(SensorDataRollup.machine_id == 1)
+    }
+    assert len(rollups) == 2 * 4
+    first_hour = rollups[(0, "temperature")]
+    assert (first_hour.count, first_hour.minimum, first_hour.maximum) == (60, 0.0, 59.0)
+    assert first_hour.total == sum(range(60))
+    assert rollups[(1, "rpm")].count == 60
+
+def test_prune_csv_files_keeps_recent_rows_and_writes_rollups(csv_dir, monkeypatch):
+    monkeypatch.setattr(retention, "CSV_CHUNK_ROWS", 70)
+    assert retention.prune_csv_files(CUTOFF) == 120
+
+    kept = pd.read_csv(csv_dir / "1_sensor_data.csv", parse_dates=["timestamp"])
+    assert len(kept) == 120
+    assert kept.timestamp.min() == CUTOFF
+
+    # Chunks split the hours, so a bucket may appear in several rows
+    rollups = pd.read_csv(csv_dir / "1_sensor_rollup.csv", parse_dates=["bucket_start"])
+    totals = rollups.groupby("bucket_start")["count"].sum()
+    assert totals.tolist() == [60, 60]
+    assert sorted(path.name for path in csv_dir.iterdir()) == ["1_sensor_data.csv", "1_sensor_rollup.csv"]
+
+    # A second run has nothing left to fold
+    assert retention.prune_csv_files(CUTOFF) == 0
+    assert pd.read_csv(csv_dir / "1_sensor_rollup.csv")["count"].sum() == 120
+
+def test_failed_prune_does_not_count_rows_twice(csv_dir, monkeypatch):
+    replace = retention.os.replace
+
+    def fail_data_swap(source, target):
+        if str(target).endswith("_sensor_data.csv"):
+            raise OSError("disk full")
+        replace(source, target)
+
+    monkeypatch.setattr(retention.os, "replace", fail_data_swap)
+    assert retention.prune_csv_files(CUTOFF) == 0
+    assert sorted(path.name for path in csv_dir.iterdir()) == ["1_sensor_data.csv"]
+
+    monkeypatch.setattr(retention.os, "replace", replace)
+    assert retention.prune_csv_files(CUTOFF) == 120
+    assert pd.read_csv(csv_dir / "1_sensor_rollup.csv")["count"].sum() == 120
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.api.endpoints import sensors
+from app.schemas.sensor import SensorDataColumnarBatch, sensor_violations
+
+def _columns(**overrides) -> dict:
+    columns = {
+        "temperature": np.array([70.0, 71.0]),
+        "vibration": np.array([2.0, 2.1]),
+        "pressure": np.array([1.0, 1.1]),
+        "rpm": np.array([2500.0, 2510.0]),
+        "voltage": np.array([np.nan, 230.0]),
+        "current": np.array([np.nan, np.nan]),
+        "noise_level": np.array([70.0, 71.0]),
+    }
+    columns.update({sensor: np.array(values, dtype=np.float64) for sensor, values in overrides.items()})
+    return columns
+
+def test_valid_readings_have_no_violations():
+    assert not any(invalid.any() for invalid in sensor_violations(_columns()).values())
+
+def test_missing_required_reading_is_a_violation():
+    violations = sensor_violations(_columns(temperature=[np.nan, 70.0]))
+    assert violations["temperature"].tolist() == [True, False]
+
+def test_out_of_range_and_infinite_readings_are_violations():
+    violations = sensor_violations(_columns(rpm=[-1.0, 2500.0], noise_level=[70.0, np.inf], voltage=[-np.inf, np.nan]))
+    assert violations["rpm"].tolist() == [True, False]
+    assert violations["noise_level"].tolist() == [False, True]
+    assert violations["voltage"].tolist() == [True, False]
+
+def _batch(**overrides) -> dict:
+    batch = {
+        "machine_id": 1,
+        "timestamp": ["2025-04-14T12:30:45", None],
+        "temperature": [75.4, 75.6],
+        "vibration": [2.1, 2.2],
+        "pressure": [1.05, 1.04],
+        "rpm": [2500, 2510],
+        "voltage": [231.0, None],
+    }
+    batch.update(overrides)
+    return batch
+
+def test_columnar_batch_converts_arrays():
+    batch = SensorDataColumnarBatch(**_batch())
+    assert batch.temperature.dtype == np.float64
+    assert batch.rpm.tolist() == [2500.0, 2510.0]
+    assert batch.voltage[0] == 231.0 and np.isnan(batch.voltage[1])
+    # Omitted optional sensors are filled with NaN
+    assert np.isnan(batch.current).all()
+    assert batch.timestamp[0] == np.datetime64("2025-04-14T12:30:45")
+    # A null timestamp defaults to the time of receipt
+    assert batch.timestamp[1] > batch.timestamp[0]
+
+def test_columnar_batch_without_timestamps():
+    batch = SensorDataColumnarBatch(**_batch(timestamp=None))
+    assert len(batch.timestamp) == 2
+    assert not np.isnat(batch.timestamp).any()
+
+@pytest.mark.parametrize("overrides", [
+    {"temperature": [75.4]},  # Length differs from the other arrays
+    {"timestamp": ["2025-04-14T12:30:45"]},
+    {"temperature": [75.4, None]},  # Required sensor missing
+    {"vibration": [2.1, -5]},  # Out of range
+    {"pressure": [1.0, "high"]},  # Not a number
+    {"rpm": 2500},  # Not an array
+    {"rpm": [[2500], [2500]]},  # Nested arrays
+    {"rpm": [[2500, None], [2500]]},
+    {"rpm": ["2500", "2500"]},  # Numbers as strings
+    {"rpm": [True, None]},
+    {"timestamp": ["yesterday", None]},
+    {"temperature": [], "vibration": [], "pressure": [], "rpm": [], "voltage": [], "timestamp": []},
+])
+def test_columnar_batch_rejects_invalid_input(overrides):
+    with pytest.raises(ValidationError):
+        SensorDataColumnarBatch(**_batch(**overrides))
+
+def test_columnar_batch_error_names_invalid_indices():
+    with pytest.raises(ValidationError, match=r"first at indices \[1\]"):
+        SensorDataColumnarBatch(**_batch(vibration=[2.1, 5000]))
+
+def test_columnar_endpoint_rejects_nested_arrays_as_unprocessable(db):
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensor-data")
+    response = TestClient(app).post("/sensor-data/batch/columnar", json=_batch(rpm=[[2500], [2510]]))
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "rpm"]
@@ -0,0 +1,43 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.api.endpoints import sensors
+from app.ml.features import SENSOR_COLUMNS
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+
+@pytest.fixture
+def readings(db):
+    db.execute(insert(Machine), [{"id": 1, "name": "Machine 1", "type": "CNC", "location": "Test"}])
+    start = datetime.utcnow() - timedelta(hours=1)
+    db.execute(insert(SensorData), [
+        {"machine_id": 1, "timestamp": start + timedelta(minutes=index), **dict.fromkeys(SENSOR_COLUMNS, float(index))}
+        for index in range(11)
+    ])
+    db.commit()
+
+def test_stats_endpoint(readings):
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensor-data")
+    response = TestClient(app).get("/sensor-data/1/stats?days=1")
+    assert response.status_code == 200
+    assert response.json()["statistics"]["temperature"]["mean"] == pytest.approx(5.0)
+
+def test_coalesced_stats_survive_the_first_caller_being_cancelled(readings):
+    end = datetime.utcnow()
+    start = end - timedelta(days=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(sensors._stats.do_blocking("key", sensors._sensor_stats, 1, start, end))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(sensors._stats.do_blocking("key", sensors._sensor_stats, 1, start, end))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await follower
+
+    assert asyncio.run(scenario())["statistics"]["temperature"]["mean"] == pytest.approx(5.0)
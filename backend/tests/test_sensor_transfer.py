@@ -0,0 +1,120 @@
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, insert, select
+
+from app.api.endpoints import sensors
+from app.db.crud import import_jobs as import_jobs_crud
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+from app.services import sensor_export, sensor_import
+
+SENSOR_COLUMNS = ['temperature', 'vibration', 'pressure', 'rpm', 'voltage', 'current', 'noise_level']
+
+@pytest.fixture
+def readings(db):
+    """Three machines with readings, some optional sensors missing"""
+    db.execute(insert(Machine), [
+        {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Test"}
+        for machine_id in (1, 2, 3)
+    ])
+    rng = np.random.default_rng(1)
+    start = datetime(2025, 1, 1)
+    rows = [
+        {
+            "machine_id": machine_id,
+            "timestamp": start + timedelta(minutes=index, microseconds=machine_id),
+            "temperature": float(rng.normal(70, 5)),
+            "vibration": float(rng.normal(2, 0.2)),
+            "pressure": float(rng.normal(1, 0.05)),
+            "rpm": float(rng.normal(2500, 50)),
+            "voltage": float(rng.normal(230, 2)) if index % 3 else None,
+            "current": None,
+            "noise_level": float(rng.normal(70, 3)),
+        }
+        for machine_id in (1, 2, 3)
+        for index in range(250)
+    ]
+    db.execute(insert(SensorData), rows)
+    db.commit()
+    return _stored(db)
+
+def _stored(db) -> pd.DataFrame:
+    columns = [getattr(SensorData, column) for column in ['machine_id', 'timestamp'] + SENSOR_COLUMNS]
+    rows = db.execute(select(*columns).order_by(SensorData.machine_id, SensorData.timestamp)).all()
+    return pd.DataFrame(rows, columns=['machine_id', 'timestamp'] + SENSOR_COLUMNS).astype({column: float for column in SENSOR_COLUMNS})
+
+def _reimport(db, data: bytes, format: str):
+    """Replace the stored readings with an import of the exported file"""
+    db.execute(delete(SensorData))
+    db.commit()
+    job = import_jobs_crud.create_import_job(db, filename=f"export.{format}", format=format, chunk_rows=100)
+    job.total_rows = sensor_import.spool_upload(io.BytesIO(data), job.id, format)
+    db.commit()
+    sensor_import.run_import_job(job.id)
+
+    db.expire_all()
+    job = import_jobs_crud.get_import_job(db, job.id)
+    assert job.status == "completed", job.error
+    assert job.rows_rejected == 0
+    return job
+
+@pytest.mark.parametrize("format", ["csv", "parquet"])
+def test_export_import_round_trip(db, readings, format):
+    export = sensor_export.iter_export_csv if format == "csv" else sensor_export.iter_export_parquet
+    data = b"".join(export(chunk_rows=100))
+
+    job = _reimport(db, data, format)
+    assert job.total_rows == job.rows_inserted == len(readings)
+    pd.testing.assert_frame_equal(_stored(db), readings)
+
+def test_export_filters_machines_and_time(db, readings):
+    start = datetime(2025, 1, 1, 1)
+    end = datetime(2025, 1, 1, 2)
+    data = b"".join(sensor_export.iter_export_csv([2], start, end, chunk_rows=7))
+    exported = pd.read_csv(io.BytesIO(data), parse_dates=['timestamp'])
+
+    expected = readings[(readings.machine_id == 2) & readings.timestamp.between(start, end)]
+    assert exported.machine_id.tolist() == expected.machine_id.tolist()
+    assert exported.timestamp.tolist() == expected.timestamp.tolist()
+    assert sensor_export.count_export_rows(db, [2], start, end) == len(expected)
+
+def test_import_rejects_invalid_rows(db, readings):
+    data = (
+        b"machine_id,timestamp,temperature,vibration,pressure,rpm\n"
+        b"1,2025-02-01T00:00:00,70,2,1,2500\n"
+        b"99,2025-02-01T00:00:00,70,2,1,2500\n"  # Unknown machine
+        b"1,not a time,70,2,1,2500\n"
+        b"1,2025-02-01T00:01:00,,2,1,2500\n"  # Missing required sensor
+    )
+    job = import_jobs_crud.create_import_job(db, filename="bad.csv", format="csv", chunk_rows=1000)
+    job.total_rows = sensor_import.spool_upload(io.BytesIO(data), job.id, "csv")
+    db.commit()
+    sensor_import.run_import_job(job.id)
+
+    db.expire_all()
+    job = import_jobs_crud.get_import_job(db, job.id)
+    assert (job.status, job.total_rows, job.rows_inserted, job.rows_rejected) == ("completed", 4, 1, 3)
+
+def test_csv_rows_with_quoted_newlines_are_counted_once(db, readings):
+    data = (
+        b"machine_id,timestamp,temperature,vibration,pressure,rpm,note\n"
+        b'1,2025-02-01T00:00:00,70,2,1,2500,"first line\nsecond line"\n'
+        b"\n"
+        b"1,2025-02-01T00:01:00,71,2,1,2500,plain"
+    )
+    job = import_jobs_crud.create_import_job(db, filename="notes.csv", format="csv", chunk_rows=1000)
+    assert sensor_import.spool_upload(io.BytesIO(data), job.id, "csv") == 2
+
+def test_import_endpoint_spools_the_upload(db, readings):
+    app = FastAPI()
+    app.include_router(sensors.router, prefix="/sensor-data")
+    data = b"machine_id,timestamp,temperature,vibration,pressure,rpm\n1,2025-02-01T00:00:00,70,2,1,2500\n"
+    response = TestClient(app).post("/sensor-data/import", files={"file": ("readings.csv", data)})
+    assert response.status_code == 202
+    assert response.json()["total_rows"] == 1
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import func, insert, inspect, select
+
+from app.db.database import engine
+from app.db.shards import SHARDED_TABLES, ShardRouter
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+
+@pytest.fixture
+def router(db, tmp_path):
+    """Two SQLite shards next to the main test database"""
+    router = ShardRouter(engine, [f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(2)])
+    router.create_schema()
+    yield router
+    router.dispose()
+
+def _count(db) -> int:
+    return db.execute(select(func.count()).select_from(SensorData)).scalar()
+
+def test_machines_are_routed_by_id_or_location():
+    by_id = ShardRouter(engine, ["sqlite://", "sqlite://", "sqlite://"])
+    assert [by_id.shard_of(machine_id) for machine_id in range(5)] == [0, 1, 2, 0, 1]
+
+    by_location = ShardRouter(engine, ["sqlite://", "sqlite://"], key="location", locations={"plant-a": 1})
+    assert by_location.shard_of(4, "plant-a") == 1
+    # Locations without an entry hash to a fixed shard
+    assert by_location.shard_of(4, "plant-b") == by_location.shard_of(5, "plant-b")
+
+    unsharded = ShardRouter(engine, [])
+    assert (unsharded.count, unsharded.shard_of(7)) == (1, 0)
+    assert unsharded.assign(None, np.array([3, 4])).tolist() == [0, 0]
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        ShardRouter(engine, ["sqlite://"], key="region")
+    with pytest.raises(ValueError):
+        ShardRouter(engine, ["sqlite://", "sqlite://"], key="location", locations={"plant-a": 2})
+
+def test_shards_hold_only_the_sharded_tables(router):
+    for shard_engine in router.engines:
+        tables = set(inspect(shard_engine).get_table_names())
+        assert tables == {table.name for table in SHARDED_TABLES}
+    assert not set(table.name for table in SHARDED_TABLES) & {table.name for table in router.main_tables()}
+
+def test_bound_sessions_write_readings_to_their_machine_shard(db, router):
+    db.execute(insert(Machine), [
+        {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Test"}
+        for machine_id in (1, 2, 3)
+    ])
+    db.commit()
+    groups = router.group(db, [1, 2, 3])
+    assert groups == {1: [1, 3], 0: [2]}
+    assert router.assign(db, np.array([3, 2, 1, 2])).tolist() == [1, 0, 1, 0]
+
+    def store(shard_db, machine_ids):
+        shard_db.execute(insert(SensorData), [
+            {"machine_id": machine_id, "timestamp": datetime(2025, 1, 1), "temperature": 70.0,
+             "vibration": 2.0, "pressure": 1.0, "rpm": 2500.0}
+            for machine_id in machine_ids
+        ])
+        shard_db.commit()
+        # Machines stay readable from the main database
+        return shard_db.execute(select(func.count()).select_from(Machine)).scalar()
+
+    assert router.map(store, groups) == {1: 3, 0: 3}
+    assert router.scatter(_count) == [1, 2]
+    assert _count(db) == 0
+    assert _count(router.bind_machine(db, 3)) == 2
+
+def test_map_can_return_failures_per_shard(router):
+    def fail_on_shard_one(shard_db, shard):
+        if shard == 1:
+            raise RuntimeError("shard down")
+        return shard
+
+    work = {0: 0, 1: 1}
+    with pytest.raises(RuntimeError):
+        router.map(fail_on_shard_one, work)
+    results = router.map(fail_on_shard_one, work, return_exceptions=True)
+    assert results[0] == 0
+    assert isinstance(results[1], RuntimeError)
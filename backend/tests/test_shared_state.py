@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import pytest
+
+from app.ml.features import SENSOR_COLUMNS
+from app.utils.shared_state import FleetState
+
+@pytest.fixture
+def state():
+    state = FleetState(4)
+    state.allocate(shared=True)
+    yield state
+    state.close(unlink=True)
+
+def _values(value: float):
+    return [value] * len(SENSOR_COLUMNS)
+
+def test_latest_reading_keeps_the_newest(state):
+    state.record_reading(1, datetime(2025, 1, 1, 0, 1), _values(2.0))
+    state.record_reading(1, datetime(2025, 1, 1), _values(1.0))
+    assert state.latest_reading(1) == {"timestamp": "2025-01-01T00:01:00", **dict.fromkeys(SENSOR_COLUMNS, 2.0)}
+    assert state.latest_reading(2) is None
+    assert state.latest_reading(4) is None  # Beyond the capacity
+
+def _die_holding_the_lock(state: FleetState, slot: int) -> None:
+    with state._write_lock():
+        state._sequence[slot] += 1
+        # Killed mid-write, without releasing the lock
+        os._exit(1)
+
+def _run(target, *args) -> int:
+    worker = multiprocessing.get_context("fork").Process(target=target, args=args)
+    worker.start()
+    worker.join()
+    return worker.pid
+
+def test_parent_releases_the_lock_of_a_worker_that_died_mid_write(state):
+    state.record_reading(1, datetime(2025, 1, 1), _values(1.0))
+    pid = _run(_die_holding_the_lock, state, 1)
+    assert state._sequence[1] % 2
+    assert not state._lock.acquire(timeout=0)
+
+    assert not state.recover_lock(pid + 1)
+    assert state.recover_lock(pid)
+    assert state._sequence[1] % 2 == 0
+    assert state.latest_reading(1)["temperature"] == 1.0
+
+    state.record_reading(1, datetime(2025, 1, 1, 0, 1), _values(2.0))
+    assert state.latest_reading(1)["temperature"] == 2.0
+    assert state.bump_registry_version() == 1
+
+def test_recovery_leaves_the_lock_of_a_clean_exit_alone(state):
+    pid = _run(state.bump_registry_version)
+    assert state.registry_version == 1
+    assert not state.recover_lock(pid)
+    # Still a lock: held once, then refused
+    assert state._lock.acquire(timeout=0)
+    assert not state._lock.acquire(timeout=0)
+    state._lock.release()
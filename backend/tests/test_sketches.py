@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.api.endpoints.sensors import _sensor_stats
+from app.ml.features import SENSOR_COLUMNS
+from app.models.machine import Machine
+from app.models.sensor import SensorData
+from app.models.sensor_sketch import SensorSketch
+from app.services import sketches
+from app.utils.quantile_sketch import QuantileSketch
+
+ALPHA = 0.01
+
+def test_partial_sketches_of_each_worker_merge_into_the_whole(db, monkeypatch):
+    monkeypatch.setattr(sketches.settings, "SKETCH_RELATIVE_ACCURACY", ALPHA)
+    count = 2000
+    machine_ids = np.full(count, 1, dtype=np.int64)
+    timestamps = np.datetime64("2025-01-01T00:00") + np.arange(count) * np.timedelta64(5, "s")
+    values = np.random.default_rng(1).normal(70, 5, (count, len(SENSOR_COLUMNS)))
+
+    # Two workers, each receiving every other request of the machine
+    workers = [sketches.SketchAccumulator(ALPHA), sketches.SketchAccumulator(ALPHA)]
+    for index, start in enumerate(range(0, count, 50)):
+        block = slice(start, start + 50)
+        workers[index % 2].add_columns(machine_ids[block], timestamps[block], values[block])
+    for worker in workers:
+        worker.flush()
+
+    hours = 3 * len(SENSOR_COLUMNS)
+    assert sketches.compact_sketches(db, before=datetime(2025, 1, 2)) == hours
+    assert db.execute(select(func.count()).select_from(SensorSketch)).scalar() == hours
+
+    merged = sketches.range_sketches(db, 1, datetime(2025, 1, 1), datetime(2025, 1, 1, 3))
+    for index, sensor in enumerate(SENSOR_COLUMNS):
+        whole = QuantileSketch.from_values(values[:, index], ALPHA)
+        assert (merged[sensor].count, merged[sensor].minimum, merged[sensor].maximum) == (whole.count, whole.minimum, whole.maximum)
+        assert merged[sensor].total == pytest.approx(whole.total)
+        assert merged[sensor].quantiles([0.1, 0.5, 0.9]) == whole.quantiles([0.1, 0.5, 0.9])
+
+def test_stats_fall_back_to_raw_readings_until_history_is_sketched(db, monkeypatch):
+    monkeypatch.setattr(sketches.settings, "SKETCHES_ENABLED", True)
+    db.execute(insert(Machine), [{"id": 1, "name": "Machine 1", "type": "CNC", "location": "Test"}])
+    start = datetime(2025, 1, 1)
+    db.execute(insert(SensorData), [
+        {"machine_id": 1, "timestamp": start + timedelta(minutes=10 * index), **dict.fromkeys(SENSOR_COLUMNS, float(index))}
+        for index in range(48)
+    ])
+    # Sketches started with the last hour of readings
+    last_hour = list(range(42, 48))
+    accumulator = sketches.SketchAccumulator(sketches.settings.SKETCH_RELATIVE_ACCURACY)
+    accumulator.add_columns(
+        np.ones(len(last_hour), dtype=np.int64),
+        np.array([start + timedelta(minutes=10 * index) for index in last_hour], dtype="datetime64[ns]"),
+        np.array([[float(index)] * len(SENSOR_COLUMNS) for index in last_hour])
+    )
+    db.commit()
+    accumulator.flush()
+
+    end = start + timedelta(hours=8)
+    assert not sketches.sketches_cover(db, 1, start, end)
+    assert sketches.sketches_cover(db, 1, start + timedelta(hours=7), end)
+    stats = _sensor_stats(1, start, end)
+    assert "source" not in stats
+    assert stats["data_points"] == 48
+
+    assert sketches.backfill(1) == 48
+    stats = _sensor_stats(1, start, end)
+    assert stats["source"] == "sketches"
+    assert stats["data_points"] == 48
+    assert stats["statistics"]["temperature"]["mean"] == pytest.approx(23.5)
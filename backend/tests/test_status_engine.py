@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.machine_registry import machine_registry
+from app.models.machine import Machine
+from app.services.status_engine import StatusEngine, next_level, smooth
+from app.utils.shared_state import fleet_state
+
+ENTRY_LEVELS = (0.0, 1.0, 1.25)
+HYSTERESIS = 0.1
+
+@pytest.mark.parametrize("level, score, expected", [
+    (0, 0.5, 0),
+    (0, 1.0, 1),  # Entered at the entry level
+    (0, 1.3, 2),  # Levels can be skipped on the way up
+    (1, 0.95, 1),  # Inside the hysteresis band
+    (1, 0.9, 1),
+    (1, 0.89, 0),
+    (2, 1.2, 2),
+    (2, 1.12, 1),
+    (2, 0.5, 0),  # And on the way down
+])
+def test_next_level(level, score, expected):
+    assert next_level(level, score, ENTRY_LEVELS, HYSTERESIS) == expected
+
+def test_score_hovering_at_a_boundary_does_not_flap():
+    level = 0
+    levels = []
+    for score in [0.99, 1.01, 0.98, 1.02, 0.97, 1.0, 0.95]:
+        level = next_level(level, score, ENTRY_LEVELS, HYSTERESIS)
+        levels.append(level)
+    assert levels == [0, 1, 1, 1, 1, 1, 1]
+
+def test_smooth_matches_reading_by_reading_updates():
+    alpha = 0.3
+    values = np.random.default_rng(1).normal(70, 5, (50, 3))
+    values[::7, 1] = np.nan
+
+    expected = np.array([np.nan, 10.0, np.nan])
+    for row in values:
+        for index, value in enumerate(row):
+            if np.isnan(value):
+                continue
+            if np.isnan(expected[index]):
+                expected[index] = value
+            else:
+                expected[index] = alpha * value + (1 - alpha) * expected[index]
+
+    result = smooth(np.array([np.nan, 10.0, np.nan]), values, alpha)
+    np.testing.assert_allclose(result, expected)
+
+def test_smooth_keeps_averages_without_readings():
+    previous = np.array([1.0, np.nan])
+    result = smooth(previous, np.full((3, 2), np.nan), 0.5)
+    assert result[0] == 1.0 and np.isnan(result[1])
+
+@pytest.fixture
+def small_fleet_state():
+    """Fleet state tracking machine IDs 0 and 1 only"""
+    fleet_state.allocate(2)
+    machine_registry.invalidate()
+    yield
+    fleet_state.allocate(settings.FLEET_STATE_CAPACITY)
+    machine_registry.invalidate()
+
+def _status_engine() -> StatusEngine:
+    return StatusEngine({"temperature": 100.0}, alpha=1.0, critical_ratio=1.25, hysteresis=0.1)
+
+def _add_machines(db, statuses):
+    db.execute(insert(Machine), [
+        {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Test", "status": status}
+        for machine_id, status in statuses.items()
+    ])
+    db.commit()
+
+@pytest.mark.parametrize("machine_id", [1, 3])
+def test_manual_statuses_are_never_overridden(db, small_fleet_state, machine_id):
+    _add_machines(db, {machine_id: "maintenance", machine_id + 10: "offline"})
+    engine = _status_engine()
+    for manual_id in (machine_id, machine_id + 10):
+        for temperature in (50.0, 150.0, 50.0):
+            assert engine.update_columns(manual_id, {"temperature": np.array([temperature])}) is None
+    assert engine.pending() == {}
+
+def test_untracked_machine_changes_status_once(db, small_fleet_state):
+    _add_machines(db, {5: "operational"})
+    engine = _status_engine()
+    assert engine.update_columns(5, {"temperature": np.array([150.0])}) == "critical"
+    assert engine.update_columns(5, {"temperature": np.array([150.0])}) is None
+    assert engine.pending() == {5: "critical"}
+
+    assert engine.flush() == 1
+    assert db.execute(select(Machine.status).where(Machine.id == 5)).scalar() == "critical"
+    assert engine.update_columns(5, {"temperature": np.array([150.0])}) is None
+
+def test_unknown_machine_is_ignored(db, small_fleet_state):
+    engine = _status_engine()
+    assert engine.update_columns(7, {"temperature": np.array([150.0])}) is None
+    assert engine.pending() == {}
+
+def test_flush_keeps_a_status_set_in_the_meantime(db):
+    _add_machines(db, {1: "operational"})
+    machine_registry.invalidate()
+    engine = _status_engine()
+    assert engine.update_columns(1, {"temperature": np.array([150.0])}) == "critical"
+
+    db.execute(Machine.__table__.update().where(Machine.id == 1).values(status="offline"))
+    db.commit()
+    engine.flush()
+    assert db.execute(select(Machine.status).where(Machine.id == 1)).scalar() == "offline"
+    fleet_state.set_status(1, None)
+
+def test_workers_step_from_the_shared_status(db):
+    _add_machines(db, {1: "operational"})
+    machine_registry.invalidate()
+    # Two workers, each smoothing the readings it receives
+    first, second = _status_engine(), _status_engine()
+    assert first.update_columns(1, {"temperature": np.array([105.0])}) == "warning"
+    # Within the hysteresis band of warning, so the other worker keeps it
+    assert second.update_columns(1, {"temperature": np.array([95.0])}) is None
+    assert fleet_state.get_status(1) == "warning"
+    assert second.update_columns(1, {"temperature": np.array([80.0])}) == "operational"
+    fleet_state.set_status(1, None)
@@ -0,0 +1,40 @@
+import time
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.utils import metrics
+from app.utils.timing import ServerTimingMiddleware, TimedRoute
+
+def _server_timing(response) -> dict:
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, *params = entry.split(";")
+        entries[name] = dict(param.split("=", 1) for param in params)
+    return entries
+
+def test_queries_are_timed_once_and_serialize_excludes_dependencies():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+
+    def slow_dependency():
+        time.sleep(0.05)
+
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/items", dependencies=[Depends(slow_dependency)])
+    def items():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {"items": []}
+
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(router)
+
+    timing = _server_timing(TestClient(app).get("/items"))
+    assert timing["db"]["desc"] == '"2 queries"'
+    assert float(timing["serialize"]["dur"]) < 50
+    assert float(timing["total"]["dur"]) >= 50
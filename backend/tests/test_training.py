@@ -0,0 +1,105 @@
+import os
+from datetime import date, datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+from app.ml import preprocessing, training
+from app.ml.features import SENSOR_COLUMNS
+from app.ml.model import MLModel
+from app.models.machine import Machine
+from app.models.maintenance import Maintenance
+from app.models.sensor import SensorData
+
+DATABASE_URL = os.environ["DATABASE_URL"]
+WINDOWS = (5, 20)
+START = datetime(2025, 1, 1)
+
+def _machines(db, machine_ids, readings: int) -> None:
+    """Machines with a reading every 10 minutes and a failure on January 3rd"""
+    rng = np.random.default_rng(1)
+    db.execute(insert(Machine), [
+        {"id": machine_id, "name": f"Machine {machine_id}", "type": "CNC", "location": "Test"}
+        for machine_id in machine_ids
+    ])
+    db.execute(insert(Maintenance), [
+        {"machine_id": machine_id, "date": date(2025, 1, 3), "type": "corrective", "description": "Bearing"}
+        for machine_id in machine_ids
+    ])
+    db.execute(insert(SensorData), [
+        {
+            "machine_id": machine_id,
+            "timestamp": START + timedelta(minutes=10 * index),
+            "temperature": float(rng.normal(70, 5)),
+            "vibration": float(rng.normal(2, 0.2)),
+            "pressure": 1.0,
+            "rpm": 2500.0,
+            # Gaps that must be filled across chunk boundaries
+            "voltage": float(rng.normal(230, 2)) if index % 7 else None,
+            "current": None,
+            "noise_level": float(rng.normal(70, 3)),
+        }
+        for machine_id in machine_ids
+        for index in range(readings)
+    ])
+    db.commit()
+
+def _load(paths):
+    batches = [np.load(path) for path in paths]
+    return np.concatenate([batch["features"] for batch in batches]), np.concatenate([batch["labels"] for batch in batches])
+
+def test_label_windows_marks_windows_before_a_failure():
+    ends = np.array(["2025-01-01", "2025-01-05", "2025-01-09", "2025-01-10", "2025-01-20"], dtype="datetime64[s]")
+    failures = np.array(["2025-01-10", "2025-01-02"], dtype="datetime64[D]")
+    # Within 3 days before a failure; a failure on the window end itself is in the past
+    assert training.label_windows(ends, failures, 3).tolist() == [1, 0, 1, 0, 0]
+    assert training.label_windows(ends, np.array([], dtype="datetime64[D]"), 3).tolist() == [0] * 5
+
+@pytest.mark.parametrize("stride", [1, 3, 25])
+def test_chunked_extraction_matches_the_whole_history(db, tmp_path, stride):
+    _machines(db, [1], 300)
+    paths = training.extract_machine_windows(DATABASE_URL, DATABASE_URL, 1, WINDOWS, stride, 1, str(tmp_path), chunk_rows=37)
+    assert len(paths) > 1
+    features, labels = _load(paths)
+
+    history = pd.read_sql(
+        f"SELECT timestamp, {', '.join(SENSOR_COLUMNS)} FROM sensor_data ORDER BY timestamp", db.connection()
+    )
+    readings = preprocessing.prepare_readings(history.assign(timestamp=pd.to_datetime(history['timestamp'])))
+    expected = preprocessing.window_features(readings, WINDOWS, stride)
+    np.testing.assert_allclose(features, expected.to_numpy(dtype=np.float32), rtol=1e-6)
+
+    window_ends = readings['timestamp'].to_numpy()[expected.index]
+    np.testing.assert_array_equal(labels, training.label_windows(window_ends, np.array(["2025-01-03"], dtype="datetime64[D]"), 1))
+    assert labels.any() and not labels.all()
+
+def test_short_history_yields_no_windows(db, tmp_path):
+    _machines(db, [1], max(WINDOWS) - 1)
+    assert training.extract_machine_windows(DATABASE_URL, DATABASE_URL, 1, WINDOWS, 1, 1, str(tmp_path)) == []
+
+def test_train_model_end_to_end(db, tmp_path):
+    _machines(db, range(1, 6), 600)
+    output_path = tmp_path / "model.joblib"
+    metadata = training.train_model(
+        DATABASE_URL, str(output_path), workers=2, windows=WINDOWS, stride=5, horizon_days=1, epochs=2,
+        holdout_fraction=0.2
+    )
+
+    assert (metadata["machines"], metadata["holdout_machines"]) == (5, 1)
+    assert metadata["training_windows"] == 4 * len(range(max(WINDOWS) - 1, 600, 5))
+    assert 0 < metadata["training_positive_rate"] < 1
+    assert "roc_auc" in metadata["metrics"]
+    # The live artifact is a copy of the versioned one
+    versioned = tmp_path / f"model-{metadata['version']}.joblib"
+    assert joblib.load(versioned)["version"] == joblib.load(output_path)["version"]
+
+    model = MLModel(str(output_path))
+    assert model.feature_windows == list(WINDOWS)
+    recent = pd.DataFrame({"machine_id": 1, "timestamp": pd.date_range(START, periods=30, freq="10min"),
+                           **dict.fromkeys(SENSOR_COLUMNS, 1.0)})
+    results = model.predict_failure_batch(recent)
+    assert results.machine_id.tolist() == [1]
+    assert 0 <= results.failure_probability[0] <= 1